@@ -6,6 +6,7 @@ import re
 from datetime import datetime, time
 import plotly.express as px
 import plotly.graph_objects as go
+from utils.ratelimit import get_limiter
 def get_market_change_data(target_date, target_time):
     """
     统计指定日期和时分的大盘涨跌幅情况
@@ -16,7 +17,10 @@ def get_market_change_data(target_date, target_time):
         # 构建查询语句，获取指定时间的大盘数据
         query = f"{target_date} {target_time} 大盘涨跌幅,所属概念"
         # 获取数据
-        df = pywencai.get(query=query, loop=True)
+        with get_limiter("wencai") as limiter:
+            df = pywencai.get(query=query, loop=True)
+            if df is None:
+                limiter.throttled()
         st.write("数据获取结果：", df)  # 云端日志中查看是否为None
         if df is None or df.empty:
             return None
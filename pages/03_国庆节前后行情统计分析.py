@@ -1,141 +1,181 @@
 
-import akshare as ak
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import time
-import random
+import numpy as np
+
+from utils.holiday_effect import (HOLIDAYS, WINDOWS, holiday_effects, locate_holidays,
+                                  summarize_effects, window_returns)
+from utils.ohlcv_store import get_index_daily
+from utils.seasonality import monthly_matrix, turn_of_month_matrix, weekday_matrix
 # 设置页面配置
 st.set_page_config(
     page_title="国庆节行情分析",
     page_icon="🇨🇳",
     layout="wide"
 )
-# 应用标题
-st.title("🇨🇳 近10年国庆节前后行情统计分析")
-st.markdown("""
-本应用分析**近10年国庆节前后**的市场表现，包括：
-- **国庆节前1天** → **国庆节后第1天**的涨跌幅
-- **国庆节前1天** → **国庆节后第1周**的涨跌幅
-""")
+INDEX_NAMES = {
+    "000001": "上证指数",
+    "000300": "沪深300",
+    "000905": "中证500",
+    "000852": "中证1000"
+}
 # 侧边栏配置
 st.sidebar.header("分析参数设置")
-start_year = st.sidebar.selectbox("起始年份", range(2014, 2024), index=0)
-end_year = st.sidebar.selectbox("结束年份", range(2015, 2026), index=10)
+mode = st.sidebar.radio("分析模式", ["国庆节前后", "节日效应总览", "季节性分析"])
+# 应用标题
+if mode == "国庆节前后":
+    st.title("🇨🇳 近10年国庆节前后行情统计分析")
+    st.markdown("""
+    本应用分析**近10年国庆节前后**的市场表现，包括：
+    - **国庆节前1天** → **国庆节后第1天**的涨跌幅
+    - **国庆节前1天** → **国庆节后第1周**的涨跌幅
+    """)
+elif mode == "季节性分析":
+    st.title("📅 指数季节性分析")
+    st.markdown("""
+    基于所选指数**全部历史日线**统计：月度涨跌幅矩阵、星期效应、月末月初效应。
+    """)
+else:
+    st.title("🧧 A股节日效应总览")
+    st.markdown("""
+    统计**春节、清明节、劳动节、端午节、中秋节、国庆节**前后四大指数的表现：
+    以节前最后一个交易日收盘价为基准，计算节后 1/3/5/10 个交易日的涨跌幅及上涨概率。
+    """)
+start_year = st.sidebar.selectbox("起始年份", range(2014, 2024), index=0, disabled=mode == "季节性分析")
+end_year = st.sidebar.selectbox("结束年份", range(2015, 2026), index=10, disabled=mode == "季节性分析")
 index_code = st.sidebar.selectbox("选择指数",
-                                  ["000001", "000300", "000905", "000852"],
-                                  format_func=lambda x: {
-                                      "000001": "上证指数",
-                                      "000300": "沪深300",
-                                      "000905": "中证500",
-                                      "000852": "中证1000"
-                                  }[x])
+                                  list(INDEX_NAMES),
+                                  format_func=INDEX_NAMES.get,
+                                  disabled=mode == "节日效应总览")
 @st.cache_data(ttl=3600)
 def get_index_data(symbol, start_year, end_year):
-    """获取指数历史数据（修复列名问题）"""
+    """获取指数历史数据（本地日线存储只补齐缺失尾部，上游请求由共享限速器控制频率）"""
     try:
-        # 添加请求间隔，避免被服务器限制
-        time.sleep(random.uniform(2, 4))
-        # 使用更稳定的接口获取数据
-        df = ak.stock_zh_index_daily(symbol=symbol)
-        # 检查数据是否为空
-        if df.empty:
-            st.error(f"获取到的数据为空，请检查指数代码 {symbol} 是否正确")
-            return pd.DataFrame()
-        # 统一列名处理：检查可能的列名变体
-        column_mapping = {}
-        for col in df.columns:
-            if 'date' in col.lower() or '日期' in col or 'trade_date' in col:
-                column_mapping[col] = 'date'
-            elif 'close' in col.lower() or '收盘' in col:
-                column_mapping[col] = 'close'
-        # 重命名列
-        df = df.rename(columns=column_mapping)
-        # 确保必要的列存在
-        if 'date' not in df.columns or 'close' not in df.columns:
-            st.error(f"数据列不完整，现有列: {df.columns.tolist()}")
-            return pd.DataFrame()
-        # 转换日期格式
-        df['date'] = pd.to_datetime(df['date'])
-        # 过滤日期范围
         start_date = f'{start_year}-01-01'
         end_date = f'{end_year}-12-31'
-        df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+        df = get_index_daily(symbol, start_date, end_date)
         if df.empty:
             st.error(f"在指定时间范围 {start_date} 到 {end_date} 内没有找到数据")
             return pd.DataFrame()
-        df = df.sort_values('date')
         return df[['date', 'close']]
     except Exception as e:
         st.error(f"数据获取失败: {e}")
         return pd.DataFrame()
-def find_trading_dates(df, target_date):
-    """在数据框中查找目标日期附近的交易日"""
-    if df.empty:
-        return None, None
-    # 查找目标日期之前的最后一个交易日
-    pre_dates = df[df['date'] <= target_date]
-    if len(pre_dates) > 0:
-        pre_date = pre_dates.iloc[-1]
-    else:
-        return None, None
-    # 查找目标日期之后的第一个交易日
-    post_dates = df[df['date'] > target_date]
-    if len(post_dates) > 0:
-        post_date = post_dates.iloc[0]
-    else:
-        return pre_date, None
-    return pre_date, post_date
+@st.cache_data(ttl=3600)
+def get_full_history(symbol):
+    """获取指数全部历史收盘价（本地日线存储）"""
+    try:
+        return get_index_daily(symbol)[['date', 'close']]
+    except Exception as e:
+        st.error(f"数据获取失败: {e}")
+        return pd.DataFrame()
 def calculate_national_day_returns(df, start_year, end_year):
-    """计算国庆节前后收益率"""
-    results = []
-    for year in range(start_year, end_year + 1):
-        try:
-            # 国庆节日期（10月1日）
-            national_day = datetime(year, 10, 1)
-            # 找到节前最后一个交易日（9月30日或之前）
-            pre_date_data, _ = find_trading_dates(df, national_day - timedelta(days=1))
-            if pre_date_data is None:
-                st.warning(f"未找到{year}年国庆节前的交易日数据")
-                continue
-            # 找到节后第一个交易日（10月8日或之后）
-            _, post_day1_data = find_trading_dates(df, national_day + timedelta(days=7))
-            if post_day1_data is None:
-                st.warning(f"未找到{year}年国庆节后的首个交易日数据")
-                continue
-            # 找到节后一周的交易日（约5个交易日后）
-            post_week_data = None
-            post_dates_after = df[df['date'] > post_day1_data['date']]
-            if len(post_dates_after) >= 5:
-                post_week_data = post_dates_after.iloc[4]  # 第5个交易日
-            elif len(post_dates_after) > 0:
-                post_week_data = post_dates_after.iloc[-1]  # 最后一个可用交易日
-            else:
-                post_week_data = post_day1_data  # 如果没有后续数据，使用节后首日
-            # 计算涨跌幅
-            pre_close = pre_date_data['close']
-            post_day1_close = post_day1_data['close']
-            post_week_close = post_week_data['close']
-            day1_return = (post_day1_close / pre_close - 1) * 100
-            week1_return = (post_week_close / pre_close - 1) * 100
-            results.append({
-                '年份': year,
-                '节前日期': pre_date_data['date'].strftime('%Y-%m-%d'),
-                '节前收盘价': round(pre_close, 2),
-                '节后首日日期': post_day1_data['date'].strftime('%Y-%m-%d'),
-                '节后首日收盘价': round(post_day1_close, 2),
-                '节后一周日期': post_week_data['date'].strftime('%Y-%m-%d'),
-                '节后一周收盘价': round(post_week_close, 2),
-                '后1日涨跌幅%': round(day1_return, 2),
-                '后1周涨跌幅%': round(week1_return, 2)
-            })
-        except Exception as e:
-            st.warning(f"处理{year}年数据时出错: {e}")
-            continue
-    return pd.DataFrame(results)
+    """计算国庆节前后收益率（节前最后一个交易日 -> 节后首日 / 节后第6个交易日）"""
+    if df.empty:
+        return pd.DataFrame()
+    dates = df['date'].to_numpy().astype('datetime64[D]')
+    close = df['close'].to_numpy(dtype=np.float64)
+    located = locate_holidays(dates, range(start_year, end_year + 1), ["国庆节"])
+    pre_idx = located['pre_idx'].to_numpy(dtype=np.int64)
+    # 节后尚无交易日的年份（假期未结束）不计入
+    pre_idx = pre_idx[pre_idx + 1 < len(dates)]
+    if len(pre_idx) == 0:
+        return pd.DataFrame()
+    returns = window_returns(close, pre_idx, windows=(1, 6), clamp=True)
+    day1_idx = pre_idx + 1
+    week1_idx = np.minimum(pre_idx + 6, len(dates) - 1)  # 数据不足时取最后一个可用交易日
+    fmt = lambda idx: pd.to_datetime(dates[idx]).strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        '年份': pd.to_datetime(dates[pre_idx]).year,
+        '节前日期': fmt(pre_idx),
+        '节前收盘价': close[pre_idx].round(2),
+        '节后首日日期': fmt(day1_idx),
+        '节后首日收盘价': close[day1_idx].round(2),
+        '节后一周日期': fmt(week1_idx),
+        '节后一周收盘价': close[week1_idx].round(2),
+        '后1日涨跌幅%': returns['节后1日%'].round(2),
+        '后1周涨跌幅%': returns['节后6日%'].round(2)
+    })
+def plot_effect_heatmap(summary, window):
+    """各指数、各节日节后k日平均涨跌幅热力图"""
+    column = f'平均节后{window}日%'
+    pivot = summary.pivot(index='节日', columns='指数', values=column)
+    pivot = pivot.reindex([h for h in HOLIDAYS if h in pivot.index])
+    fig = go.Figure(go.Heatmap(
+        z=pivot.values, x=pivot.columns, y=pivot.index,
+        colorscale='RdYlGn_r', zmid=0,
+        text=pivot.round(2).astype(str).values, texttemplate="%{text}%",
+        colorbar=dict(title='%')
+    ))
+    fig.update_layout(title=f"节后{window}个交易日平均涨跌幅", height=420)
+    return fig
+def plot_matrix_heatmap(matrix, title, decimals=2):
+    """年份 × 分组 的涨跌幅矩阵热力图（红涨绿跌）"""
+    fig = go.Figure(go.Heatmap(
+        z=matrix.values, x=[str(c) for c in matrix.columns], y=matrix.index.astype(str),
+        colorscale='RdYlGn_r', zmid=0,
+        texttemplate=f"%{{z:.{decimals}f}}",
+        colorbar=dict(title='%')
+    ))
+    fig.update_layout(title=title, xaxis_title=matrix.columns.name, yaxis_title='年份',
+                      yaxis=dict(autorange='reversed'), height=max(400, 22 * len(matrix) + 120))
+    return fig
+def seasonality_view():
+    """所选指数的月度、星期、月末月初季节性"""
+    with st.spinner('正在加载指数全部历史数据...'):
+        df = get_full_history(f"sh{index_code}")
+    if df.empty:
+        return
+    st.caption(f"{INDEX_NAMES[index_code]}：{df['date'].iloc[0]:%Y-%m-%d} 至 {df['date'].iloc[-1]:%Y-%m-%d}，"
+               f"共 {len(df)} 个交易日")
+    tab1, tab2, tab3 = st.tabs(["月度涨跌幅", "星期效应", "月末月初效应"])
+    with tab1:
+        matrix, stats = monthly_matrix(df)
+        st.plotly_chart(plot_matrix_heatmap(matrix, "月度涨跌幅（%）"), use_container_width=True)
+        st.dataframe(stats, use_container_width=True)
+    with tab2:
+        matrix, stats = weekday_matrix(df)
+        st.plotly_chart(plot_matrix_heatmap(matrix, "各星期日均涨跌幅（%）", decimals=3),
+                        use_container_width=True)
+        st.dataframe(stats, use_container_width=True)
+    with tab3:
+        matrix, stats = turn_of_month_matrix(df)
+        st.plotly_chart(plot_matrix_heatmap(matrix, "月末(-)/月初(+)各交易日日均涨跌幅（%）", decimals=3),
+                        use_container_width=True)
+        st.dataframe(stats, use_container_width=True)
+def holiday_overview():
+    """全部节日 × 全部指数的节日效应总览"""
+    with st.spinner('正在加载指数数据...'):
+        index_data = {name: get_index_data(f"sh{code}", start_year, end_year)
+                      for code, name in INDEX_NAMES.items()}
+    with st.spinner('正在计算节日前后收益率...'):
+        detail = holiday_effects(index_data, range(start_year, end_year + 1))
+    if detail.empty:
+        st.error("未能计算出有效的收益率数据。")
+        return
+    summary = summarize_effects(detail)
+    window = st.radio("节后窗口（交易日）", WINDOWS, index=0, horizontal=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(plot_effect_heatmap(summary, window), use_container_width=True)
+    with col2:
+        win = summary.pivot(index='节日', columns='指数', values=f'上涨概率节后{window}日%')
+        win = win.reindex([h for h in HOLIDAYS if h in win.index])
+        st.write(f"**节后{window}日上涨概率（%）**")
+        st.dataframe(win, use_container_width=True)
+    st.subheader("📋 节日效应汇总")
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+    with st.expander("逐年明细"):
+        st.dataframe(detail, use_container_width=True, hide_index=True)
 # 主程序
 def app():
+    if mode == "节日效应总览":
+        holiday_overview()
+        return
+    if mode == "季节性分析":
+        seasonality_view()
+        return
     # 显示加载状态
     with st.spinner('正在加载指数数据...'):
         df = get_index_data(f"sh{index_code}", start_year, end_year)
@@ -3,6 +3,7 @@ import pywencai
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from utils.ratelimit import get_limiter
 # 设置页面配置
 st.set_page_config(page_title="股票RPS强度排名", layout="wide")
 st.title("股票RPS强度排名分析")
@@ -35,7 +36,10 @@ def get_index_data(period, concept):
             "Accept-Language": "zh-CN,zh;q=0.9",
             "Connection": "keep-alive"
         }
-        df = pywencai.get(query=query, loop=True, headers=headers)
+        with get_limiter("wencai") as limiter:
+            df = pywencai.get(query=query, loop=True, headers=headers)
+            if df is None:
+                limiter.throttled()
 
         # 3. 检查pywencai返回结果（优先处理None）
         if df is None:
@@ -1,13 +1,15 @@
 
 # etf_momentum_app.py
 import streamlit as st
-import akshare as ak
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from scipy import stats
 from datetime import datetime, timedelta
+
+from utils.akshare_gateway import call as ak_call
+from utils.ohlcv_store import get_etf_daily
 # 初始化ETF数据库（A股+港股）
 ETF_DATABASE = {
     "银行ETF": "512800",
@@ -55,27 +57,14 @@ def calculate_momentum_scores(df, date, trend_window=25):
         '量能指标': round(volume_score, 2),
         '综合评分': max(0, min(100, round(total_score, 2)))
     }
-# 获取历史数据（AKShare接口）
+# 获取历史数据（本地日线存储，仅补齐缺失尾部）
 @st.cache_data(ttl=600)
 def fetch_etf_data_ak(symbol, start_date):
     """适配A股/港股ETF数据获取规则"""
     try:
-        # 使用AKShare获取ETF历史数据
-        df = ak.fund_etf_hist_em(symbol=symbol, period="daily", adjust="qfq")
-        # 列名标准化处理
-        df = df.rename(columns={
-            '日期': 'date',
-            '开盘': 'open',
-            '最高': 'high',
-            '最低': 'low',
-            '收盘': 'close',
-            '成交量': 'volume'
-        })
-        # 日期处理
-        df['date'] = pd.to_datetime(df['date'])
+        df = get_etf_daily(symbol, start=start_date, adjust="qfq", live=True)
         df.set_index('date', inplace=True)
-        # 筛选日期范围
-        return df[df.index >= pd.to_datetime(start_date)]
+        return df
     except Exception as e:
         st.error(f"数据获取失败: {str(e)}")
         return pd.DataFrame()
@@ -281,7 +270,7 @@ def app():
         with col2:
             if st.button("查看实时行情", use_container_width=True):
                 try:
-                    spot_data = ak.fund_etf_spot_em()
+                    spot_data = ak_call("fund_etf_spot_em")
                     st.dataframe(
                         spot_data[["代码", "名称", "最新价", "涨跌幅", "成交量"]]
                         .sort_values("涨跌幅", ascending=False)
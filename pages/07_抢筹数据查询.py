@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import requests
+
+from utils import http
 from datetime import datetime, timedelta
 
 # 设置页面配置
@@ -36,7 +38,8 @@ def get_chip_race_data(race_type: str, date: str = "") -> pd.DataFrame:
             "User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/81.0.4044.138 Safari/537.36 TdxW",
         }
         
-        r = requests.post(url, json=params, headers=headers)
+        # 只读查询接口，失败时允许重试
+        r = http.post(url, retry=True, json=params, headers=headers)
         r.raise_for_status()  # 检查请求是否成功
         data_json = r.json()
         data = data_json.get("datas", [])
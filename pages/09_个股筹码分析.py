@@ -1,58 +1,142 @@
+import re
+
 import streamlit as st
-import akshare as ak
 import pandas as pd
+import plotly.express as px
+
+from utils.cyq import clear_cyq_cache, fetch_cyq, fetch_cyq_batch, summarize_cyq
+from utils.cyq_engine import update_engine
 
 # 设置页面配置
 st.set_page_config(layout="wide", page_title="股票筹码分布查询")
 st.title("股票筹码分布数据")
-st.markdown("数据来源：东方财富网 (通过 akshare 获取)")
+st.markdown("数据来源：东方财富网 (通过 akshare 获取)，或基于日线与换手率的本地筹码引擎")
 
-# 数据获取函数（带缓存，避免重复请求）
-@st.cache_data(ttl=300)  # 缓存5分钟
+# 数据获取函数（筹码数据由 utils.cyq 经 akshare 网关缓存，所有会话共享）
 def get_stock_cyq_data(symbol: str = "000001"):
     try:
-        # 调用akshare接口获取筹码分布数据
-        df = ak.stock_cyq_em(symbol=symbol, adjust="")
-        # 简单数据清洗：处理可能的空值
-        if not df.empty:
-            df = df.dropna(how="all")
-        return df
+        return fetch_cyq(symbol)
     except Exception as e:
         st.error(f"数据获取失败: {str(e)}")
         return pd.DataFrame()
 
+def parse_symbols(text: str):
+    """解析自选股代码：支持逗号、空格、换行分隔，去重并保持输入顺序"""
+    codes = re.findall(r"\d{6}", text)
+    return list(dict.fromkeys(codes))
+
 # 侧边栏控件
 st.sidebar.header("查询设置")
-# 股票代码输入框，默认000001
-stock_symbol = st.sidebar.text_input(
-    "请输入股票代码",
-    value="000001",
-    help="例如：000001（平安银行）、600036（招商银行）"
-)
+mode = st.sidebar.radio("查询模式", ("单只股票", "自选股批量"), index=0)
+source = st.sidebar.radio("数据来源", ("东方财富接口", "本地筹码引擎"), index=0,
+                          help="本地筹码引擎按换手衰减模型由日线递推筹码分布，每个交易日只增量更新一次")
+if source == "本地筹码引擎":
+    cyq_model = st.sidebar.selectbox("成交分布模型", ("triangular", "uniform"),
+                                     format_func=lambda x: {"triangular": "三角分布", "uniform": "均匀分布"}[x])
+if mode == "单只股票":
+    # 股票代码输入框，默认000001
+    stock_symbol = st.sidebar.text_input(
+        "请输入股票代码",
+        value="000001",
+        help="例如：000001（平安银行）、600036（招商银行）"
+    )
+else:
+    watchlist_text = st.sidebar.text_area(
+        "请输入自选股代码",
+        value="000001, 600036, 600519",
+        height=150,
+        help="多个代码用逗号、空格或换行分隔"
+    )
+    lookback = st.sidebar.slider("对比交易日数", min_value=1, max_value=20, value=5)
 # 刷新数据按钮
 if st.sidebar.button("获取最新数据", type="primary"):
-    st.cache_data.clear()
+    clear_cyq_cache()
     st.success("缓存已清除，将加载最新数据")
 
-# 数据加载与显示
-with st.spinner("正在加载数据，请稍候..."):
-    cyq_df = get_stock_cyq_data(symbol=stock_symbol)
+if source == "本地筹码引擎":
+    symbols = [stock_symbol] if mode == "单只股票" else parse_symbols(watchlist_text)
+    if not symbols:
+        st.warning("请输入至少一个6位股票代码")
+        st.stop()
+    with st.spinner(f"正在增量更新 {len(symbols)} 只股票的本地筹码分布..."):
+        engine, errors = update_engine(symbols, model=cyq_model)
+        summary_df = engine.summary()
 
-if cyq_df.empty:
-    st.warning("未获取到有效数据，请检查股票代码是否正确或稍后重试")
+    if errors:
+        st.warning("以下代码日线获取失败：" + "，".join(f"{code}({msg})" for code, msg in errors.items()))
+    if summary_df.empty:
+        st.warning("未获取到有效数据，请检查股票代码是否正确或稍后重试")
+    elif mode == "单只股票":
+        row = summary_df.iloc[0]
+        st.subheader(f"股票 {stock_symbol} 本地筹码分布（{row['日期']}）")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("获利比例", f"{row['获利比例%']:.2f}%")
+        col2.metric("平均成本", f"{row['平均成本']:.2f}")
+        col3.metric("70%成本区间", f"{row['70成本-低']:.2f}-{row['70成本-高']:.2f}")
+        col4.metric("90%成本区间", f"{row['90成本-低']:.2f}-{row['90成本-高']:.2f}")
+        dist_df = engine.distribution(stock_symbol)
+        dist_df = dist_df[dist_df["筹码占比"] > 1e-5].copy()
+        dist_df["状态"] = dist_df["价格"].le(row["收盘价"]).map({True: "获利盘", False: "套牢盘"})
+        fig = px.bar(
+            dist_df,
+            x="筹码占比",
+            y="价格",
+            orientation="h",
+            color="状态",
+            color_discrete_map={"获利盘": "red", "套牢盘": "green"},
+            title="筹码分布"
+        )
+        fig.update_traces(marker_line_width=0)
+        fig.update_layout(height=600, bargap=0)
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.subheader(f"自选股本地筹码汇总（共 {len(summary_df)} 只）")
+        st.dataframe(summary_df, use_container_width=True, hide_index=True)
+elif mode == "单只股票":
+    # 数据加载与显示
+    with st.spinner("正在加载数据，请稍候..."):
+        cyq_df = get_stock_cyq_data(symbol=stock_symbol)
+
+    if cyq_df.empty:
+        st.warning("未获取到有效数据，请检查股票代码是否正确或稍后重试")
+    else:
+        st.subheader(f"股票 {stock_symbol} 筹码分布数据")
+        # 显示数据表格
+        st.dataframe(cyq_df, use_container_width=True)
+
+        # 提供数据下载功能
+        csv_data = cyq_df.to_csv(index=False, encoding="utf-8-sig")
+        st.download_button(
+            label="下载数据为CSV",
+            data=csv_data,
+            file_name=f"{stock_symbol}_筹码分布数据.csv",
+            mime="text/csv"
+        )
 else:
-    st.subheader(f"股票 {stock_symbol} 筹码分布数据")
-    # 显示数据表格
-    st.dataframe(cyq_df, use_container_width=True)
-    
-    # 提供数据下载功能
-    csv_data = cyq_df.to_csv(index=False, encoding="utf-8-sig")
-    st.download_button(
-        label="下载数据为CSV",
-        data=csv_data,
-        file_name=f"{stock_symbol}_筹码分布数据.csv",
-        mime="text/csv"
-    )
+    symbols = parse_symbols(watchlist_text)
+    if not symbols:
+        st.warning("请输入至少一个6位股票代码")
+        st.stop()
+    with st.spinner(f"正在并发获取 {len(symbols)} 只股票的筹码数据..."):
+        frames, errors = fetch_cyq_batch(symbols)
+        summary_df = summarize_cyq(frames, lookback=lookback)
+
+    if errors:
+        st.warning("以下代码获取失败：" + "，".join(f"{code}({msg})" for code, msg in errors.items()))
+    if summary_df.empty:
+        st.warning("未获取到有效数据，请检查股票代码是否正确或稍后重试")
+    else:
+        st.subheader(f"自选股筹码汇总（共 {len(summary_df)} 只）")
+        # 点击表头即可排序
+        st.dataframe(summary_df, use_container_width=True, hide_index=True)
+
+        csv_data = summary_df.to_csv(index=False, encoding="utf-8-sig")
+        st.download_button(
+            label="下载汇总为CSV",
+            data=csv_data,
+            file_name="自选股筹码汇总.csv",
+            mime="text/csv"
+        )
 
 # 显示数据说明
 st.markdown("""
@@ -60,4 +144,6 @@ st.markdown("""
 - 筹码分布数据展示了不同价格区间的筹码占比情况
 - 数据周期：根据接口返回的默认周期（通常包含近期交易日数据）
 - 调整参数：当前使用默认调整方式（adjust=""），如需复权数据可修改参数
+- 自选股批量模式：并发获取各股票筹码数据，汇总最新交易日的获利比例、平均成本及70%/90%成本区间
+- 本地筹码引擎：使用不复权日线，按换手率衰减递推，当日成交筹码在最高/最低价间按所选模型分布；收盘前只计算到上一交易日
 """)
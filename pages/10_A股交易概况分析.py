@@ -1,18 +1,22 @@
 import streamlit as st
-import akshare as ak
 import pandas as pd
 import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from utils.breadth import DIST_EDGES, DIST_LABELS, THRUST_HIGH, THRUST_LOW, get_breadth_recorder, load_breadth_history
+from utils.spot import get_spot_snapshot, snapshot_age
 
 def fetch_market_data():
     try:
-        # 使用AKShare获取A股市场现货数据
-        stock_zh_a_spot_df = ak.stock_zh_a_spot_em()
+        # 全市场快照在所有会话间共享，有效期内直接从内存读取
+        stock_zh_a_spot_df = get_spot_snapshot()
 
         return stock_zh_a_spot_df
     except Exception as e:
         st.error(f"获取数据失败: {e}")
-        return None, None, None
+        return None
 
 def calculate_market_overview(df):
     total_stocks = len(df)
@@ -31,11 +35,10 @@ def calculate_market_overview(df):
     return overview
 
 def calculate_stock_distribution(df):
-    bins = [-np.inf, -10, -7, -5, -3, 0, 3, 5, 7, 10, np.inf]
-    labels = ['跌幅10%以上', '跌幅7%-10%', '跌幅5%-7%', '跌幅3%-5%', '跌幅0%-3%',
-              '涨幅0%-3%', '涨幅3%-5%', '涨幅5%-7%', '涨幅7%-10%', '涨幅10%以上']
-    df['distribution'] = pd.cut(df['涨跌幅'], bins=bins, labels=labels)
-    distribution = df['distribution'].value_counts().sort_index()
+    bins = [-np.inf, *DIST_EDGES, np.inf]
+    labels = DIST_LABELS
+    # 快照为共享数据，不在原表上新增列
+    distribution = pd.cut(df['涨跌幅'], bins=bins, labels=labels).value_counts().sort_index()
     return distribution
 
 def plot_distribution(distribution):
@@ -50,6 +53,38 @@ def plot_distribution(distribution):
                       textposition='auto')  # 自动放置文本位置
     return fig
 
+def plot_intraday_breadth(intraday_df):
+    """盘中涨跌家数与累计成交额走势"""
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        row_heights=[0.6, 0.4], specs=[[{"secondary_y": True}], [{}]])
+    fig.add_trace(go.Scatter(x=intraday_df['时间'], y=intraday_df['上涨家数'], name='上涨家数',
+                             line=dict(color='red')), row=1, col=1)
+    fig.add_trace(go.Scatter(x=intraday_df['时间'], y=intraday_df['下跌家数'], name='下跌家数',
+                             line=dict(color='green')), row=1, col=1)
+    fig.add_trace(go.Scatter(x=intraday_df['时间'], y=intraday_df['涨跌比'], name='涨跌比',
+                             line=dict(color='orange', dash='dot')), row=1, col=1, secondary_y=True)
+    fig.add_trace(go.Scatter(x=intraday_df['时间'], y=intraday_df['累计成交额(亿)'], name='累计成交额(亿)',
+                             fill='tozeroy', line=dict(color='#1f77b4')), row=2, col=1)
+    fig.update_layout(title="盘中市场宽度", height=600, hovermode='x unified')
+    # 隐藏午间休市时段
+    fig.update_xaxes(rangebreaks=[dict(bounds=[11.5, 13], pattern="hour"), dict(bounds=[15, 9.5], pattern="hour")])
+    return fig
+
+def plot_breadth_history(history_df):
+    """AD线、麦克莱伦振荡器与宽度推力"""
+    dates = pd.to_datetime(history_df['日期'], format='%Y%m%d')
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                        subplot_titles=("AD线（累计净上涨家数）", "麦克莱伦振荡器", "宽度推力（10日EMA）"))
+    fig.add_trace(go.Scatter(x=dates, y=history_df['AD线'], name='AD线'), row=1, col=1)
+    fig.add_trace(go.Bar(x=dates, y=history_df['麦克莱伦振荡器'], name='麦克莱伦振荡器',
+                         marker_color=['red' if v > 0 else 'green' for v in history_df['麦克莱伦振荡器']]),
+                  row=2, col=1)
+    fig.add_trace(go.Scatter(x=dates, y=history_df['宽度推力'], name='宽度推力'), row=3, col=1)
+    fig.add_hline(y=THRUST_HIGH, line_dash="dash", line_color="red", row=3, col=1)
+    fig.add_hline(y=THRUST_LOW, line_dash="dash", line_color="green", row=3, col=1)
+    fig.update_layout(height=800, showlegend=False, hovermode='x unified')
+    return fig
+
 # 主应用逻辑
 def app():
     # 设置页面配置
@@ -62,6 +97,7 @@ def app():
         stock_zh_a_spot_df = fetch_market_data()
 
     if stock_zh_a_spot_df is not None:
+        st.caption(f"行情快照更新于 {snapshot_age():.0f} 秒前")
         # 计算市场概览
         overview = calculate_market_overview(stock_zh_a_spot_df)
 
@@ -82,6 +118,34 @@ def app():
         fig_dist = plot_distribution(distribution)
         st.plotly_chart(fig_dist, use_container_width=True)
 
+        # 盘中宽度走势（由进程内后台采样器记录，不额外请求行情）
+        st.subheader("盘中市场宽度")
+        recorder = get_breadth_recorder()
+        intraday_df = recorder.buffer.to_frame()
+        if intraday_df.empty:
+            st.info(f"暂无今日盘中记录，交易时段内本页有人查看时每{recorder.interval}秒自动采样一次")
+        else:
+            st.plotly_chart(plot_intraday_breadth(intraday_df), use_container_width=True)
+        if recorder.last_error:
+            st.caption(f"最近一次采样失败: {recorder.last_error}")
+
+        # 长周期宽度指标（读取本地日度历史，不请求上游）
+        st.subheader("长周期市场宽度")
+        history_df = load_breadth_history()
+        if history_df.empty:
+            st.info("暂无日度宽度历史，收盘后由后台采样器或 `python -m utils.breadth` 写入")
+        else:
+            latest = history_df.iloc[-1]
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("涨停/跌停家数", f"{latest['涨停家数']}/{latest['跌停家数']}")
+            col2.metric("麦克莱伦振荡器", f"{latest['麦克莱伦振荡器']:.1f}")
+            col3.metric("麦克莱伦累积指数", f"{latest['麦克莱伦累积指数']:.1f}")
+            col4.metric("宽度推力", f"{latest['宽度推力']:.3f}",
+                        "触发推力信号" if latest['宽度推力信号'] else None)
+            st.plotly_chart(plot_breadth_history(history_df), use_container_width=True)
+            with st.expander("日度宽度明细"):
+                st.dataframe(history_df.iloc[::-1], use_container_width=True, hide_index=True)
+
         # 导出数据为Excel
         st.subheader("导出数据")
         if st.button("下载当天所有股票数据"):
@@ -1,30 +1,69 @@
 
-import akshare as ak
+import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
-def get_buffett_index():
-    """通过AKShare获取实时巴菲特指标数据"""
-    df = ak.stock_buffett_index_lg()
-    #print(df)
-    # 数据清洗与格式转换
-    latest_data = df.iloc[-1].to_dict()  # 取最新一条数据
+
+from utils.akshare_gateway import call as ak_call
+from utils.ohlcv_store import get_index_daily
+from utils.series_store import get_series_store
+from utils.stats import percentile_rank, sorted_finite
+
+REFRESH_TTL = 6 * 3600  # 本地序列每6小时检查一次上游新数据
+PERCENTILE_BANDS = [0.2, 0.5, 0.8]
+
+
+def _fetch_buffett(last_date):
+    """上游只提供完整序列，由本地存储只追加新日期"""
+    return ak_call("stock_buffett_index_lg")
+
+
+def get_buffett_history():
+    """本地巴菲特指标历史（含总市值/GDP比率）"""
+    df = get_series_store("buffett_index").refresh(_fetch_buffett, ttl=REFRESH_TTL, overwrite_last=1)
+    return df.assign(ratio=df['总市值'] / df['GDP'] * 100)
+
+
+def get_buffett_index(history):
+    """由本地历史计算最新巴菲特指标及近十年/全历史分位数"""
+    latest_data = history.iloc[-1].to_dict()  # 取最新一条数据
+    latest_date = pd.to_datetime(latest_data['日期'])
+    decade = history[history['日期'] > latest_date - pd.DateOffset(years=10)]
     return {
-        'date': pd.to_datetime(latest_data['日期']).strftime('%Y-%m-%d'),
+        'date': latest_date.strftime('%Y-%m-%d'),
         'total_market': round(latest_data['总市值'] / 1e4, 2),  # 转换为万亿元
         'gdp': round(latest_data['GDP'] / 1e4, 2),  # 转换为万亿元
-        'ratio': round(latest_data['总市值'] / latest_data['GDP'] * 100, 1),
-        'decade_percentile': latest_data['近十年分位数'],
-        'history_percentile': latest_data['总历史分位数']
+        'ratio': round(latest_data['ratio'], 1),
+        'decade_percentile': percentile_rank(sorted_finite(decade['ratio']), latest_data['ratio']),
+        'history_percentile': percentile_rank(sorted_finite(history['ratio']), latest_data['ratio'])
     }
+
+
 def get_sh_index():
     """获取上证指数历史数据（含最新交易日）"""
-    df = ak.stock_zh_index_daily(symbol="sh000001")
+    df = get_index_daily("sh000001", live=True)
     return df[['date', 'open', 'high', 'low', 'close', 'volume']]
+
+
+def plot_ratio_history(history):
+    """巴菲特指标全历史走势及分位数带"""
+    levels = np.quantile(sorted_finite(history['ratio']), PERCENTILE_BANDS)
+    fig = go.Figure()
+    fig.add_hrect(y0=levels[0], y1=levels[-1], fillcolor="lightgray", opacity=0.3, line_width=0)
+    fig.add_trace(go.Scatter(x=history['日期'], y=history['ratio'], name='总市值/GDP(%)',
+                             line=dict(color='#1f77b4')))
+    for q, level in zip(PERCENTILE_BANDS, levels):
+        fig.add_hline(y=level, line_dash="dash", line_color="gray",
+                      annotation_text=f"{q:.0%}分位 {level:.1f}%", annotation_position="right")
+    fig.update_layout(title='巴菲特指标历史走势', yaxis_title='总市值/GDP(%)', height=450)
+    return fig
+
+
 def app():
     # 创建Streamlit界面
     st.title("A股巴菲特指标")
-    current_data = get_buffett_index()
+    history = get_buffett_history()
+    current_data = get_buffett_index(history)
     df = get_sh_index().tail(200)
     # 指标分析模块
     with st.container():
@@ -34,6 +73,7 @@ def app():
                   help="总市值/GDP比率")
         st.write(f"总市值：{current_data['total_market']} 万亿元")
         st.write(f"GDP总量：{current_data['gdp']} 万亿元")
+        st.write(f"近十年分位数：{current_data['decade_percentile'] * 100:.1f}%")
         # 动态进度条（根据历史分位数）
         progress_value = current_data['history_percentile'] * 100
         st.progress(progress_value / 100,
@@ -48,6 +88,8 @@ def app():
             st.warning(f"建议仓位：{ratio * 100:.0f}%（合理区间）")
         else:
             st.error("建议仓位：<30%（高风险区域）")
+        # 巴菲特指标全历史走势
+        st.plotly_chart(plot_ratio_history(history), use_container_width=True)
         # 动态K线图（含最新数据）
         fig = go.Figure(data=[go.Candlestick(
             x=df['date'],
@@ -68,4 +110,4 @@ def app():
 
 # 应用入口
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    app()
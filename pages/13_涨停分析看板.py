@@ -2,8 +2,9 @@ import streamlit as st
 import pywencai
 import pandas as pd
 from datetime import datetime, timedelta
-import akshare as ak
 import re
+from utils.ratelimit import get_limiter
+from utils.trade_calendar import get_calendar
 # 设置中文显示
 pd.set_option('display.unicode.ambiguous_as_wide', True)
 pd.set_option('display.unicode.east_asian_width', True)
@@ -56,12 +57,16 @@ exclude_concepts = ['融资融券', '国企改革', '深股通', '沪股通', '
 def fetch_zt_data(target_date_str):
     try:
         query = "{target_date_str}涨停,所属概念,所属同花顺一级行业,所属同花顺二级行业"
-        return pywencai.get(
-            query=query,
-            sort_key=f'涨停封单额[{target_date_str}]',
-            sort_order='desc',
-            loop=True
-        )
+        with get_limiter("wencai") as limiter:
+            df = pywencai.get(
+                query=query,
+                sort_key=f'涨停封单额[{target_date_str}]',
+                sort_order='desc',
+                loop=True
+            )
+            if df is None:
+                limiter.throttled()
+        return df
     except Exception as e:
         st.error(f"数据接口异常: {str(e)}")
         return pd.DataFrame()
@@ -128,51 +133,26 @@ def process_data(raw_df, target_date_str):
         axis=1
     )
     return processed_df
-def get_trade_dates():
-    """获取交易日数据并格式化为两种形式"""
-    try:
-        trade_date_range = ak.tool_trade_date_hist_sina()
-        trade_date_range['trade_date'] = pd.to_datetime(trade_date_range['trade_date']).dt.date
-        trade_date_range['trade_date_str'] = trade_date_range['trade_date'].apply(
-            lambda x: x.strftime('%Y%m%d'))
-        return trade_date_range
-    except Exception as e:
-        st.error(f"获取交易日数据时出错: {str(e)}")
-        return pd.DataFrame()
 def app():
     # 设置页面配置
     st.set_page_config(page_title="涨停分析看板", layout="wide")
-    with st.spinner("正在加载交易日数据..."):
-        trade_date_df = get_trade_dates()
-        if trade_date_df.empty:
-            st.error("无法获取交易日数据，请检查网络连接或稍后再试。")
-            return
-    # 日期处理逻辑
-    trade_dates = trade_date_df['trade_date'].tolist()
+    calendar = get_calendar()
     today = datetime.now().date()
-    # 计算默认日期
-    if trade_dates:
-        if today in trade_dates:
-            default_date = today
-        else:
-            past_dates = [d for d in trade_dates if d <= today]
-            default_date = max(past_dates) if past_dates else trade_dates[-1]
-    else:
-        default_date = today - timedelta(days=1)
+    # 默认日期：不晚于今天的最近交易日
+    default_date = calendar.on_or_before(today) or today - timedelta(days=1)
     # 日期选择组件
     selected_date = st.date_input(
         "📅 选择分析日期",
         value=default_date,
-        min_value=trade_dates[0] if trade_dates else today - timedelta(days=30),
-        max_value=trade_dates[-1] if trade_dates else today,
+        min_value=calendar.first,
+        max_value=calendar.last,
         key="date_selector"
     )
     # 日期有效性验证
     formatted_date_str = selected_date.strftime('%Y%m%d')
-    if trade_dates and selected_date not in trade_dates:
-        past_dates = [d for d in trade_dates if d <= selected_date]
-        if past_dates:
-            nearest_date = max(past_dates)
+    if not calendar.is_trading_day(selected_date):
+        nearest_date = calendar.on_or_before(selected_date)
+        if nearest_date is not None:
             st.warning(f"⚠️ 非交易日，已自动切换至最近交易日: {nearest_date.strftime('%Y%m%d')}")
             selected_date = nearest_date
             formatted_date_str = selected_date.strftime('%Y%m%d')
@@ -3,8 +3,9 @@ from datetime import datetime, timedelta
 import pywencai
 import pandas as pd
 import plotly.graph_objects as go
-import pandas_market_calendars as mcal
 from contextlib import contextmanager
+from utils.ratelimit import get_limiter
+from utils.trade_calendar import get_calendar
 
 @contextmanager
 def st_spinner(text="处理中..."):
@@ -19,14 +20,9 @@ def app():
     st.title('涨停股最高板分析')
 
     with st_spinner("正在获取和处理数据，请稍候..."):
-        # 获取当前日期并往前推20天（增加天数以便滑动）
-        end_date = datetime.now()
-        dates = [(end_date - timedelta(days=x)).strftime('%Y%m%d') for x in range(20)]
-
-        # 获取中国的交易日历
-        nyse = mcal.get_calendar('XSHG')
-        trading_schedule = nyse.schedule(start_date=min(dates), end_date=max(dates))
-        trading_days = trading_schedule.index.strftime('%Y%m%d').tolist()
+        # 当前日期往前推20天（增加天数以便滑动）内的交易日
+        end_date = datetime.now().date()
+        trading_days = [d.strftime('%Y%m%d') for d in get_calendar().range(end_date - timedelta(days=19), end_date)]
 
         # 存储结果的列表
         results = []
@@ -35,7 +31,10 @@ def app():
         for date in trading_days:
             query = f"非ST，{date}连续涨停天数排序，涨停原因"
             try:
-                data = pywencai.get(query=query)
+                with get_limiter("wencai") as limiter:
+                    data = pywencai.get(query=query)
+                    if data is None:
+                        limiter.throttled()
                 if not data.empty:
                     # 获取最高连续涨停天数
                     max_days = data[f'连续涨停天数[{date}]'].max()
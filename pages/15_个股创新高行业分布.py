@@ -1,10 +1,15 @@
 
 import streamlit as st
-import pywencai
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from datetime import datetime, timedelta
-import akshare as ak
+from datetime import datetime
+
+from utils.classify import classify_board
+from utils.high_panel import BACKFILL_DAYS, WINDOWS, get_high_panel, update_from_snapshot
+from utils.new_high import get_new_high_store, multi_day_summary
+from utils.spot import get_spot_snapshot
+from utils.trade_calendar import get_calendar
 # 设置全局显示选项
 pd.set_option('display.unicode.ambiguous_as_wide', True)
 pd.set_option('display.unicode.east_asian_width', True)
@@ -15,13 +20,15 @@ pd.set_option('display.max_colwidth', 100)
 # 数据获取函数（带缓存优化）
 @st.cache_data(ttl=3600, show_spinner=False)
 def get_high_stock_data(selected_date):
-    """根据选定日期获取创新高个股数据"""
-    query_date = selected_date.strftime("%Y%m%d")
-    query = f"{query_date}创新高个股，所属同花顺二级行业,流通市值"
-    return pywencai.get(query=query, query_type="stock", sort_order='desc', loop=True)
+    """根据选定日期获取创新高个股数据（已收盘的交易日读本地存储）"""
+    return get_new_high_store().get(selected_date)
 # 主应用
 def app():
     st.title("📈 创新高个股行业分布分析")
+    mode = st.sidebar.radio("分析模式", ["单日分析", "多日趋势", "本地新高检测"])
+    if mode == "本地新高检测":
+        local_high_view()
+        return
     # 日期选择器
     selected_date = st.date_input(
         "选择分析日期",
@@ -29,75 +36,27 @@ def app():
         min_value=datetime(2020, 1, 1),
         max_value=datetime.now()
     )
-    prev_date = selected_date - timedelta(days=1)
+    calendar = get_calendar()
+    if mode == "多日趋势":
+        multi_day_view(calendar, selected_date)
+        return
+    # 所选日期及其前一个交易日（周一、节后对比的是节前最后一个交易日）
+    days = calendar.window(selected_date, 2)
+    if len(days) < 2:
+        st.error("所选日期之前没有足够的交易日数据。")
+        return
+    prev_date, selected_date = days
     # 数据获取与预处理
-    with st.spinner(f"正在获取{selected_date.strftime('%Y-%m-%d')}及前一日数据..."):
+    with st.spinner(f"正在获取{selected_date.strftime('%Y-%m-%d')}及前一交易日({prev_date.strftime('%Y-%m-%d')})数据..."):
         try:
             # 获取当日数据
             df_today = get_high_stock_data(selected_date)
-            #print(df_today.head(1))
-            # 获取今天的日期并格式化为 YYYYMMDD
-            today = datetime.now().date()
-            trade_date_range = get_trade_dates()
-            if trade_date_range.empty:
-                st.error("无法获取交易日数据，请检查网络连接或稍后再试。")
-                return
-            if not trade_date_range.empty:
-                if today in trade_date_range['trade_date'].values:
-                    default_date = today
-                else:
-                    default_date = trade_date_range[trade_date_range['trade_date'] <= today]['trade_date'].max()
-            else:
-                default_date = today
-            try:
-                # 查找包含"总市值"的列
-                market_value_col = None
-                for col in df_today.columns:
-                    if '总市值' in col:
-                        market_value_col = col
-                        break
-                if market_value_col:
-                    # 如果找到了总市值列
-                    df_today = df_today.rename(columns={
-                        '股票代码': 'symbol',
-                        '股票简称': 'name',
-                        '所属同花顺二级行业': 'industry',
-                        market_value_col: 'shizhi',
-                        '最新价': 'price',
-                        '最新涨跌幅': 'change_percent',
-                        '所属概念': 'gainian'
-                    })[['symbol', 'name', 'industry', 'shizhi', 'gainian', 'price', 'change_percent']]
-                else:
-                    # 如果没有找到总市值列，创建空列
-                    st.warning("未找到总市值数据，市值列将显示为空")
-                    df_today = df_today.rename(columns={
-                        '股票代码': 'symbol',
-                        '股票简称': 'name',
-                        '所属同花顺二级行业': 'industry',
-                        '最新价': 'price',
-                        '最新涨跌幅': 'change_percent',
-                        '所属概念': 'gainian'
-                    })
-                    df_today['shizhi'] = None
-                    df_today = df_today[['symbol', 'name', 'industry', 'shizhi', 'gainian', 'price', 'change_percent']]
-            except Exception as e:
-                # 其他列名也可能变化，使用更通用的处理方式
-                st.warning(f"列名匹配异常")
-            # 获取前一日数据
-            df_prev = get_high_stock_data(prev_date)
-            df_prev = df_prev.rename(columns={
-                '股票代码': 'symbol',
-                '股票简称': 'name',
-                '所属同花顺二级行业': 'industry',
-                '最新价': 'price',
-                '最新涨跌幅': 'change_percent'
-            })[['symbol', 'name', 'industry']]
-            # 创建前一日个股集合
-            prev_high_symbols = set(df_prev['symbol'])
+            if df_today['shizhi'].isna().all():
+                st.warning("未找到总市值数据，市值列将显示为空")
+            # 获取前一交易日数据
+            df_prev = get_high_stock_data(prev_date)[['symbol', 'name', 'industry']]
             # 添加连续创新高标记列
-            df_today['连续创新高'] = df_today['symbol'].apply(
-                lambda x: '✅' if x in prev_high_symbols else '➖'
-            )
+            df_today['连续创新高'] = np.where(df_today['symbol'].isin(df_prev['symbol']), '✅', '➖')
             # =====================================================
             # 行业增长统计
             industry_stats_today = (
@@ -121,13 +80,7 @@ def app():
             industry_stats['growth_rate'] = (industry_stats['growth'] / industry_stats['count_prev'].replace(0,
                                                                                                              1)) * 100
             industry_stats = industry_stats.sort_values('count_today', ascending=False)
-            df_today['shizhi'] = pd.to_numeric(df_today['shizhi']/100000000, errors='coerce')
-            # 数据类型转换
-            df_today['price'] = pd.to_numeric(df_today['price'], errors='coerce')
-            df_today['change_percent'] = pd.to_numeric(
-                df_today['change_percent'].str.replace('%', ''),
-                errors='coerce'
-            )
+            df_today['shizhi'] = pd.to_numeric(df_today['shizhi'], errors='coerce') / 100000000
             # ==================== 布局设计 ====================
             st.subheader(f"创新高个股列表 (共{len(df_today)}只)")
             st.dataframe(
@@ -207,15 +160,106 @@ def app():
             st.info("⚠️ 可能原因：1. 所选日期非交易日 2. 数据源无当日记录")
     # 底部元数据
     st.caption(f"数据更新于: {datetime.now().strftime('%Y-%m-%d %H:%M')} | 数据来源: 同花顺")
-@st.cache_data(ttl=86400)
-def get_trade_dates():
+def multi_day_view(calendar, selected_date):
+    """近N个交易日的连续创新高与行业趋势"""
+    window = st.sidebar.slider("统计窗口（交易日）", min_value=5, max_value=60, value=20, step=5)
+    top_n = st.sidebar.slider("趋势图行业数", min_value=5, max_value=20, value=10)
+    days = calendar.window(selected_date, window)
+    if not days:
+        st.error("所选日期之前没有交易日数据。")
+        return
+    with st.spinner(f"正在加载{days[0].strftime('%Y-%m-%d')}至{days[-1].strftime('%Y-%m-%d')}的创新高数据（已收盘日期读本地存储）..."):
+        frames, errors = get_new_high_store().get_many(days)
+    if errors:
+        st.warning(f"{len(errors)}个交易日获取失败：" + "、".join(d.strftime('%Y-%m-%d') for d in sorted(errors)))
+    if all(df.empty for df in frames.values()):
+        st.error("窗口内没有创新高数据。")
+        return
+    # 没有创新高个股的交易日保留为空行，连续天数不会跨过这些日期
+    stocks, industry_counts = multi_day_summary(frames, days, failed=errors)
+    broken = [d for d in errors if d < max(frames)]
+    if broken:
+        st.caption(f"⚠️ {max(broken).strftime('%Y-%m-%d')} 数据获取失败，无法判断当日是否创新高，"
+                   "连续创新高天数只从其后一个交易日起计算")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("统计交易日", f"{len(frames)}天")
+    col2.metric(f"{max(frames).strftime('%Y-%m-%d')}创新高", f"{len(stocks)}只")
+    col3.metric("连续3日及以上", f"{int((stocks['连续创新高天数'] >= 3).sum())}只")
+    st.subheader("连续创新高个股")
+    st.dataframe(
+        stocks,
+        height=500,
+        hide_index=True,
+        column_config={
+            "symbol": "代码",
+            "name": "名称",
+            "industry": st.column_config.Column("行业", width="medium"),
+            "连续创新高天数": st.column_config.ProgressColumn(
+                "连续创新高天数", format="%d", min_value=0, max_value=len(frames)),
+            "窗口内创新高次数": st.column_config.NumberColumn("窗口内创新高次数", format="%d")
+        }
+    )
+    # 行业创新高数量趋势
+    totals = industry_counts.sum().sort_values(ascending=False)
+    top = totals.head(top_n).index
+    st.subheader(f"近{len(frames)}个交易日行业创新高数量趋势（TOP{top_n}）")
+    trend = industry_counts[top].rename_axis('日期').reset_index().melt(id_vars='日期', var_name='行业', value_name='创新高数量')
+    fig = px.line(trend, x='日期', y='创新高数量', color='行业', markers=True)
+    fig.update_layout(height=450, hovermode='x unified')
+    st.plotly_chart(fig, use_container_width=True)
+    st.subheader("窗口内行业创新高累计次数")
+    fig2 = px.bar(totals.head(20).sort_values().reset_index(name='累计次数').rename(columns={'index': '行业'}),
+                  x='累计次数', y='行业', orientation='h', text_auto=True, labels={'行业': ''})
+    st.plotly_chart(fig2, use_container_width=True)
+def local_high_view():
+    """基于本地全市场日线面板的N日新高检测（任意窗口、任意历史日期，不查询上游）"""
+    panel = get_high_panel()
     try:
-        trade_date_range = ak.tool_trade_date_hist_sina()
-        trade_date_range['trade_date'] = pd.to_datetime(trade_date_range['trade_date']).dt.date
-        return trade_date_range
+        # 收盘后用共享快照追加当日数据
+        update_from_snapshot(get_spot_snapshot)
     except Exception as e:
-        st.error(f"获取交易日数据时出错: {str(e)}")
-        return pd.DataFrame()
+        st.warning(f"当日快照写入失败: {e}")
+    with st.sidebar.expander("回补历史"):
+        st.caption("按个股日线回补最近一段历史（全市场约需20分钟，只需执行一次）")
+        backfill_days = st.number_input("回补自然日数", min_value=30, max_value=1000, value=BACKFILL_DAYS, step=30)
+        if st.button("开始回补"):
+            snapshot = get_spot_snapshot()
+            bar = st.progress(0.0, text="正在回补历史日线...")
+            errors = panel.backfill(
+                snapshot['代码'].tolist(), snapshot['名称'].tolist(), days=int(backfill_days),
+                progress=lambda done, total: bar.progress(done / total, text=f"正在回补历史日线 {done}/{total}")
+            )
+            bar.empty()
+            if errors:
+                st.warning(f"{len(errors)}只股票回补失败")
+    dates = panel.dates
+    if len(dates) == 0:
+        st.info("本地面板暂无数据：收盘后打开本页会自动写入当日数据，或在侧边栏回补历史。")
+        return
+    window = st.sidebar.selectbox("新高窗口（交易日）", WINDOWS, index=len(WINDOWS) - 1)
+    day = st.selectbox("选择交易日", pd.to_datetime(dates[::-1]).date,
+                       format_func=lambda d: d.strftime('%Y-%m-%d'))
+    df = panel.new_highs(day, window)
+    df['板块'] = classify_board(df['代码'])
+    counts = panel.daily_counts()
+    cols = st.columns(len(WINDOWS))
+    for col, w in zip(cols, WINDOWS):
+        col.metric(f"{w}日新高", f"{int(counts.loc[pd.Timestamp(day), f'{w}日新高'])}只")
+    st.subheader(f"{day.strftime('%Y-%m-%d')} 创{window}日新高个股 (共{len(df)}只)")
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.dataframe(df, height=500, hide_index=True)
+    with col2:
+        board_counts = df['板块'].value_counts().rename_axis('板块').reset_index(name='数量')
+        fig = px.pie(board_counts, names='板块', values='数量', title='板块分布')
+        st.plotly_chart(fig, use_container_width=True)
+    st.subheader("全市场新高个股数量走势")
+    fig2 = px.line(counts.rename_axis('日期').reset_index().melt(id_vars='日期', var_name='窗口', value_name='数量'),
+                   x='日期', y='数量', color='窗口')
+    fig2.update_layout(height=400, hovermode='x unified')
+    st.plotly_chart(fig2, use_container_width=True)
+    st.caption(f"本地面板：{pd.Timestamp(dates[0]):%Y-%m-%d} 至 {pd.Timestamp(dates[-1]):%Y-%m-%d}，"
+               f"共{len(dates)}个交易日；价格为不复权价")
 if __name__ == "__main__":
     # 设置页面布局
     #st.set_page_config(page_title="创新高个股行业分析", layout="wide", page_icon="📈")
@@ -1,10 +1,11 @@
 import streamlit as st
-import akshare as ak
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
 
+from utils.valuation import PERCENTILE_YEARS, get_bond_yield_history, get_index_pe_history, load_graham_panel
+
 # 设置页面配置
 st.set_page_config(layout="wide", page_title="格雷厄姆指数计算器")
 st.title("格雷厄姆指数（股债性价比）分析工具")
@@ -12,10 +13,12 @@ st.markdown("格雷厄姆指数 = 盈利收益率 / 10年期国债收益率 = (1
 
 # 侧边栏控件
 st.sidebar.header("参数设置")
+view_mode = st.sidebar.radio("分析模式", ["多指数对比", "单指数分析"])
 index_option = st.sidebar.selectbox(
     "选择指数",
     ["上证50", "沪深300", "中证500", "创业板指"],
-    index=0
+    index=0,
+    disabled=view_mode == "多指数对比"
 )
 
 # 时间范围选择
@@ -27,8 +30,7 @@ date_range = st.sidebar.slider(
     step=30
 )
 
-# 缓存数据获取函数
-@st.cache_data(ttl=3600)  # 每小时更新一次缓存
+# 数据获取函数：完整序列保存在本地，按时间范围切片，拖动滑块不访问上游
 def get_index_pe_data(index_name, days):
     """获取指数的滚动市盈率数据"""
     try:
@@ -40,46 +42,73 @@ def get_index_pe_data(index_name, days):
             "创业板指": "创业板指"
         }
         symbol = index_symbol_map[index_name]
-        
-        # 计算起始日期
-        end_date = datetime.now().strftime("%Y%m%d")
-        start_date = (datetime.now() - timedelta(days=days)).strftime("%Y%m%d")
-        
-        # 获取数据
-        index_pe_df = ak.stock_index_pe_lg(symbol=symbol)
-        
-        # 确保日期列格式正确并筛选时间范围
-        index_pe_df["日期"] = pd.to_datetime(index_pe_df["日期"])
-        mask = (index_pe_df["日期"] >= start_date) & (index_pe_df["日期"] <= end_date)
-        filtered_df = index_pe_df[mask].copy()
-        
-        return filtered_df
+        start_date = datetime.now() - timedelta(days=days)
+        return get_index_pe_history(symbol, start=start_date)
     except Exception as e:
         st.error(f"获取指数市盈率数据失败: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=3600)
 def get_bond_yield_data(days):
-    """获取国债收益率数据（修正：移除end_date参数，通过筛选获取时间范围）"""
+    """获取国债收益率数据（所有指数共用同一份本地序列）"""
     try:
-        # 计算起始和结束日期
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        # 获取数据（注意：该接口没有end_date参数，只传start_date）
-        bond_yield_df = ak.bond_zh_us_rate(start_date=start_date.strftime("%Y%m%d"))
-        
-        # 确保日期列格式正确并筛选时间范围
-        bond_yield_df["日期"] = pd.to_datetime(bond_yield_df["日期"])
-        # 筛选出在时间范围内的数据
-        mask = (bond_yield_df["日期"] >= start_date) & (bond_yield_df["日期"] <= end_date)
-        filtered_df = bond_yield_df[mask].copy()
-        
-        return filtered_df
+        start_date = datetime.now() - timedelta(days=days)
+        return get_bond_yield_history(start=start_date)
     except Exception as e:
         st.error(f"获取国债收益率数据失败: {e}")
         return pd.DataFrame()
 
+@st.cache_data(ttl=3600)
+def get_graham_panel():
+    """四个指数的格雷厄姆指数及3/5/10年滚动分位（全历史计算，展示时再按时间范围切片）"""
+    return load_graham_panel()
+
+def show_multi_index_view(days):
+    """多指数格雷厄姆指数对比"""
+    with st.spinner("正在并发加载各指数数据..."):
+        try:
+            panel, errors = get_graham_panel()
+        except Exception as e:
+            st.error(f"获取数据失败: {e}")
+            return
+    for name, err in errors.items():
+        st.warning(f"{name}数据获取失败: {err}")
+    if panel.empty:
+        st.error("无法获取有效数据，请检查网络连接或稍后重试。")
+        return
+    # 最新指标对比（分位越高表示股票相对债券越便宜）
+    latest = panel.groupby("指数", sort=False).tail(1).set_index("指数")
+    summary = latest[["日期", "滚动市盈率", "中国国债收益率10年", "格雷厄姆指数"]
+                     + [f"{y}年分位" for y in PERCENTILE_YEARS]].copy()
+    summary["日期"] = summary["日期"].dt.strftime("%Y-%m-%d")
+    st.subheader("各指数最新格雷厄姆指数")
+    st.dataframe(
+        summary,
+        use_container_width=True,
+        column_config={
+            "滚动市盈率": st.column_config.NumberColumn(format="%.2f"),
+            "中国国债收益率10年": st.column_config.NumberColumn("10年期国债收益率(%)", format="%.2f"),
+            "格雷厄姆指数": st.column_config.NumberColumn(format="%.2f"),
+            **{f"{y}年分位": st.column_config.ProgressColumn(f"近{y}年分位", min_value=0, max_value=1, format="%.2f")
+               for y in PERCENTILE_YEARS},
+        }
+    )
+    view = panel[panel["日期"] >= datetime.now() - timedelta(days=days)]
+    fig = px.line(view, x="日期", y="格雷厄姆指数", color="指数", title="格雷厄姆指数对比", height=500)
+    fig.add_hline(y=2, line_dash="dash", line_color="green", annotation_text="低估参考线(2.0)", annotation_position="right")
+    fig.add_hline(y=1, line_dash="dash", line_color="red", annotation_text="高估参考线(1.0)", annotation_position="right")
+    st.plotly_chart(fig, use_container_width=True)
+    years = st.radio("滚动分位窗口", PERCENTILE_YEARS, index=1, horizontal=True, format_func=lambda y: f"近{y}年")
+    fig2 = px.line(view, x="日期", y=f"{years}年分位", color="指数",
+                   title=f"格雷厄姆指数近{years}年滚动分位", height=450)
+    fig2.update_yaxes(range=[0, 1], tickformat=".0%")
+    for level, color in ((0.8, "green"), (0.2, "red")):
+        fig2.add_hline(y=level, line_dash="dot", line_color=color)
+    st.plotly_chart(fig2, use_container_width=True)
+
+if view_mode == "多指数对比":
+    show_multi_index_view(date_range)
+    st.stop()
+
 # 数据获取与处理
 with st.spinner("正在获取数据，请稍候..."):
     # 获取数据
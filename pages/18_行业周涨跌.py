@@ -1,21 +1,17 @@
 import streamlit as st
-import akshare as ak
 import pandas as pd
 import plotly.express as px
-from datetime import datetime, timedelta
+
+from utils.sw_weekly import SYMBOLS, get_sw_weekly_store, weekly_matrix
+from utils.trade_calendar import get_calendar
 
 # 初始化session_state存储数据
 if 'analysis_data' not in st.session_state:
     st.session_state.analysis_data = None
 
-# 定义函数：获取上一个周五的日期（格式YYYYMMDD）
-def get_last_friday():
-    today = datetime.now()
-    last_friday = today - timedelta(days=1)
-    # 循环往前找，直到找到周五（weekday=4，周一为0，周日为6）
-    while last_friday.weekday() != 4:
-        last_friday -= timedelta(days=1)
-    return last_friday.strftime("%Y%m%d")
+# 定义函数：获取最近一个已结束交易周的最后一个交易日（格式YYYYMMDD）
+def get_last_week_end():
+    return get_calendar().last_week_end().strftime("%Y%m%d")
 
 # 设置页面配置
 st.set_page_config(
@@ -30,6 +26,54 @@ st.markdown("基于akshare接口获取申万指数周度分析数据，展示涨
 
 # 侧边栏参数设置
 st.sidebar.header("参数设置")
+mode = st.sidebar.radio("分析模式", ["单周分析", "多周热力图"], key="mode_select")
+
+def show_heatmap_view():
+    """近N周各分析类型的 指数 × 周 涨跌幅热力图"""
+    n_weeks = st.sidebar.slider("周数", min_value=4, max_value=52, value=26, step=1)
+    symbols = st.sidebar.multiselect("分析类型", options=SYMBOLS, default=SYMBOLS)
+    if not symbols:
+        st.info("请至少选择一个分析类型")
+        return
+    store = get_sw_weekly_store()
+    try:
+        weeks = store.weeks()[-n_weeks:]
+    except Exception as e:
+        st.error(f"获取周列表失败: {str(e)}")
+        return
+    with st.spinner(f"正在加载近{len(weeks)}周数据（已保存的周不重复下载）..."):
+        frames, errors = store.get_many(symbols, weeks)
+    if errors:
+        st.warning(f"{len(errors)}个周/类型组合获取失败：" +
+                   "、".join(f"{sym}{day}" for sym, day in sorted(errors)))
+    tabs = st.tabs(symbols)
+    for tab, sym in zip(tabs, symbols):
+        with tab:
+            matrix = weekly_matrix(frames, sym)
+            if matrix.empty:
+                st.warning("暂无数据")
+                continue
+            weekly = matrix.drop(columns="区间累计")
+            fig = px.imshow(
+                weekly,
+                labels=dict(x="周", y="", color="涨跌幅(%)"),
+                color_continuous_scale=["green", "white", "red"],  # 跌绿涨红
+                color_continuous_midpoint=0,
+                aspect="auto",
+                text_auto=".1f"
+            )
+            fig.update_layout(
+                title=f"{sym} 近{weekly.shape[1]}周涨跌幅（按区间累计涨跌幅排序）",
+                height=max(400, 22 * len(weekly) + 150)
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            with st.expander("数据表"):
+                st.dataframe(matrix, use_container_width=True)
+
+if mode == "多周热力图":
+    show_heatmap_view()
+    st.caption("数据来源：akshare - 申万指数周度分析接口")
+    st.stop()
 
 # 选择分析类型
 symbol = st.sidebar.selectbox(
@@ -42,7 +86,7 @@ symbol = st.sidebar.selectbox(
 # 日期输入（默认值为上一个周五）
 date = st.sidebar.text_input(
     "日期（格式：YYYYMMDD）",
-    value=get_last_friday(),  # 调用函数设置默认日期
+    value=get_last_week_end(),  # 调用函数设置默认日期
     key="date_input"
 )
 
@@ -54,8 +98,9 @@ get_data = st.sidebar.button("获取数据", type="primary", key="get_data_btn")
 def get_index_analysis_data(symbol, date):
     """获取申万指数周度分析数据"""
     try:
-        df = ak.index_analysis_weekly_sw(symbol=symbol, date=date)
-        return df
+        # 已发布的周直接读本地（首次下载后永久保存），其余日期只查询不保存
+        store = get_sw_weekly_store()
+        return store.get(symbol, date, persist=date in store.weeks())
     except Exception as e:
         st.error(f"数据获取失败: {str(e)}")
         return None
@@ -1,12 +1,12 @@
 import streamlit as st
 import requests
-import pandas as pd
-import json
 import re
-import time
 from datetime import date, timedelta
 import altair as alt # <--- 1. 导入 Altair 库
 
+from utils.sse_margin import (get_margin_store, get_market_margin_store, margin_summary, market_totals,
+                               stock_ranking)
+
 # --- 1. 页面配置 ---
 st.set_page_config(
     layout="wide",
@@ -14,93 +14,31 @@ st.set_page_config(
     page_icon="📈"
 )
 
-# --- 2. 核心数据获取函数 (与上一版相同) ---
-@st.cache_data(ttl=3600)
+# --- 2. 核心数据获取函数（本地区间存储，只补缺失的日期段） ---
 def get_sse_margin_data(stock_code: str, start_date: str, end_date: str):
     """
     获取上海证券交易所指定代码和日期范围的融资融券交易明细。
     """
-    
-    base_url = "https://query.sse.com.cn/commonSoaQuery.do"
-    headers = {
-        "Referer": "http://www.sse.com.cn/",
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.0.0 Safari/537.36"
-    }
-    params = {
-        "jsonCallBack": f"jsonpCallback{int(time.time() * 1000)}",
-        "isPagination": "true",
-        "pageHelp.pageSize": 500,
-        "pageHelp.pageNo": 1,
-        "sqlId": "RZRQ_MX_INFO",
-        "preStockCode": stock_code,
-        "beginDate": start_date,
-        "endDate": end_date,
-        "_": int(time.time() * 1000)
-    }
-
     try:
-        response = requests.get(base_url, headers=headers, params=params)
-        response.raise_for_status() 
-
-        jsonp_text = response.text
-        match = re.search(r'^\w+\((.*)\)$', jsonp_text)
-        
-        if not match:
-            st.error(f"错误: 无法解析JSONP响应。原始响应: {jsonp_text[:200]}...")
-            return None
-
-        json_str = match.group(1)
-        data = json.loads(json_str)
-
-        if data.get('actionErrors') or not data.get('result'):
-            st.warning(f"接口未返回数据: {data.get('actionErrors', '未找到 result 数据')}")
-            return None
-
-        df = pd.DataFrame(data['result'])
-        
-        if 'opDate' in df.columns:
-            df['opDate'] = pd.to_datetime(df['opDate'], format='%Y%m%d')
-
-        column_map = {
-            "opDate": "信用交易日期",
-            "securityCode": "标的证券代码",
-            "securityAbbr": "标的证券简称",
-            "rzye": "融资余额(元)",
-            "rzmre": "融资买入额(元)",
-            "rzche": "融资偿还额(元)",
-            "rqyl": "融券余量",
-            "rqmcl": "融券卖出量",
-            "rqchl": "融券偿还量"
-        }
-        df = df.rename(columns={k: v for k, v in column_map.items() if k in df.columns})
-
-        numeric_cols_cn = ['融资余额(元)', '融资买入额(元)', '融资偿还额(元)', 
-                           '融券余量', '融券卖出量', '融券偿还量']
-        
-        for col in numeric_cols_cn:
-            if col in df.columns:
-                df[col] = pd.to_numeric(
-                    df[col].astype(str).str.replace(',', ''), 
-                    errors='coerce'
-                )
-        
-        if "信用交易日期" in df.columns:
-             df = df.sort_values(by="信用交易日期")
-        
-        display_cols = ['信用交易日期', '标的证券代码', '标的证券简称', 
-                        '融资余额(元)', '融资买入额(元)', '融资偿还额(元)',
-                        '融券余量', '融券卖出量', '融券偿还量']
-        
-        final_cols = [col for col in display_cols if col in df.columns]
-        
-        return df[final_cols]
-
+        df = get_margin_store().get(stock_code, start_date, end_date)
     except requests.exceptions.RequestException as e:
         st.error(f"HTTP 请求失败: {e}")
         return None
     except Exception as e:
         st.error(f"处理数据时发生错误: {e}")
         return None
+    if df.empty:
+        st.warning("接口未返回数据")
+        return None
+    return df
+
+def get_sse_margin_batch(stock_codes: tuple, start_date: str, end_date: str):
+    """多只证券并发查询，返回 (长表, {代码: 错误信息})"""
+    return get_margin_store().get_many(stock_codes, start_date, end_date)
+
+def parse_codes(text: str) -> list:
+    """从输入文本中提取6位证券代码（逗号、空格、换行分隔均可）"""
+    return list(dict.fromkeys(re.findall(r'\d{6}', text)))
 
 # --- 3. Streamlit 页面布局 ---
 
@@ -109,7 +47,18 @@ st.caption("数据来源：上海证券交易所 (SSE)")
 
 # --- 4. 侧边栏输入 ---
 st.sidebar.header("查询条件")
-stock_code = st.sidebar.text_input("证券代码 (如: 600030)", "600030")
+mode = st.sidebar.radio("查询模式", ["单只查询", "批量筛选", "全市场排名"], horizontal=True)
+if mode == "单只查询":
+    stock_code = st.sidebar.text_input("证券代码 (如: 600030)", "600030")
+elif mode == "全市场排名":
+    top_n = st.sidebar.slider("排名显示数量", 10, 100, 20, step=10)
+else:
+    codes_text = st.sidebar.text_area(
+        "证券代码列表",
+        "600030\n600519\n601318\n600036",
+        height=150,
+        help="可用逗号、空格或换行分隔，仅支持沪市证券"
+    )
 
 # 默认日期
 default_end = date(2025, 11, 2)
@@ -122,8 +71,110 @@ date_range = st.sidebar.date_input(
 )
 query_button = st.sidebar.button("开始查询")
 
-# --- 5. 主页面逻辑 ---
-if query_button:
+# --- 5. 批量筛选 ---
+def show_batch_view(codes, start_str, end_str):
+    with st.spinner(f"正在并发查询 {len(codes)} 只证券从 {start_str} 到 {end_str} 的数据..."):
+        long_df, errors = get_sse_margin_batch(tuple(codes), start_str, end_str)
+    if errors:
+        st.warning("以下证券查询失败：" + "；".join(f"{code}: {err}" for code, err in errors.items()))
+    if long_df.empty:
+        st.error("查询失败或未返回任何数据，请检查证券代码或日期范围。")
+        return
+
+    st.subheader(f"融资区间汇总（{long_df['标的证券代码'].nunique()} 只证券）")
+    st.dataframe(margin_summary(long_df), use_container_width=True, hide_index=True)
+
+    st.subheader("融资余额(亿元) 走势对比")
+    chart_df = long_df.assign(**{"融资余额(亿元)": long_df["融资余额(元)"] / 100_000_000})
+    chart = alt.Chart(chart_df).mark_line().encode(
+        x=alt.X('信用交易日期', title='日期'),
+        y=alt.Y('融资余额(亿元)', title='融资余额 (亿元)'),
+        color=alt.Color('标的证券简称', title='证券'),
+        tooltip=[
+            alt.Tooltip('标的证券简称', title='证券'),
+            alt.Tooltip('信用交易日期', title='日期', format='%Y-%m-%d'),
+            alt.Tooltip('融资余额(亿元)', title='余额(亿元)', format=',.2f')
+        ]
+    ).interactive()
+    st.altair_chart(chart, use_container_width=True)
+
+    st.subheader(f"详细数据（长表，共 {len(long_df)} 条）")
+    st.dataframe(long_df, use_container_width=True)
+    st.download_button(
+        "下载明细 CSV",
+        long_df.to_csv(index=False).encode("utf-8-sig"),
+        file_name=f"sse_margin_{start_str}_{end_str}.csv",
+        mime="text/csv"
+    )
+
+# --- 6. 全市场排名 ---
+def get_market_margin(start_dt, end_dt):
+    """全市场逐日明细（本地逐日存储，缺失日期并发获取）"""
+    progress = st.progress(0.0, text="正在加载全市场两融明细...")
+    panel, errors = get_market_margin_store().get_days(
+        start_dt, end_dt,
+        progress=lambda done, total: progress.progress(done / total, text=f"正在获取缺失交易日 {done}/{total}")
+    )
+    progress.empty()
+    return panel, errors
+
+def show_market_view(start_dt, end_dt, top_n):
+    panel, errors = get_market_margin(start_dt, end_dt)
+    if errors:
+        st.warning("以下日期获取失败：" + "；".join(f"{day}: {err}" for day, err in errors.items()))
+    if panel.empty:
+        st.error("所选区间内没有全市场两融数据。")
+        return
+
+    totals = market_totals(panel)
+    latest = totals.iloc[-1]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("最新融资余额 (亿元)", f"{latest['融资余额(亿元)']:,.2f}",
+                f"{latest['融资余额(亿元)'] - totals['融资余额(亿元)'].iloc[0]:,.2f}")
+    col2.metric("区间融资净买入 (亿元)", f"{totals['融资净买入(亿元)'].sum():,.2f}")
+    col3.metric("两融标的数量", f"{int(latest['标的数量'])}")
+
+    st.subheader("沪市融资余额(亿元) 走势")
+    chart = alt.Chart(totals).mark_line(point=True).encode(
+        x=alt.X('信用交易日期', title='日期'),
+        y=alt.Y('融资余额(亿元)', title='融资余额 (亿元)', scale=alt.Scale(zero=False)),
+        tooltip=[
+            alt.Tooltip('信用交易日期', title='日期', format='%Y-%m-%d'),
+            alt.Tooltip('融资余额(亿元)', title='余额(亿元)', format=',.2f'),
+            alt.Tooltip('融资净买入(亿元)', title='净买入(亿元)', format=',.2f')
+        ]
+    ).interactive()
+    st.altair_chart(chart, use_container_width=True)
+
+    ranking = stock_ranking(panel)
+    col_buy, col_sell = st.columns(2)
+    with col_buy:
+        st.subheader(f"融资净买入前 {top_n}")
+        st.dataframe(ranking.head(top_n), use_container_width=True, hide_index=True)
+    with col_sell:
+        st.subheader(f"融资净卖出前 {top_n}")
+        st.dataframe(ranking.tail(top_n).iloc[::-1], use_container_width=True, hide_index=True)
+
+    with st.expander(f"全部标的（共 {len(ranking)} 只）"):
+        st.dataframe(ranking, use_container_width=True, hide_index=True)
+
+# --- 7. 主页面逻辑 ---
+if query_button and mode == "全市场排名":
+    if len(date_range) != 2:
+        st.sidebar.error("请选择完整的日期范围（开始日期和结束日期）。")
+    else:
+        start_dt, end_dt = date_range
+        show_market_view(start_dt, end_dt, top_n)
+elif query_button and mode == "批量筛选":
+    codes = parse_codes(codes_text)
+    if len(date_range) != 2:
+        st.sidebar.error("请选择完整的日期范围（开始日期和结束日期）。")
+    elif not codes:
+        st.sidebar.error("请输入至少一个6位证券代码。")
+    else:
+        start_dt, end_dt = date_range
+        show_batch_view(codes, start_dt.strftime("%Y%m%d"), end_dt.strftime("%Y%m%d"))
+elif query_button:
     if len(date_range) != 2:
         st.sidebar.error("请选择完整的日期范围（开始日期和结束日期）。")
     else:
@@ -0,0 +1 @@
+"""各页面共用的数据获取、缓存与计算工具"""
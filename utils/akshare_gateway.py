@@ -0,0 +1,174 @@
+"""akshare 调用网关
+
+页面和工具模块的 akshare 调用统一经过 call(函数名, **参数)，每个函数在 POLICIES 中登记缓存策略：
+- source：所属数据源，调用经过该数据源的共享限流器；
+- ttl：结果在进程内和本地磁盘上的有效期（秒），0 表示不缓存；
+- columns：只保留的列，减少内存和磁盘占用。
+
+相同参数的并发调用只向上游发送一次请求，其余调用等待同一结果；
+缓存同时写入本地磁盘，进程重启后在有效期内直接读取，不会集中回源；
+上游失败时若本地有过期结果则退回使用过期结果。
+返回的 DataFrame 为副本，调用方可以修改。
+"""
+import hashlib
+import threading
+import time
+from concurrent.futures import Future
+
+import akshare as ak
+import pandas as pd
+
+from utils.ratelimit import get_limiter
+from utils.storage import data_dir
+
+class Policy:
+    """单个 akshare 函数的缓存策略"""
+
+    def __init__(self, source: str, ttl: float = 0, columns=None, persist: bool = True):
+        self.source = source
+        self.ttl = ttl
+        self.columns = columns
+        self.persist = persist
+
+
+POLICIES = {
+    # 实时行情：短时共享，不落盘
+    "stock_zh_a_spot_em": Policy("eastmoney", ttl=30, persist=False),
+    "fund_etf_spot_em": Policy("eastmoney", ttl=60, persist=False,
+                               columns=["代码", "名称", "最新价", "涨跌幅", "成交量", "成交额"]),
+    "stock_cyq_em": Policy("eastmoney", ttl=300),
+    # 低频更新的列表与日历
+    "fund_new_found_em": Policy("eastmoney", ttl=3600),
+    "tool_trade_date_hist_sina": Policy("sina", ttl=12 * 3600, columns=["trade_date"]),
+    # 以下函数的结果另有本地序列/面板/K线存储，网关只负责限流与合并并发请求，不再重复缓存
+    "stock_buffett_index_lg": Policy("legulegu"),
+    "stock_index_pe_lg": Policy("legulegu"),
+    "bond_zh_us_rate": Policy("eastmoney"),
+    "stock_zh_index_daily_em": Policy("eastmoney"),
+    "fund_etf_hist_em": Policy("eastmoney"),
+    "stock_zh_a_hist": Policy("eastmoney",
+                              columns=["日期", "开盘", "最高", "最低", "收盘", "成交量", "成交额", "换手率"]),
+    "index_analysis_weekly_sw": Policy("swsresearch"),
+    "index_analysis_week_month_sw": Policy("swsresearch"),
+}
+
+
+def _cache_key(name: str, kwargs: dict) -> str:
+    text = name + repr(sorted(kwargs.items()))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class AkshareGateway:
+    """akshare 调用网关（进程内单例，通过 get_gateway 获取）"""
+
+    def __init__(self, policies=POLICIES):
+        self.policies = policies
+        self._cache = {}  # (函数名, 缓存键) -> (写入时间, DataFrame)
+        self._inflight = {}  # 缓存键 -> Future
+        self._lock = threading.Lock()
+
+    def _path(self, name: str, key: str):
+        return data_dir("akshare", name) / f"{key}.pkl"
+
+    def _lookup(self, name: str, key: str, lifetime: float, persist: bool, stale: bool = False):
+        """内存或磁盘中的缓存结果，过期（且不要求过期结果）时返回 None"""
+        hit = self._cache.get((name, key))
+        if hit is None and persist:
+            path = self._path(name, key)
+            if path.exists():
+                try:
+                    hit = pd.read_pickle(path)
+                    self._cache[(name, key)] = hit
+                except Exception:
+                    hit = None
+        if hit is None:
+            return None
+        return hit[1] if stale or time.time() - hit[0] < lifetime else None
+
+    def _fetch(self, name: str, policy: Policy, kwargs: dict) -> pd.DataFrame:
+        with get_limiter(policy.source) as limiter:
+            df = getattr(ak, name)(**kwargs)
+            if df is None:
+                limiter.throttled()
+        if df is None:
+            return pd.DataFrame()
+        if policy.columns and isinstance(df, pd.DataFrame):
+            df = df[[col for col in policy.columns if col in df.columns]]
+        return df
+
+    def call(self, name: str, **kwargs) -> pd.DataFrame:
+        """按登记的策略调用 akshare 函数
+
+        :raises KeyError: 函数未在 POLICIES 中登记
+        """
+        policy = self.policies[name]
+        key = _cache_key(name, kwargs)
+        lifetime = policy.ttl
+        persist = policy.persist and lifetime > 0
+        if lifetime > 0:
+            df = self._lookup(name, key, lifetime, persist)
+            if df is not None:
+                return df.copy()
+        # 同一参数的并发调用只由第一个线程请求上游
+        with self._lock:
+            future = self._inflight.get(key)
+            # 等锁期间上一个请求可能已完成并写入缓存，此时不再重复请求
+            hit = self._cache.get((name, key)) if future is None and lifetime > 0 else None
+            if hit is not None and time.time() - hit[0] < lifetime:
+                return hit[1].copy()
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            return future.result().copy()
+        try:
+            df = self._fetch(name, policy, kwargs)
+        except Exception as e:
+            stale = self._lookup(name, key, lifetime, persist, stale=True) if lifetime > 0 else None
+            if stale is None:
+                self._finish(key, future, error=e)
+                raise
+            df = stale
+        else:
+            if lifetime > 0 and not df.empty:
+                entry = (time.time(), df)
+                self._cache[(name, key)] = entry
+                if persist:
+                    pd.to_pickle(entry, self._path(name, key))
+        self._finish(key, future, result=df)
+        return df.copy()
+
+    def _finish(self, key: str, future: Future, result=None, error=None):
+        """结束一次上游请求：缓存已写入后再移出进行中列表，并唤醒等待的线程"""
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def invalidate(self, name: str):
+        """清除某函数的全部缓存（内存与磁盘）"""
+        with self._lock:
+            self._cache = {k: v for k, v in self._cache.items() if k[0] != name}
+        for path in data_dir("akshare", name).glob("*.pkl"):
+            path.unlink(missing_ok=True)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> AkshareGateway:
+    """获取 akshare 调用网关（进程内单例）"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = AkshareGateway()
+        return _gateway
+
+
+def call(name: str, **kwargs) -> pd.DataFrame:
+    """通过共享网关调用 akshare 函数，见 AkshareGateway.call"""
+    return get_gateway().call(name, **kwargs)
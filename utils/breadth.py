@@ -0,0 +1,330 @@
+"""市场宽度（涨跌家数、成交额、涨跌分布）统计、盘中记录与日度历史
+
+盘中记录器每次采样都要抓取一次全市场快照（约60页行情），因此默认每 60 秒采样一次，
+且只在最近 IDLE_TIMEOUT 秒内有人打开过市场宽度页面时采样；无人查看时不请求上游，
+盘中走势相应留空。
+"""
+import threading
+import time
+from datetime import datetime
+from datetime import time as dtime
+
+import numpy as np
+import pandas as pd
+
+from utils.classify import BOARDS, CAP_LABELS, classify_board, classify_cap, limit_flags
+from utils.spot import get_spot_snapshot
+from utils.storage import data_dir
+from utils.trade_calendar import get_calendar
+
+DIST_EDGES = [-10, -7, -5, -3, 0, 3, 5, 7, 10]
+DIST_LABELS = ['跌幅10%以上', '跌幅7%-10%', '跌幅5%-7%', '跌幅3%-5%', '跌幅0%-3%',
+               '涨幅0%-3%', '涨幅3%-5%', '涨幅5%-7%', '涨幅7%-10%', '涨幅10%以上']
+
+# 麦克莱伦指标与宽度推力参数
+MCCLELLAN_FAST = 0.10  # 19日EMA
+MCCLELLAN_SLOW = 0.05  # 39日EMA
+THRUST_ALPHA = 2 / 11  # 10日EMA
+THRUST_LOW, THRUST_HIGH, THRUST_WINDOW = 0.40, 0.615, 10
+
+# 连续竞价时段
+TRADING_SESSIONS = [(dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0))]
+CLOSE_TIME = dtime(15, 0)
+DEFAULT_INTERVAL = 60  # 采样间隔（秒），每次采样抓取一次全市场快照
+IDLE_TIMEOUT = 600  # 页面超过这么久（秒）无人查看时暂停采样
+
+RECORD_DTYPE = np.dtype([
+    ("ts", "i8"),
+    ("up", "i4"),
+    ("down", "i4"),
+    ("flat", "i4"),
+    ("amount", "f8"),
+    ("avg_change", "f4"),
+    ("dist", "i4", (len(DIST_LABELS),)),
+])
+
+
+def compute_breadth(df: pd.DataFrame) -> dict:
+    """由全市场快照计算宽度指标"""
+    change = df["涨跌幅"].to_numpy(dtype=np.float64)
+    change = change[np.isfinite(change)]
+    up = int((change > 0).sum())
+    down = int((change < 0).sum())
+    # 与 pd.cut 默认右闭区间一致
+    dist = np.bincount(np.searchsorted(DIST_EDGES, change, side="left"), minlength=len(DIST_LABELS))
+    return {
+        "up": up,
+        "down": down,
+        "flat": int(len(change) - up - down),
+        "amount": float(np.nansum(df["成交额"].to_numpy(dtype=np.float64))),
+        "avg_change": float(change.mean()) if len(change) else np.nan,
+        "dist": dist,
+    }
+
+
+def is_trading_time(now: datetime) -> bool:
+    """是否处于连续竞价时段"""
+    if not get_calendar().is_trading_day(now):
+        return False
+    t = now.time()
+    return any(start <= t <= end for start, end in TRADING_SESSIONS)
+
+
+class BreadthRingBuffer:
+    """定长、基于结构化数组的环形缓冲区，保存一个交易日的宽度采样"""
+
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=RECORD_DTYPE)
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, ts: int, stats: dict):
+        with self._lock:
+            rec = self._data[self._next]
+            rec["ts"] = ts
+            for key in ("up", "down", "flat", "amount", "avg_change", "dist"):
+                rec[key] = stats[key]
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def records(self) -> np.ndarray:
+        """按时间顺序返回记录副本"""
+        with self._lock:
+            if self._size < self.capacity:
+                return self._data[:self._size].copy()
+            return np.concatenate((self._data[self._next:], self._data[:self._next]))
+
+    def to_frame(self) -> pd.DataFrame:
+        return records_to_frame(self.records())
+
+    def load(self, records: np.ndarray):
+        with self._lock:
+            records = records[-self.capacity:]
+            self._data[:len(records)] = records
+            self._size = len(records)
+            self._next = self._size % self.capacity
+
+
+def records_to_frame(records: np.ndarray) -> pd.DataFrame:
+    """将宽度记录转换为 DataFrame"""
+    df = pd.DataFrame({
+        "时间": pd.to_datetime(records["ts"], unit="s", utc=True)
+                .tz_convert(datetime.now().astimezone().tzinfo).tz_localize(None),
+        "上涨家数": records["up"],
+        "下跌家数": records["down"],
+        "平盘家数": records["flat"],
+        "累计成交额(亿)": records["amount"] / 1e8,
+        "平均涨跌幅": records["avg_change"],
+    })
+    df["涨跌比"] = (df["上涨家数"] / (df["下跌家数"] + 1e-5)).round(2)
+    return df
+
+
+def _day_path(day: str):
+    return data_dir("breadth", "intraday") / f"{day}.npy"
+
+
+def load_intraday(day: str) -> pd.DataFrame:
+    """读取已落盘的某日盘中宽度记录"""
+    path = _day_path(day)
+    if not path.exists():
+        return pd.DataFrame()
+    return records_to_frame(np.load(path))
+
+
+class BreadthRecorder:
+    """后台采样线程：页面有人查看时每隔 interval 秒由共享快照计算宽度并写入当日缓冲区，收盘后落盘"""
+
+    def __init__(self, interval: int = DEFAULT_INTERVAL):
+        self.interval = int(interval)
+        # 4小时连续竞价 + 余量
+        self.capacity = 4 * 3600 // self.interval + 64
+        self.day = None
+        self.buffer = BreadthRingBuffer(self.capacity)
+        self.flushed = False
+        self.last_error = None
+        self.viewed_at = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _roll_day(self, day: str):
+        """切换交易日：先落盘前一日，再加载（若有）新一日已落盘的数据"""
+        if self.day is not None and not self.flushed:
+            self.flush()
+        self.day = day
+        self.buffer = BreadthRingBuffer(self.capacity)
+        self.flushed = False
+        path = _day_path(day)
+        if path.exists():
+            self.buffer.load(np.load(path))
+
+    def flush(self):
+        if self.day is None or len(self.buffer) == 0:
+            return
+        np.save(_day_path(self.day), self.buffer.records())
+        self.flushed = True
+
+    def touch(self):
+        """记录页面查看时间，IDLE_TIMEOUT 内有人查看才继续采样"""
+        self.viewed_at = time.time()
+
+    def sample(self, now: datetime = None):
+        """采样一次（非交易时段或页面无人查看时不采样，收盘后落盘一次）"""
+        now = now or datetime.now()
+        day = now.strftime("%Y%m%d")
+        if day != self.day:
+            self._roll_day(day)
+        if is_trading_time(now):
+            if now.timestamp() - self.viewed_at > IDLE_TIMEOUT:
+                return
+            stats = compute_breadth(get_spot_snapshot(ttl=self.interval))
+            self.buffer.append(int(now.timestamp()), stats)
+            self.flushed = False
+        elif now.time() > CLOSE_TIME and not self.flushed:
+            had_samples = len(self.buffer) > 0
+            self.flush()
+            if had_samples:
+                record_daily_breadth(get_spot_snapshot(ttl=self.interval), self.day)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="breadth-recorder", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_breadth_recorder(interval: int = DEFAULT_INTERVAL) -> BreadthRecorder:
+    """获取并启动进程内唯一的宽度记录器（同时记为一次页面查看）"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = BreadthRecorder(interval)
+            _recorder._roll_day(datetime.now().strftime("%Y%m%d"))
+        _recorder.touch()
+        _recorder.start()
+        return _recorder
+
+
+# ---------- 日度宽度历史 ----------
+def _history_path():
+    return data_dir("breadth") / "daily.csv"
+
+
+def daily_aggregates(df: pd.DataFrame) -> dict:
+    """由收盘快照计算当日宽度汇总：涨跌平家数、涨跌停家数、成交额及各板块/市值档上涨比例"""
+    stats = compute_breadth(df)
+    up_limit, down_limit = limit_flags(df)
+    row = {
+        "上涨家数": stats["up"],
+        "下跌家数": stats["down"],
+        "平盘家数": stats["flat"],
+        "涨停家数": int(up_limit.sum()),
+        "跌停家数": int(down_limit.sum()),
+        "成交额(亿)": round(stats["amount"] / 1e8, 2),
+        "平均涨跌幅": round(stats["avg_change"], 4),
+    }
+    groups = pd.DataFrame({
+        "板块": classify_board(df["代码"]).to_numpy(),
+        "市值": classify_cap(df["总市值"]),
+        "上涨": (df["涨跌幅"] > 0).to_numpy(),
+    })
+    board_ratio = groups.groupby("板块")["上涨"].mean()
+    cap_ratio = groups.groupby("市值", observed=False)["上涨"].mean()
+    for board in BOARDS:
+        row[f"上涨比例-{board}"] = round(float(board_ratio.get(board, np.nan)), 4)
+    for label in CAP_LABELS:
+        row[f"上涨比例-{label}"] = round(float(cap_ratio.get(label, np.nan)), 4)
+    return row
+
+
+def _next_indicators(prev: dict, up: int, down: int, recent_thrust) -> dict:
+    """在前一日指标状态上递推当日的 AD 线、麦克莱伦振荡器与宽度推力"""
+    total = up + down
+    rana = (up - down) / total * 1000 if total else 0.0  # 比例调整后的净上涨家数
+    ratio = up / total if total else 0.5
+    if prev is None:
+        ad, ema_fast, ema_slow, summation, thrust = 0.0, rana, rana, 0.0, ratio
+    else:
+        ad = prev["AD线"]
+        ema_fast = prev["EMA19"] + MCCLELLAN_FAST * (rana - prev["EMA19"])
+        ema_slow = prev["EMA39"] + MCCLELLAN_SLOW * (rana - prev["EMA39"])
+        summation = prev["麦克莱伦累积指数"]
+        thrust = prev["宽度推力"] + THRUST_ALPHA * (ratio - prev["宽度推力"])
+    oscillator = ema_fast - ema_slow
+    window = list(recent_thrust)[-(THRUST_WINDOW - 1):] + [thrust]
+    return {
+        "净上涨家数": up - down,
+        "AD线": ad + (up - down),
+        "EMA19": round(ema_fast, 4),
+        "EMA39": round(ema_slow, 4),
+        "麦克莱伦振荡器": round(oscillator, 4),
+        "麦克莱伦累积指数": round(summation + oscillator, 4),
+        "宽度推力": round(thrust, 4),
+        "宽度推力信号": bool(thrust > THRUST_HIGH and min(window) < THRUST_LOW),
+    }
+
+
+def load_breadth_history() -> pd.DataFrame:
+    """读取本地日度宽度历史（按日期升序）"""
+    path = _history_path()
+    if not path.exists():
+        return pd.DataFrame()
+    return pd.read_csv(path, dtype={"日期": str})
+
+
+def record_daily_breadth(df: pd.DataFrame, day: str) -> bool:
+    """收盘后写入一行日度宽度，并在上一行指标状态上递推，不重算历史
+
+    同一日重复写入时覆盖该日；早于最后一行的日期忽略。
+    :return: 是否写入
+    """
+    history = load_breadth_history()
+    row = daily_aggregates(df)
+    if not history.empty:
+        last_day = history["日期"].iloc[-1]
+        if day < last_day:
+            return False
+        if day == last_day:
+            history = history.iloc[:-1]
+        elif (history["成交额(亿)"].iloc[-1] == row["成交额(亿)"]
+              and history["上涨家数"].iloc[-1] == row["上涨家数"]):
+            # 与上一交易日完全相同，说明当日休市、快照仍为上一交易日数据
+            return False
+    prev = history.iloc[-1].to_dict() if not history.empty else None
+    recent = history["宽度推力"].tail(THRUST_WINDOW - 1) if not history.empty else []
+    row.update(_next_indicators(prev, row["上涨家数"], row["下跌家数"], recent))
+    new_row = pd.DataFrame([{"日期": day, **row}])
+    history = pd.concat([history, new_row], ignore_index=True) if not history.empty else new_row
+    history.to_csv(_history_path(), index=False)
+    return True
+
+
+if __name__ == "__main__":
+    # 收盘后任务：python -m utils.breadth
+    now = datetime.now()
+    if now.time() <= CLOSE_TIME:
+        print("尚未收盘，跳过")
+    else:
+        written = record_daily_breadth(get_spot_snapshot(), now.strftime("%Y%m%d"))
+        print("已写入日度宽度" if written else "当日无需写入")
@@ -0,0 +1,76 @@
+"""A股代码板块、市值分档、涨跌停价等向量化分类工具"""
+import numpy as np
+import pandas as pd
+
+# 代码前缀 -> 板块，长前缀优先匹配（如 688 科创板先于 6 上证）
+BOARD_PREFIXES = [
+    ("688", "科创板"),
+    ("689", "科创板"),
+    ("920", "北交所"),
+    ("300", "创业板"),
+    ("301", "创业板"),
+    ("302", "创业板"),
+    ("6", "上证"),
+    ("0", "深证"),
+    ("8", "北交所"),
+    ("4", "北交所"),
+]
+BOARDS = ["上证", "深证", "创业板", "科创板", "北交所"]
+
+# 市值分档（元），右开区间
+CAP_EDGES = [20e8, 100e8, 1000e8]
+CAP_LABELS = ['微盘股(<20亿)', '小盘股(20-100亿)', '中盘股(100-1000亿)', '大盘股(>1000亿)']
+
+# 各板块涨跌幅限制
+LIMIT_PCT = {"上证": 0.10, "深证": 0.10, "创业板": 0.20, "科创板": 0.20, "北交所": 0.30}
+ST_LIMIT_PCT = 0.05
+
+
+def classify_board(codes: pd.Series) -> pd.Series:
+    """按代码前缀划分板块，无法识别的记为"其他"
+
+    先对代码去重再做字符串前缀查表，多日数据重复出现的代码只处理一次。
+    """
+    ids, uniques = pd.factorize(codes.astype(str))
+    uniques = pd.Series(uniques).str.zfill(6)
+    lookup3 = {p: b for p, b in BOARD_PREFIXES if len(p) == 3}
+    lookup1 = {p: b for p, b in BOARD_PREFIXES if len(p) == 1}
+    boards = uniques.str[:3].map(lookup3).fillna(uniques.str[:1].map(lookup1)).fillna("其他").to_numpy()
+    return pd.Series(boards[ids], index=codes.index)
+
+
+def bucket(values, edges, labels) -> pd.Categorical:
+    """按右开区间分档（searchsorted），NaN 记为缺失"""
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.searchsorted(edges, values, side="right")
+    codes = np.where(np.isfinite(values), codes, -1)
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
+def classify_cap(market_cap) -> pd.Categorical:
+    """按总市值（元）分档"""
+    return bucket(market_cap, CAP_EDGES, CAP_LABELS)
+
+
+def limit_pct(board: pd.Series, names: pd.Series = None) -> np.ndarray:
+    """各股票涨跌幅限制比例，ST 股按 5% 计（创业板、科创板、北交所的 ST 股仍按板块规则）"""
+    pct = board.map(LIMIT_PCT).fillna(0.10).to_numpy(dtype=np.float64)
+    if names is not None:
+        is_st = names.astype(str).str.contains("ST", regex=False).to_numpy()
+        main_board = board.isin(["上证", "深证"]).to_numpy()
+        pct = np.where(is_st & main_board, ST_LIMIT_PCT, pct)
+    return pct
+
+
+def limit_flags(df: pd.DataFrame):
+    """由快照（需含 代码/名称/最新价/昨收）判断涨停、跌停
+
+    :return: (是否涨停, 是否跌停) 两个布尔数组
+    """
+    pct = limit_pct(classify_board(df["代码"]), df.get("名称"))
+    pre_close = df["昨收"].to_numpy(dtype=np.float64)
+    price = df["最新价"].to_numpy(dtype=np.float64)
+    up_limit = np.round(pre_close * (1 + pct), 2)
+    down_limit = np.round(pre_close * (1 - pct), 2)
+    with np.errstate(invalid="ignore"):
+        return price >= up_limit - 1e-6, price <= down_limit + 1e-6
@@ -0,0 +1,77 @@
+"""筹码分布（CYQ）数据获取与汇总"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.akshare_gateway import call as ak_call, get_gateway
+
+MAX_WORKERS = 8
+
+
+def fetch_cyq(symbol: str, adjust: str = "") -> pd.DataFrame:
+    """获取单只股票的筹码分布数据（经 akshare 网关按股票代码缓存，所有会话共享）"""
+    df = ak_call("stock_cyq_em", symbol=symbol, adjust=adjust)
+    if not df.empty:
+        df = df.dropna(how="all")
+    return df
+
+
+def clear_cyq_cache():
+    """清空筹码数据缓存"""
+    get_gateway().invalidate("stock_cyq_em")
+
+
+def fetch_cyq_batch(symbols, adjust: str = ""):
+    """并发获取多只股票的筹码分布
+
+    :return: (数据字典 {代码: DataFrame}, 错误字典 {代码: 错误信息})
+    """
+    frames, errors = {}, {}
+
+    def _task(symbol):
+        try:
+            return symbol, fetch_cyq(symbol, adjust), None
+        except Exception as e:
+            return symbol, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, max(1, len(symbols)))) as pool:
+        for symbol, df, err in pool.map(_task, symbols):
+            if err is not None:
+                errors[symbol] = err
+            elif df is None or df.empty:
+                errors[symbol] = "无数据"
+            else:
+                frames[symbol] = df
+    return frames, errors
+
+
+def summarize_cyq(frames: dict, lookback: int = 5) -> pd.DataFrame:
+    """将多只股票的筹码序列合并后一次性计算汇总指标
+
+    每只股票取最新交易日的获利比例、平均成本及70%/90%成本区间，
+    并与 lookback 个交易日前对比，得到获利比例和平均成本的变化。
+    """
+    if not frames:
+        return pd.DataFrame()
+    long_df = pd.concat(frames, names=["代码", "_row"]).reset_index(level="_row", drop=True).reset_index()
+    long_df["日期"] = pd.to_datetime(long_df["日期"])
+    long_df = long_df.sort_values(["代码", "日期"])
+    grouped = long_df.groupby("代码", sort=False)
+    long_df["前获利比例"] = grouped["获利比例"].shift(lookback)
+    long_df["前平均成本"] = grouped["平均成本"].shift(lookback)
+    latest = long_df.groupby("代码", sort=False).tail(1).set_index("代码")
+
+    summary = pd.DataFrame({
+        "日期": latest["日期"].dt.strftime("%Y-%m-%d"),
+        "获利比例%": (latest["获利比例"] * 100).round(2),
+        f"获利比例{lookback}日变化%": ((latest["获利比例"] - latest["前获利比例"]) * 100).round(2),
+        "平均成本": latest["平均成本"].round(2),
+        f"平均成本{lookback}日变化%": ((latest["平均成本"] / latest["前平均成本"] - 1) * 100).round(2),
+        "70成本-低": latest["70成本-低"].round(2),
+        "70成本-高": latest["70成本-高"].round(2),
+        "70集中度%": (latest["70集中度"] * 100).round(2),
+        "90成本-低": latest["90成本-低"].round(2),
+        "90成本-高": latest["90成本-高"].round(2),
+        "90集中度%": (latest["90集中度"] * 100).round(2),
+    })
+    return summary.reset_index()
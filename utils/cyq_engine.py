@@ -0,0 +1,305 @@
+"""本地筹码分布（CYQ）计算引擎
+
+基于日线 OHLC 与换手率，按换手衰减模型递推筹码分布：
+    当日筹码 = 前日筹码 × (1 - 换手率 × 衰减系数) + 当日成交筹码 × 换手率 × 衰减系数
+当日成交筹码在 [最低价, 最高价] 上按三角分布（峰值为当日均价）或均匀分布展开。
+
+所有股票的分布存放在 (股票数 × 价格格点数) 的矩阵中，每个交易日只需一次向量化更新；
+每只股票的状态单独保存在本地，新交易日到来时只计算增量。
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.akshare_gateway import call as ak_call
+from utils.storage import data_dir
+from utils.trade_calendar import last_settled_day
+
+DEFAULT_BINS = 400
+WARMUP_DAYS = 400  # 新股票首次建模时回溯的自然日数，衰减后更早的筹码影响可忽略
+GRID_MARGIN = 0.15  # 价格格点相对历史最高/最低价的余量
+CLOSE_TIME = time(15, 30)  # 收盘后日线数据视为定型
+RECHECK_INTERVAL = 6 * 3600  # 停牌等没有新K线的股票，同一截止日内再次向上游确认的最短间隔（秒）
+
+
+def _triangular_cdf(x, low, high, mode):
+    """三角分布累积分布函数（支持 low == high 的退化情形）"""
+    width = high - low
+    left = mode - low
+    right = high - mode
+    safe_width = np.where(width > 0, width, 1.0)
+    safe_left = np.where(left > 0, left, 1.0)
+    safe_right = np.where(right > 0, right, 1.0)
+    rising = (x - low) ** 2 / (safe_width * safe_left)
+    falling = 1 - (high - x) ** 2 / (safe_width * safe_right)
+    cdf = np.where(x <= low, 0.0, np.where(x <= mode, rising, np.where(x < high, falling, 1.0)))
+    return np.where(width > 0, cdf, (x >= low).astype(float))
+
+
+def _uniform_cdf(x, low, high):
+    """均匀分布累积分布函数（支持 low == high 的退化情形）"""
+    width = high - low
+    cdf = np.clip((x - low) / np.where(width > 0, width, 1.0), 0.0, 1.0)
+    return np.where(width > 0, cdf, (x >= low).astype(float))
+
+
+class ChipEngine:
+    """多只股票的筹码分布状态
+
+    :param symbols: 股票代码列表
+    :param bins: 每只股票的价格格点数
+    :param model: 当日成交筹码分布模型，"triangular" 或 "uniform"
+    :param decay: 换手衰减系数
+    """
+
+    def __init__(self, symbols, bins=DEFAULT_BINS, model="triangular", decay=1.0):
+        self.symbols = list(symbols)
+        self.bins = int(bins)
+        self.model = model
+        self.decay = float(decay)
+        n = len(self.symbols)
+        self.grid_low = np.full(n, np.nan)
+        self.grid_step = np.full(n, np.nan)
+        self.dist = np.zeros((n, self.bins))
+        self.last_close = np.full(n, np.nan)
+        self.last_date = np.full(n, np.datetime64("NaT"), dtype="datetime64[D]")
+
+    # ---------- 价格格点 ----------
+    def prices(self):
+        """各股票格点中心价格矩阵 (股票数 × 格点数)"""
+        return self.grid_low[:, None] + (np.arange(self.bins) + 0.5) * self.grid_step[:, None]
+
+    def _regrid(self, rows, low, high):
+        """为价格越界的股票重建格点，并按累积分布插值迁移已有筹码"""
+        new_low = np.fmin(self.grid_low[rows], low * (1 - GRID_MARGIN))
+        new_high = np.fmax(self.grid_low[rows] + self.grid_step[rows] * self.bins, high * (1 + GRID_MARGIN))
+        new_step = (new_high - new_low) / self.bins
+        for i, row in enumerate(rows):
+            old_mass = self.dist[row]
+            if np.isfinite(self.grid_low[row]) and old_mass.sum() > 0:
+                old_edges = self.grid_low[row] + np.arange(self.bins + 1) * self.grid_step[row]
+                new_edges = new_low[i] + np.arange(self.bins + 1) * new_step[i]
+                cum = np.concatenate(([0.0], np.cumsum(old_mass)))
+                self.dist[row] = np.diff(np.interp(new_edges, old_edges, cum))
+            self.grid_low[row] = new_low[i]
+            self.grid_step[row] = new_step[i]
+
+    # ---------- 递推 ----------
+    def update(self, date, open_, high, low, close, turnover):
+        """用一个交易日的数据更新所有股票的筹码分布
+
+        各参数均为与 symbols 对齐的数组，停牌（NaN）的股票保持不变；
+        turnover 为换手率（%）。
+        """
+        open_, high, low, close, turnover = (np.asarray(a, dtype=float) for a in (open_, high, low, close, turnover))
+        valid = np.isfinite(high) & np.isfinite(low) & np.isfinite(close) & np.isfinite(turnover)
+        if not valid.any():
+            return
+        grid_high = self.grid_low + self.grid_step * self.bins
+        out_of_grid = valid & (~np.isfinite(self.grid_low) | (low < self.grid_low) | (high > grid_high))
+        if out_of_grid.any():
+            rows = np.flatnonzero(out_of_grid)
+            self._regrid(rows, low[rows], high[rows])
+
+        rows = np.flatnonzero(valid)
+        lo, hi = low[rows, None], high[rows, None]
+        edges = self.grid_low[rows, None] + np.arange(self.bins + 1) * self.grid_step[rows, None]
+        if self.model == "uniform":
+            cdf = _uniform_cdf(edges, lo, hi)
+        else:
+            avg = (open_[rows] + high[rows] + low[rows] + close[rows]) / 4
+            mode = np.clip(np.where(np.isfinite(avg), avg, close[rows]), low[rows], high[rows])[:, None]
+            cdf = _triangular_cdf(edges, lo, hi, mode)
+        today = np.diff(cdf, axis=1)
+
+        weight = np.clip(turnover[rows] / 100 * self.decay, 0.0, 1.0)[:, None]
+        fresh = self.dist[rows].sum(axis=1, keepdims=True) == 0
+        weight = np.where(fresh, 1.0, weight)
+        self.dist[rows] = self.dist[rows] * (1 - weight) + today * weight
+        self.last_close[rows] = close[rows]
+        self.last_date[rows] = np.datetime64(pd.Timestamp(date).date(), "D")
+
+    def update_panel(self, bars: pd.DataFrame):
+        """按日期顺序逐日更新
+
+        :param bars: 长格式日线，包含 代码/日期/开盘/最高/最低/收盘/换手率 列
+        """
+        if bars.empty:
+            return
+        index = {s: i for i, s in enumerate(self.symbols)}
+        bars = bars[bars["代码"].isin(index)]
+        fields = ["开盘", "最高", "最低", "收盘", "换手率"]
+        dates = np.sort(bars["日期"].unique())
+        panels = [bars.pivot_table(index="日期", columns="代码", values=f, aggfunc="last")
+                  .reindex(index=dates, columns=self.symbols).to_numpy() for f in fields]
+        for t, date in enumerate(dates):
+            self.update(date, *(panel[t] for panel in panels))
+
+    # ---------- 指标 ----------
+    def summary(self) -> pd.DataFrame:
+        """计算所有股票的获利比例、平均成本与70%/90%成本区间"""
+        prices = self.prices()
+        total = self.dist.sum(axis=1)
+        safe_total = np.where(total > 0, total, 1.0)
+        weights = self.dist / safe_total[:, None]
+        cum = np.cumsum(weights, axis=1)
+
+        def _quantile(q):
+            idx = (cum < q).sum(axis=1).clip(0, self.bins - 1)
+            return prices[np.arange(len(idx)), idx]
+
+        profit = np.where(prices <= self.last_close[:, None], weights, 0.0).sum(axis=1)
+        result = {
+            "代码": self.symbols,
+            "日期": pd.to_datetime(self.last_date).strftime("%Y-%m-%d"),
+            "收盘价": np.round(self.last_close, 2),
+            "获利比例%": np.round(profit * 100, 2),
+            "平均成本": np.round((weights * prices).sum(axis=1), 2),
+        }
+        for pct, (q_low, q_high) in {"70": (0.15, 0.85), "90": (0.05, 0.95)}.items():
+            low, high = _quantile(q_low), _quantile(q_high)
+            result[f"{pct}成本-低"] = np.round(low, 2)
+            result[f"{pct}成本-高"] = np.round(high, 2)
+            result[f"{pct}集中度%"] = np.round((high - low) / (high + low) * 100, 2)
+        df = pd.DataFrame(result)
+        return df[total > 0].reset_index(drop=True)
+
+    def distribution(self, symbol) -> pd.DataFrame:
+        """单只股票的筹码分布（价格, 筹码占比）"""
+        row = self.symbols.index(symbol)
+        total = self.dist[row].sum()
+        return pd.DataFrame({
+            "价格": self.prices()[row],
+            "筹码占比": self.dist[row] / total if total > 0 else self.dist[row],
+        })
+
+    # ---------- 持久化 ----------
+    @staticmethod
+    def _state_path(symbol, model):
+        return data_dir("cyq", model) / f"{symbol}.npz"
+
+    def save(self):
+        """逐只股票保存状态"""
+        for i, symbol in enumerate(self.symbols):
+            if self.dist[i].sum() == 0:
+                continue
+            np.savez(
+                self._state_path(symbol, self.model),
+                grid_low=self.grid_low[i], grid_step=self.grid_step[i], dist=self.dist[i],
+                last_close=self.last_close[i], last_date=self.last_date[i],
+            )
+
+    @classmethod
+    def load(cls, symbols, bins=DEFAULT_BINS, model="triangular", decay=1.0):
+        """加载已保存的状态，缺失或格点数不一致的股票从零开始"""
+        engine = cls(symbols, bins=bins, model=model, decay=decay)
+        for i, symbol in enumerate(engine.symbols):
+            path = cls._state_path(symbol, model)
+            if not path.exists():
+                continue
+            with np.load(path) as state:
+                if state["dist"].shape[0] != engine.bins:
+                    continue
+                engine.grid_low[i] = state["grid_low"]
+                engine.grid_step[i] = state["grid_step"]
+                engine.dist[i] = state["dist"]
+                engine.last_close[i] = state["last_close"]
+                engine.last_date[i] = state["last_date"]
+        return engine
+
+
+def fetch_daily_bars(symbol: str, start_date: str, end_date: str = None) -> pd.DataFrame:
+    """获取个股不复权日线（含换手率），end_date 缺省为今天"""
+    end_date = end_date or datetime.now().strftime("%Y%m%d")
+    df = ak_call("stock_zh_a_hist", symbol=symbol, period="daily", start_date=start_date, end_date=end_date, adjust="")
+    if df.empty:
+        return df
+    df = df[["日期", "开盘", "最高", "最低", "收盘", "换手率"]].copy()
+    df["日期"] = pd.to_datetime(df["日期"])
+    df["代码"] = symbol
+    return df
+
+
+_checked_lock = threading.Lock()
+
+
+def _checked_path(model):
+    return data_dir("cyq", model) / "checked.json"
+
+
+def _load_checked(model) -> dict:
+    """{代码: [截止日, 检查时间戳]}：上次向上游确认时没有更新到截止日的股票"""
+    path = _checked_path(model)
+    try:
+        return json.loads(path.read_text()) if path.exists() else {}
+    except ValueError:
+        return {}
+
+
+def update_engine(symbols, model="triangular", decay=1.0, max_workers=8):
+    """加载本地状态，仅拉取每只股票上次更新之后的日线并递推
+
+    停牌等拉取后仍未更新到最后定型交易日的股票会记录检查时间，
+    RECHECK_INTERVAL 内不再重复请求上游。
+
+    :return: (ChipEngine, 错误字典 {代码: 错误信息})
+    """
+    engine = ChipEngine.load(symbols, model=model, decay=decay)
+    warmup_start = (datetime.now() - timedelta(days=WARMUP_DAYS)).strftime("%Y%m%d")
+    # 盘中的当日K线尚未定型，只递推到最后一个已收盘的交易日，避免写入不完整的状态
+    now = datetime.now()
+    settled = last_settled_day(CLOSE_TIME, now)
+    cutoff = np.datetime64(settled, "D")
+    with _checked_lock:
+        checked = _load_checked(model)
+    starts = {}
+    for i, symbol in enumerate(engine.symbols):
+        if not np.isnat(engine.last_date[i]) and engine.last_date[i] >= cutoff:
+            continue
+        mark = checked.get(symbol)
+        if mark and mark[0] == settled.isoformat() and now.timestamp() - mark[1] < RECHECK_INTERVAL:
+            continue
+        if np.isnat(engine.last_date[i]):
+            starts[symbol] = warmup_start
+        else:
+            starts[symbol] = (pd.Timestamp(engine.last_date[i]) + timedelta(days=1)).strftime("%Y%m%d")
+    stale = list(starts)
+    end_date = settled.strftime("%Y%m%d")
+
+    errors = {}
+
+    def _task(symbol):
+        try:
+            return fetch_daily_bars(symbol, starts[symbol], end_date), None
+        except Exception as e:
+            return None, str(e)
+
+    frames = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, max(1, len(stale)))) as pool:
+        for symbol, (df, err) in zip(stale, pool.map(_task, stale)):
+            if err is not None:
+                errors[symbol] = err
+            elif df is not None and not df.empty:
+                frames.append(df)
+    if frames:
+        bars = pd.concat(frames, ignore_index=True)
+        engine.update_panel(bars[bars["日期"] <= pd.Timestamp(cutoff)])
+        engine.save()
+    if stale:
+        rows = {symbol: i for i, symbol in enumerate(engine.symbols)}
+        with _checked_lock:
+            checked = _load_checked(model)
+            for symbol in stale:
+                if symbol in errors:
+                    continue
+                last = engine.last_date[rows[symbol]]
+                if np.isnat(last) or last < cutoff:
+                    checked[symbol] = [settled.isoformat(), now.timestamp()]
+                else:
+                    checked.pop(symbol, None)
+            _checked_path(model).write_text(json.dumps(checked))
+    return engine, errors
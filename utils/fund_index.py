@@ -0,0 +1,86 @@
+"""新发基金数据的只读索引
+
+数据按成立日期排序后建一次索引，由所有会话共享：
+基金类型转为类别编号，日期区间用 searchsorted 直接得到行区间，
+类型筛选是对区间内类别编号查一次布尔表；按月、按类型的募集份额汇总预先算好。
+所有数组只读，调用方拿到的筛选结果都是新对象。
+"""
+import numpy as np
+import pandas as pd
+
+DATE_COLUMN = '成立日期'
+TYPE_COLUMN = '基金类型'
+SHARE_COLUMN = '募集份额'
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+class FundIndex:
+    """新发基金只读索引"""
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.dropna(subset=[DATE_COLUMN]).sort_values(DATE_COLUMN, kind='stable', ignore_index=True)
+        self.frame = df
+        self.dates = _readonly(df[DATE_COLUMN].to_numpy(dtype='datetime64[D]'))
+        categorical = pd.Categorical(df[TYPE_COLUMN].astype(str))
+        self.types = list(categorical.categories)
+        self.type_codes = _readonly(categorical.codes.astype(np.int16))
+        self.shares = _readonly(df[SHARE_COLUMN].to_numpy(dtype=np.float64) if SHARE_COLUMN in df.columns
+                                else np.full(len(df), np.nan))
+        self.monthly = self._monthly_aggregates()
+
+    def _monthly_aggregates(self) -> pd.DataFrame:
+        """月份 × 基金类型 的募集份额合计与成立数量（长表）"""
+        months = self.dates.astype('datetime64[M]')
+        agg = pd.DataFrame({
+            '月份': months,
+            '_code': self.type_codes,
+            SHARE_COLUMN: self.shares,
+        }).groupby(['月份', '_code']).agg(**{
+            '募集份额合计': (SHARE_COLUMN, 'sum'),
+            '成立数量': (SHARE_COLUMN, 'size'),
+        }).reset_index()
+        agg[TYPE_COLUMN] = np.asarray(self.types, dtype=object)[agg.pop('_code')]
+        return agg
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(self.dates[0]).date() if len(self.dates) else None
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(self.dates[-1]).date() if len(self.dates) else None
+
+    def _type_mask(self, types) -> np.ndarray:
+        mask = np.zeros(len(self.types), dtype=bool)
+        mask[[self.types.index(t) for t in types if t in self.types]] = True
+        return mask
+
+    def select(self, types, start, end) -> np.ndarray:
+        """成立日期在 [start, end] 且类型在 types 中的行号"""
+        lo = np.searchsorted(self.dates, np.datetime64(start, 'D'), side='left')
+        hi = np.searchsorted(self.dates, np.datetime64(end, 'D'), side='right')
+        hit = self._type_mask(types)[self.type_codes[lo:hi]]
+        return lo + np.flatnonzero(hit)
+
+    def metrics(self, rows: np.ndarray) -> dict:
+        """所选行的募集份额合计、平均、最大、最小（忽略缺失值）"""
+        shares = self.shares[rows]
+        shares = shares[np.isfinite(shares)]
+        if len(shares) == 0:
+            return {}
+        return {'sum': shares.sum(), 'mean': shares.mean(), 'max': shares.max(), 'min': shares.min()}
+
+    def rows(self, rows: np.ndarray) -> pd.DataFrame:
+        """所选行的明细（新对象）"""
+        return self.frame.iloc[rows]
+
+    def monthly_slice(self, types, start, end) -> pd.DataFrame:
+        """预计算的月度汇总中，所选类型、所选月份范围的部分"""
+        months = self.monthly['月份']
+        keep = (self.monthly[TYPE_COLUMN].isin(types)
+                & (months >= np.datetime64(start, 'M')) & (months <= np.datetime64(end, 'M')))
+        return self.monthly[keep]
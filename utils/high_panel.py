@@ -0,0 +1,274 @@
+"""全市场日线最高价/收盘价面板与N日新高检测
+
+面板为 日期 × 股票 的二维数组（最高价、收盘价），每个交易日收盘后由全市场快照追加一行，
+首次使用时可按个股日线回补历史。每追加一行，用向后累计最大值一次算出该日
+20/60/120/250 日新高标记，按位存入标记矩阵，任意历史日期、任意窗口的查询都只读本地。
+价格为不复权价，与实时快照口径一致；除权日前后的新高判断可能偏保守。
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from datetime import time as dtime
+
+import numpy as np
+import pandas as pd
+
+from utils.akshare_gateway import call as ak_call
+from utils.storage import data_dir
+from utils.trade_calendar import get_calendar, last_settled_day
+
+WINDOWS = (20, 60, 120, 250)
+CLOSE_TIME = dtime(15, 0)  # 收盘后快照即为当日日线
+BACKFILL_DAYS = 400  # 回补历史的自然日数，覆盖250个交易日
+MAX_WORKERS = 8
+ARRAYS = ("dates", "symbols", "names", "high", "close", "flags")
+
+
+def _new_high_flags(high: np.ndarray) -> np.ndarray:
+    """整段面板的新高标记（按窗口逐个滚动求最大值），窗口内数据不足的记为非新高"""
+    frame = pd.DataFrame(high)
+    flags = np.zeros(high.shape, dtype=np.uint8)
+    with np.errstate(invalid="ignore"):
+        for bit, window in enumerate(WINDOWS):
+            rolling_max = frame.rolling(window, min_periods=window).max().to_numpy()
+            flags |= ((high >= rolling_max) & np.isfinite(rolling_max)).astype(np.uint8) << bit
+    return flags
+
+
+def _last_row_flags(high: np.ndarray) -> np.ndarray:
+    """只计算最后一行的新高标记：对最近250行做一次倒序累计最大值，各窗口取对应行"""
+    tail = high[-max(WINDOWS):][::-1]
+    running_max = np.fmax.accumulate(tail, axis=0)
+    running_count = np.cumsum(np.isfinite(tail), axis=0)
+    today = tail[0]
+    flags = np.zeros(high.shape[1], dtype=np.uint8)
+    with np.errstate(invalid="ignore"):
+        for bit, window in enumerate(WINDOWS):
+            if window > len(tail):
+                break
+            valid = running_count[window - 1] == window
+            flags |= (valid & (today >= running_max[window - 1])).astype(np.uint8) << bit
+    return flags
+
+
+class HighPanel:
+    """全市场最高价/收盘价面板（进程内单例，通过 get_high_panel 获取）"""
+
+    def __init__(self):
+        self.root = data_dir("high_panel")
+        self._state = None  # dict[数组名 -> ndarray]，整体替换保证读取一致
+        self._lock = threading.RLock()
+
+    def _path(self, name):
+        return self.root / f"{name}.npy"
+
+    def load(self) -> dict:
+        if self._state is None:
+            with self._lock:
+                if self._state is None:
+                    if all(self._path(n).exists() for n in ARRAYS):
+                        self._state = {n: np.load(self._path(n), allow_pickle=False) for n in ARRAYS}
+                    else:
+                        self._state = {
+                            "dates": np.empty(0, dtype="M8[D]"),
+                            "symbols": np.empty(0, dtype="U6"),
+                            "names": np.empty(0, dtype="U16"),
+                            "high": np.empty((0, 0), dtype=np.float32),
+                            "close": np.empty((0, 0), dtype=np.float32),
+                            "flags": np.empty((0, 0), dtype=np.uint8),
+                        }
+        return self._state
+
+    def _save(self, state: dict):
+        for name in ARRAYS:
+            np.save(self._path(name), state[name], allow_pickle=False)
+        self._state = state
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.load()["dates"]
+
+    def last_date(self):
+        dates = self.dates
+        return None if len(dates) == 0 else pd.Timestamp(dates[-1]).date()
+
+    @staticmethod
+    def _align(state: dict, symbols: np.ndarray, names: np.ndarray) -> dict:
+        """把新出现的股票并入股票索引（保持排序），历史行补 NaN"""
+        new = np.setdiff1d(symbols, state["symbols"])
+        if len(new) == 0:
+            return state
+        merged = np.union1d(state["symbols"], new)
+        pos = np.searchsorted(merged, state["symbols"])
+        n_days = len(state["dates"])
+        result = {"dates": state["dates"], "symbols": merged}
+        for name, fill, dtype in (("high", np.nan, np.float32), ("close", np.nan, np.float32), ("flags", 0, np.uint8)):
+            array = np.full((n_days, len(merged)), fill, dtype=dtype)
+            array[:, pos] = state[name]
+            result[name] = array
+        all_names = np.full(len(merged), "", dtype="U16")
+        all_names[pos] = state["names"]
+        all_names[np.searchsorted(merged, symbols)] = names
+        result["names"] = all_names
+        return result
+
+    def append_day(self, day, snapshot: pd.DataFrame) -> bool:
+        """用收盘后全市场快照（需含 代码/名称/最高/最新价）追加一个交易日
+
+        同一日重复写入时覆盖该日；收盘价与上一行完全相同视为休市，不写入。
+        :return: 是否写入
+        """
+        df = snapshot.dropna(subset=["最新价"])
+        df = df[df["最新价"] > 0].drop_duplicates("代码")
+        if df.empty:
+            return False
+        day = np.datetime64(pd.Timestamp(day).date(), "D")
+        symbols = df["代码"].astype(str).to_numpy().astype("U6")
+        with self._lock:
+            state = dict(self.load())
+            if len(state["dates"]) and day < state["dates"][-1]:
+                return False
+            if len(state["dates"]) and day == state["dates"][-1]:
+                state = {**state, "dates": state["dates"][:-1], "high": state["high"][:-1],
+                         "close": state["close"][:-1], "flags": state["flags"][:-1]}
+            state = self._align(state, symbols, df["名称"].astype(str).to_numpy().astype("U16"))
+            pos = np.searchsorted(state["symbols"], symbols)
+            high = np.full(len(state["symbols"]), np.nan, dtype=np.float32)
+            close = np.full(len(state["symbols"]), np.nan, dtype=np.float32)
+            high[pos] = df["最高"].to_numpy(dtype=np.float32)
+            close[pos] = df["最新价"].to_numpy(dtype=np.float32)
+            if len(state["dates"]) and np.array_equal(close, state["close"][-1], equal_nan=True):
+                # 与上一交易日完全相同，说明当日休市、快照仍为上一交易日数据
+                return False
+            state["dates"] = np.append(state["dates"], day)
+            state["high"] = np.vstack([state["high"], high])
+            state["close"] = np.vstack([state["close"], close])
+            state["flags"] = np.vstack([state["flags"], _last_row_flags(state["high"])])
+            self._save(state)
+            return True
+
+    def backfill(self, symbols, names=None, days: int = BACKFILL_DAYS, fetch=None, progress=None):
+        """按个股日线回补最近 days 个自然日的历史，已有日期以本地数据为准，回补后整体重算新高标记
+
+        只回补到最后一个已收盘的交易日，盘中未定型的当日K线留给收盘后的快照写入。
+
+        :param progress: 可选回调 progress(已完成数, 总数)，在调用线程中执行
+        :return: {代码: 错误信息}
+        """
+        fetch = fetch or fetch_hist_bars
+        start = (datetime.now() - timedelta(days=days)).strftime("%Y%m%d")
+        end = last_settled_day(CLOSE_TIME).strftime("%Y%m%d")
+        frames, errors = [], {}
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = {pool.submit(fetch, symbol, start, end): symbol for symbol in symbols}
+            for done, future in enumerate(as_completed(futures), 1):
+                symbol = futures[future]
+                try:
+                    df = future.result()
+                    if df is not None and not df.empty:
+                        frames.append(df.assign(代码=symbol))
+                except Exception as e:
+                    errors[symbol] = str(e)
+                if progress is not None:
+                    progress(done, len(futures))
+        if not frames:
+            return errors
+        bars = pd.concat(frames, ignore_index=True)
+        bars["日期"] = pd.to_datetime(bars["日期"])
+        bars = bars[bars["日期"] <= pd.Timestamp(end)]
+        with self._lock:
+            state = self.load()
+            if len(state["dates"]):
+                # 本地已有的日期保留快照数据，回补只填充其余日期
+                local = pd.DataFrame({
+                    "日期": pd.to_datetime(np.repeat(state["dates"], len(state["symbols"]))),
+                    "代码": np.tile(state["symbols"], len(state["dates"])),
+                    "最高": state["high"].ravel(),
+                    "收盘": state["close"].ravel(),
+                }).dropna(subset=["收盘"])
+                bars = pd.concat([bars, local], ignore_index=True)
+            bars["代码"] = bars["代码"].astype(str)
+            bars = bars.drop_duplicates(["日期", "代码"], keep="last")
+            high = bars.pivot(index="日期", columns="代码", values="最高").sort_index()
+            close = bars.pivot(index="日期", columns="代码", values="收盘").reindex_like(high)
+            all_symbols = high.columns.to_numpy().astype("U6")
+            name_map = dict(zip(state["symbols"], state["names"]))
+            if names is not None:
+                name_map.update(zip(map(str, symbols), map(str, names)))
+            high_values = high.to_numpy(dtype=np.float32)
+            self._save({
+                "dates": high.index.to_numpy().astype("M8[D]"),
+                "symbols": all_symbols,
+                "names": np.array([name_map.get(s, "") for s in all_symbols], dtype="U16"),
+                "high": high_values,
+                "close": close.to_numpy(dtype=np.float32),
+                "flags": _new_high_flags(high_values),
+            })
+        return errors
+
+    def new_highs(self, day, window: int) -> pd.DataFrame:
+        """某交易日创 window 日新高的个股"""
+        state = self.load()
+        bit = WINDOWS.index(window)
+        i = np.searchsorted(state["dates"], np.datetime64(pd.Timestamp(day).date(), "D"))
+        if i >= len(state["dates"]) or state["dates"][i] != np.datetime64(pd.Timestamp(day).date(), "D"):
+            return pd.DataFrame(columns=["代码", "名称", "收盘", "最高", "涨跌幅%"])
+        hit = np.flatnonzero(state["flags"][i] & (1 << bit))
+        close = state["close"][i, hit]
+        prev = state["close"][i - 1, hit] if i > 0 else np.full(len(hit), np.nan, dtype=np.float32)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            change = (close / prev - 1) * 100
+        return pd.DataFrame({
+            "代码": state["symbols"][hit],
+            "名称": state["names"][hit],
+            "收盘": close.round(2),
+            "最高": state["high"][i, hit].round(2),
+            "涨跌幅%": np.round(change, 2),
+        }).sort_values("涨跌幅%", ascending=False, ignore_index=True)
+
+    def daily_counts(self) -> pd.DataFrame:
+        """日期 × 窗口 的新高个股数量"""
+        state = self.load()
+        counts = {f"{w}日新高": ((state["flags"] >> bit) & 1).sum(axis=1) for bit, w in enumerate(WINDOWS)}
+        return pd.DataFrame(counts, index=pd.to_datetime(state["dates"]))
+
+
+def fetch_hist_bars(symbol: str, start_date: str, end_date: str = None) -> pd.DataFrame:
+    """个股不复权日线的日期、最高、收盘，end_date 缺省为今天"""
+    end_date = end_date or datetime.now().strftime("%Y%m%d")
+    df = ak_call("stock_zh_a_hist", symbol=symbol, period="daily", start_date=start_date, end_date=end_date, adjust="")
+    if df.empty:
+        return df
+    return df[["日期", "最高", "收盘"]]
+
+
+_panel = None
+_panel_lock = threading.Lock()
+
+
+def get_high_panel() -> HighPanel:
+    """获取全市场新高面板（进程内单例）"""
+    global _panel
+    with _panel_lock:
+        if _panel is None:
+            _panel = HighPanel()
+        return _panel
+
+
+def update_from_snapshot(get_snapshot, now: datetime = None) -> bool:
+    """收盘后把当日快照写入面板；盘中、非交易日或当日已写入时不获取快照
+
+    :param get_snapshot: 返回全市场快照的函数（如 utils.spot.get_spot_snapshot）
+    """
+    now = now or datetime.now()
+    panel = get_high_panel()
+    if now.time() <= CLOSE_TIME or not get_calendar().is_trading_day(now) or panel.last_date() == now.date():
+        return False
+    return panel.append_day(now.date(), get_snapshot())
+
+
+if __name__ == "__main__":
+    # 收盘后任务：python -m utils.high_panel
+    from utils.spot import get_spot_snapshot
+    written = update_from_snapshot(get_spot_snapshot)
+    print("已写入当日新高面板" if written else "当日无需写入")
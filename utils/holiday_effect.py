@@ -0,0 +1,122 @@
+"""节假日效应统计引擎
+
+由指数自身的交易日序列识别长假：相邻两个交易日之间跳过了工作日即视为休市假期，
+再按各节日的公历锚定区间（农历节日取其可能落入的区间）把假期归属到具体节日。
+节前最后一个交易日与节后各窗口的收益率对所有年份一次性向量化计算。
+"""
+import numpy as np
+import pandas as pd
+
+# 节日 -> 公历锚定区间 ((起始月, 日), (结束月, 日))，按优先级排列：
+# 中秋与国庆合并放假时，该假期归属国庆
+HOLIDAYS = {
+    "春节": ((1, 20), (2, 25)),
+    "清明节": ((4, 3), (4, 6)),
+    "劳动节": ((4, 29), (5, 5)),
+    "端午节": ((5, 28), (6, 25)),
+    "国庆节": ((10, 1), (10, 7)),
+    "中秋节": ((9, 7), (10, 6)),
+}
+WINDOWS = (1, 3, 5, 10)
+
+
+def holiday_gaps(dates: np.ndarray):
+    """找出跳过工作日的交易日间隔
+
+    :param dates: 升序的 datetime64[D] 交易日数组
+    :return: (节前交易日下标, 假期首日, 假期末日)
+    """
+    skipped = np.busday_count(dates[:-1] + 1, dates[1:])
+    pre_idx = np.flatnonzero(skipped > 0)
+    return pre_idx, dates[pre_idx] + 1, dates[pre_idx + 1] - 1
+
+
+def locate_holidays(dates: np.ndarray, years, holidays=None) -> pd.DataFrame:
+    """定位各年份各节日的节前最后一个交易日下标
+
+    :return: DataFrame[节日, 年份, pre_idx]
+    """
+    holidays = holidays or list(HOLIDAYS)
+    pre_idx, gap_start, gap_end = holiday_gaps(dates)
+    years = np.asarray(list(years))
+    claimed = np.zeros(len(pre_idx), dtype=bool)
+    frames = []
+    for name, ((m1, d1), (m2, d2)) in HOLIDAYS.items():
+        win_start = np.array([f"{y}-{m1:02d}-{d1:02d}" for y in years], dtype="datetime64[D]")
+        win_end = np.array([f"{y}-{m2:02d}-{d2:02d}" for y in years], dtype="datetime64[D]")
+        # 第一个结束不早于锚定区间起点的假期
+        j = np.searchsorted(gap_end, win_start, side="left")
+        found = j < len(gap_end)
+        j_safe = np.where(found, j, 0)
+        found &= gap_start[j_safe] <= win_end
+        found &= ~claimed[j_safe]
+        claimed[j_safe[found]] = True
+        if name in holidays and found.any():
+            frames.append(pd.DataFrame({"节日": name, "年份": years[found], "pre_idx": pre_idx[j_safe[found]]}))
+    if not frames:
+        return pd.DataFrame(columns=["节日", "年份", "pre_idx"])
+    result = pd.concat(frames, ignore_index=True)
+    result["_order"] = result["节日"].map({name: i for i, name in enumerate(holidays)})
+    return result.sort_values(["年份", "_order"], ignore_index=True).drop(columns="_order")
+
+
+def window_returns(close: np.ndarray, pre_idx: np.ndarray, windows=WINDOWS, clamp: bool = False) -> dict:
+    """节前k日与节后k日涨跌幅（%），以节前最后一个交易日收盘价为基准
+
+    :param clamp: 节后数据不足时是否用最后一个可用交易日代替（否则为 NaN）
+    """
+    n = len(close)
+    base = close[pre_idx]
+    result = {}
+    for k in windows:
+        before = pre_idx - k
+        valid = before >= 0
+        result[f"节前{k}日%"] = np.where(valid, (base / close[np.clip(before, 0, n - 1)] - 1) * 100, np.nan)
+    for k in windows:
+        after = pre_idx + k
+        if clamp:
+            after = np.minimum(after, n - 1)
+        valid = after < n
+        result[f"节后{k}日%"] = np.where(valid, (close[np.clip(after, 0, n - 1)] / base - 1) * 100, np.nan)
+    return result
+
+
+def holiday_effects(index_data: dict, years, holidays=None, windows=WINDOWS) -> pd.DataFrame:
+    """多个指数、多个节日的节前节后收益率明细
+
+    :param index_data: {指数名称: 含 date/close 列的日线 DataFrame}
+    """
+    frames = []
+    for index_name, df in index_data.items():
+        if df is None or df.empty:
+            continue
+        df = df.sort_values("date")
+        dates = df["date"].to_numpy().astype("datetime64[D]")
+        close = df["close"].to_numpy(dtype=np.float64)
+        located = locate_holidays(dates, years, holidays)
+        if located.empty:
+            continue
+        pre_idx = located["pre_idx"].to_numpy()
+        post_idx = np.minimum(pre_idx + 1, len(dates) - 1)
+        frame = pd.DataFrame({
+            "指数": index_name,
+            "节日": located["节日"],
+            "年份": located["年份"],
+            "节前日期": pd.to_datetime(dates[pre_idx]).strftime("%Y-%m-%d"),
+            "节后首日": pd.to_datetime(dates[post_idx]).strftime("%Y-%m-%d"),
+            **{k: np.round(v, 2) for k, v in window_returns(close, pre_idx, windows).items()},
+        })
+        # 节后尚无交易日（假期未结束）时不计入
+        frames.append(frame[pre_idx + 1 < len(dates)])
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def summarize_effects(detail: pd.DataFrame, windows=WINDOWS) -> pd.DataFrame:
+    """按指数、节日汇总各窗口的平均涨跌幅与上涨概率"""
+    cols = [f"节后{k}日%" for k in windows]
+    keys = [detail["指数"], detail["节日"]]
+    values = detail[cols]
+    mean = values.groupby(keys, sort=False).mean().round(2).add_prefix("平均")
+    win = (values.gt(0).where(values.notna()) * 100).groupby(keys, sort=False).mean().round(1).add_prefix("上涨概率")
+    count = values.groupby(keys, sort=False).size().rename("样本数")
+    return pd.concat([count, mean, win], axis=1).reset_index()
@@ -0,0 +1,102 @@
+"""共享 HTTP 客户端
+
+所有直接访问网页/接口的抓取函数共用一个 requests.Session：
+按主机保持长连接池（复用 TCP/TLS 握手），默认带连接/读取超时，
+连接失败、429 和 5xx 响应按带随机抖动的指数退避自动重试。
+默认只重试幂等方法（GET/HEAD 等）；只读查询类的 POST 可显式使用 retry_post 的会话。
+响应的 gzip/deflate 解压由 urllib3 在读取时流式完成。
+每个请求都经过其主机所属数据源的共享限流器（utils.ratelimit），403/429/5xx 响应会让该数据源退避。
+"""
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.ratelimit import get_limiter, is_congestion_status, source_for_url
+
+DEFAULT_TIMEOUT = (3.05, 15)  # (连接超时, 读取超时) 秒
+POOL_HOSTS = 16  # 同时保持连接池的主机数
+POOL_SIZE = 16  # 每个主机的最大连接数，与各模块的并发线程数相当
+RETRIES = 3
+BACKOFF_FACTOR = 0.5
+STATUS_FORCELIST = (429, 500, 502, 503, 504)
+
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+class JitterRetry(Retry):
+    """指数退避加全抖动：在 [0, 退避时间] 内随机等待，避免多线程同时重试"""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+def _build_session(retry_post: bool) -> requests.Session:
+    methods = Retry.DEFAULT_ALLOWED_METHODS | ({"POST"} if retry_post else set())
+    retry = JitterRetry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,
+        status=RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=STATUS_FORCELIST,
+        allowed_methods=frozenset(methods),
+        raise_on_status=False,  # 重试用尽后返回最后一次响应，由调用方 raise_for_status
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(retry_post: bool = False) -> requests.Session:
+    """获取共享会话（进程内单例）
+
+    :param retry_post: 是否对 POST 也自动重试，只用于不改变服务端状态的查询接口
+    """
+    with _sessions_lock:
+        session = _sessions.get(retry_post)
+        if session is None:
+            session = _build_session(retry_post)
+            _sessions[retry_post] = session
+        return session
+
+
+def request(method: str, url: str, retry_post: bool = False, timeout=DEFAULT_TIMEOUT, is_throttled=None,
+            **kwargs) -> requests.Response:
+    """通过共享会话发送请求，经过该主机数据源的限流器
+
+    :param is_throttled: 可选判断函数 is_throttled(response)，状态码正常但内容说明被限流（如空页）时返回 True
+    """
+    with get_limiter(source_for_url(url)) as limiter:
+        response = get_session(retry_post).request(method, url, timeout=timeout, **kwargs)
+        if is_congestion_status(response.status_code) or (is_throttled is not None and response.ok
+                                                           and is_throttled(response)):
+            limiter.throttled()
+    return response
+
+
+def get(url: str, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """发送 GET 请求（带默认超时、重试与限流）"""
+    return request("GET", url, timeout=timeout, **kwargs)
+
+
+def post(url: str, retry: bool = False, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """发送 POST 请求（带默认超时与限流）
+
+    :param retry: 只读查询接口可设为 True，失败时与 GET 一样自动重试
+    """
+    return request("POST", url, retry_post=retry, timeout=timeout, **kwargs)
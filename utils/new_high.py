@@ -0,0 +1,189 @@
+"""创新高个股的按日本地存储与多日统计
+
+每个交易日的问财"创新高个股"结果保存为一个本地文件，收盘定型后的历史日期不再重复查询。
+多日统计时把各日代码集合映射到统一的股票索引上，得到 日期 × 股票 的布尔位图，
+连续创新高天数与各行业逐日数量均由位图一次向量化计算。
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import time as dtime
+
+import numpy as np
+import pandas as pd
+import pywencai
+
+from utils.ratelimit import get_limiter
+from utils.storage import data_dir
+
+CLOSE_TIME = dtime(15, 30)  # 收盘后当日结果视为定型
+MAX_WORKERS = 4
+COLUMNS = ['symbol', 'name', 'industry', 'shizhi', 'gainian', 'price', 'change_percent']
+RENAME = {
+    '股票代码': 'symbol',
+    '股票简称': 'name',
+    '所属同花顺二级行业': 'industry',
+    '最新价': 'price',
+    '最新涨跌幅': 'change_percent',
+    '所属概念': 'gainian',
+}
+
+
+def fetch_new_high(day) -> pd.DataFrame:
+    """从问财查询某日创新高个股，统一为 COLUMNS 列"""
+    query = f"{day.strftime('%Y%m%d')}创新高个股，所属同花顺二级行业,流通市值"
+    with get_limiter("wencai") as limiter:
+        raw = pywencai.get(query=query, query_type="stock", sort_order='desc', loop=True)
+        if raw is None:
+            limiter.throttled()
+    if raw is None or not isinstance(raw, pd.DataFrame) or raw.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    df = raw.rename(columns=RENAME)
+    # 问财返回的市值列名带日期后缀，按关键字匹配
+    cap_col = next((c for c in raw.columns if '总市值' in c), None)
+    df['shizhi'] = pd.to_numeric(raw[cap_col], errors='coerce') if cap_col else np.nan
+    for col in COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    df = df[COLUMNS].copy()
+    df['price'] = pd.to_numeric(df['price'], errors='coerce')
+    df['change_percent'] = pd.to_numeric(df['change_percent'].astype(str).str.replace('%', ''), errors='coerce')
+    return df.drop_duplicates('symbol').reset_index(drop=True)
+
+
+def _is_final(day) -> bool:
+    now = datetime.now()
+    return day < now.date() or (day == now.date() and now.time() >= CLOSE_TIME)
+
+
+class NewHighStore:
+    """按交易日保存的创新高个股集合（进程内单例，通过 get_new_high_store 获取）"""
+
+    def __init__(self):
+        self.root = data_dir("new_high")
+        self._days = {}  # 日期 -> DataFrame，只缓存已定型的日期
+        self._lock = threading.Lock()
+
+    def _path(self, day):
+        return self.root / f"{day.strftime('%Y%m%d')}.pkl"
+
+    def get(self, day, fetch=fetch_new_high) -> pd.DataFrame:
+        """某日创新高个股；已定型日期优先读本地，盘中结果不落盘"""
+        with self._lock:
+            df = self._days.get(day)
+        if df is not None:
+            return df
+        path = self._path(day)
+        if path.exists():
+            df = pd.read_pickle(path)
+        else:
+            df = fetch(day)
+            if not _is_final(day) or df.empty:
+                return df
+            df.to_pickle(path)
+        with self._lock:
+            self._days[day] = df
+        return df
+
+    def get_many(self, days, fetch=fetch_new_high):
+        """并发补齐多个交易日
+
+        :return: ({日期: DataFrame}, {日期: 错误信息})
+        """
+        frames, errors = {}, {}
+
+        def _task(day):
+            try:
+                return day, self.get(day, fetch), None
+            except Exception as e:
+                return day, None, str(e)
+
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, max(1, len(days)))) as pool:
+            for day, df, err in pool.map(_task, days):
+                if err is not None:
+                    errors[day] = err
+                else:
+                    frames[day] = df
+        return frames, errors
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_new_high_store() -> NewHighStore:
+    """获取创新高存储（进程内单例）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = NewHighStore()
+        return _store
+
+
+# ---------- 多日统计 ----------
+def build_bitmap(frames: dict, days=None):
+    """各日代码集合 -> (日期数组, 股票索引, 日期 × 股票 布尔位图)
+
+    :param frames: {日期: 含 symbol 列的 DataFrame}，日期按升序排列后使用
+    :param days: 位图的全部行（交易日），缺省为 frames 的日期；没有数据的日期为全 False 行
+    """
+    days = sorted(frames if days is None else days)
+    codes = [frames[d]['symbol'].astype(str).to_numpy() if d in frames else np.empty(0, dtype=object)
+             for d in days]
+    symbols = np.unique(np.concatenate(codes)) if codes else np.empty(0, dtype=object)
+    bitmap = np.zeros((len(days), len(symbols)), dtype=bool)
+    for i, day_codes in enumerate(codes):
+        bitmap[i, np.searchsorted(symbols, day_codes)] = True
+    return np.array(days), symbols, bitmap
+
+
+def streak_lengths(bitmap: np.ndarray) -> np.ndarray:
+    """截至最后一日的连续创新高天数（最后一日未创新高为0）"""
+    if len(bitmap) == 0:
+        return np.zeros(bitmap.shape[1], dtype=np.int64)
+    return np.cumprod(bitmap[::-1], axis=0).sum(axis=0)
+
+
+def latest_industry(frames: dict, symbols: np.ndarray) -> pd.DataFrame:
+    """各股票最近一次出现时的名称与行业，按股票索引顺序排列"""
+    long_df = pd.concat([frames[d][['symbol', 'name', 'industry']] for d in sorted(frames)])
+    latest = long_df.astype({'symbol': str}).drop_duplicates('symbol', keep='last').set_index('symbol')
+    return latest.reindex(symbols)
+
+
+def industry_daily_counts(days, bitmap: np.ndarray, industries: pd.Series) -> pd.DataFrame:
+    """日期 × 行业 的创新高个股数量（位图与行业独热矩阵相乘）"""
+    codes, labels = pd.factorize(industries.fillna('未知'))
+    onehot = np.zeros((len(codes), len(labels)), dtype=np.int32)
+    onehot[np.arange(len(codes)), codes] = 1
+    counts = bitmap.astype(np.int32) @ onehot
+    return pd.DataFrame(counts, index=pd.to_datetime(days), columns=labels)
+
+
+def multi_day_summary(frames: dict, days=None, failed=()):
+    """多日创新高统计
+
+    :param days: 统计窗口内的全部交易日，缺省为 frames 的日期；没有创新高个股的日期按全部未创新高计
+    :param failed: 获取失败的交易日。末尾失败的日期不参与统计；中间失败的日期无法判断是否创新高，
+                   连续天数只从最后一个失败日期之后计算，行业数量走势中不含这些日期
+    :return: (最后一日个股表[含连续天数、窗口内次数], 日期 × 行业 数量表)
+    """
+    failed = set(failed)
+    days = sorted(frames if days is None else days)
+    while days and days[-1] in failed:
+        days.pop()
+    days, symbols, bitmap = build_bitmap(frames, days)
+    info = latest_industry(frames, symbols)
+    broken = [i for i, day in enumerate(days) if day in failed]
+    streak = streak_lengths(bitmap[broken[-1] + 1:] if broken else bitmap)
+    stocks = pd.DataFrame({
+        'symbol': symbols,
+        'name': info['name'].to_numpy(),
+        'industry': info['industry'].to_numpy(),
+        '连续创新高天数': streak,
+        '窗口内创新高次数': bitmap.sum(axis=0),
+    })
+    stocks = stocks[bitmap[-1]] if len(days) else stocks.iloc[0:0]
+    stocks = stocks.sort_values(['连续创新高天数', '窗口内创新高次数'], ascending=False, ignore_index=True)
+    counts = industry_daily_counts(days, bitmap, info['industry'])
+    return stocks, counts[~np.isin(days, list(failed))]
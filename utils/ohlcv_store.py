@@ -0,0 +1,233 @@
+"""指数、ETF日线的本地列式存储
+
+每个标的一个目录，每列一个定长二进制文件，新K线只追加到文件末尾；
+读取时以内存映射方式打开，按已排序日期二分查找切片，不把整段历史读入内存。
+更新时只向上游请求本地最后一根K线之后的数据。
+盘中尚未定型的当日K线不写入本地，需要时（live=True）单独短时缓存后拼接在末尾。
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import time as dtime
+
+import numpy as np
+import pandas as pd
+
+from utils.akshare_gateway import call as ak_call
+from utils.storage import data_dir
+from utils.trade_calendar import get_calendar, last_settled_day
+
+COLUMNS = {
+    "date": np.dtype("M8[D]"),
+    "open": np.dtype("f8"),
+    "high": np.dtype("f8"),
+    "low": np.dtype("f8"),
+    "close": np.dtype("f8"),
+    "volume": np.dtype("f8"),
+    "amount": np.dtype("f8"),
+    "raw_close": np.dtype("f8"),  # 复权序列对应的不复权收盘价，指数与收盘价相同
+}
+CLOSE_TIME = dtime(15, 30)  # 收盘后当日K线视为定型
+UPDATE_TTL = 600  # 同一标的两次检查上游的最短间隔（秒）
+LIVE_TTL = 60  # 盘中当日K线的缓存时间（秒）
+FIRST_DATE = "19900101"
+
+
+class OHLCVStore:
+    """单个标的的追加式列存储"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.root = data_dir("ohlcv", key)
+        self._lock = threading.RLock()
+        self._checked_at = 0.0
+        self._live = None  # (获取时间, 当日K线)
+
+    def _path(self, column):
+        return self.root / f"{column}.bin"
+
+    def __len__(self):
+        # 各列长度取最小值，容忍追加中途中断
+        return min(self._path(c).stat().st_size // dt.itemsize if self._path(c).exists() else 0
+                   for c, dt in COLUMNS.items())
+
+    def _column(self, column, n):
+        if n == 0:
+            return np.empty(0, dtype=COLUMNS[column])
+        return np.memmap(self._path(column), dtype=COLUMNS[column], mode="r", shape=(n,))
+
+    def last_date(self):
+        n = len(self)
+        return None if n == 0 else pd.Timestamp(self._column("date", n)[-1])
+
+    def append(self, df: pd.DataFrame) -> int:
+        """追加晚于本地最后日期的K线（需含 date 列），返回追加行数"""
+        if df is None or df.empty:
+            return 0
+        with self._lock:
+            df = df.sort_values("date")
+            dates = pd.to_datetime(df["date"]).to_numpy().astype("M8[D]")
+            last = self.last_date()
+            if last is not None:
+                mask = dates > np.datetime64(last.date(), "D")
+                df, dates = df[mask], dates[mask]
+            if df.empty:
+                return 0
+            n = len(self)
+            for column, dtype in COLUMNS.items():
+                if column == "date":
+                    values = dates
+                elif column in df.columns:
+                    values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=dtype)
+                elif column == "raw_close":
+                    values = pd.to_numeric(df["close"], errors="coerce").to_numpy(dtype=dtype)
+                else:
+                    values = np.full(len(df), np.nan, dtype=dtype)
+                with open(self._path(column), "r+b" if self._path(column).exists() else "wb") as f:
+                    # 截断到公共长度后追加，丢弃上次中断留下的半截数据
+                    f.truncate(n * dtype.itemsize)
+                    f.seek(n * dtype.itemsize)
+                    f.write(np.ascontiguousarray(values).tobytes())
+            return len(df)
+
+    def read(self, start=None, end=None, columns=None) -> pd.DataFrame:
+        """读取日期闭区间 [start, end] 的K线"""
+        n = len(self)
+        dates = self._column("date", n)
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start).date(), "D"), "left")
+        hi = n if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end).date(), "D"), "right")
+        columns = columns or [c for c in COLUMNS if c != "date"]
+        data = {"date": pd.to_datetime(np.asarray(dates[lo:hi]))}
+        for column in columns:
+            data[column] = np.array(self._column(column, n)[lo:hi])
+        return pd.DataFrame(data)
+
+    def update(self, fetch_tail, ttl: float = UPDATE_TTL) -> int:
+        """距上次检查超过 ttl 秒时，调用 fetch_tail(起始日期YYYYMMDD, 截止日期YYYYMMDD) 补齐尾部"""
+        if time.time() - self._checked_at < ttl:
+            return 0
+        with self._lock:
+            if time.time() - self._checked_at < ttl:
+                return 0
+            return self._update(fetch_tail)
+
+    def _update(self, fetch_tail) -> int:
+        # 盘中K线未定型，只补到最后一个已收盘的交易日；周末、节假日本地已是最新时不请求上游
+        cutoff = last_settled_day(CLOSE_TIME)
+        last = self.last_date()
+        start = FIRST_DATE if last is None else (last + timedelta(days=1)).strftime("%Y%m%d")
+        if last is not None and last.date() >= cutoff:
+            self._checked_at = time.time()
+            return 0
+        df = fetch_tail(start, cutoff.strftime("%Y%m%d"))
+        self._checked_at = time.time()
+        if df is None or df.empty:
+            return 0
+        df = df[pd.to_datetime(df["date"]).dt.date <= cutoff]
+        return self.append(df)
+
+    def live_tail(self, fetch_tail, ttl: float = LIVE_TTL) -> pd.DataFrame:
+        """本地尚未保存的当日K线（交易日收盘定型前），只在内存中缓存 ttl 秒，不写入本地"""
+        today = datetime.now().date()
+        last = self.last_date()
+        if (last is not None and last.date() >= today) or not get_calendar().is_trading_day(today):
+            return pd.DataFrame()
+        with self._lock:
+            if self._live is None or time.time() - self._live[0] >= ttl:
+                day = today.strftime("%Y%m%d")
+                self._live = (time.time(), fetch_tail(day, day))
+            df = self._live[1]
+        if df is None or df.empty:
+            return pd.DataFrame()
+        df = df.assign(date=pd.to_datetime(df["date"]))
+        return df[df["date"].dt.date == today]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_ohlcv_store(key: str) -> OHLCVStore:
+    """获取标的存储（进程内单例）"""
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = OHLCVStore(key)
+            _stores[key] = store
+        return store
+
+
+# ---------- 数据源 ----------
+def _fetch_index_tail(symbol):
+    def _fetch(start, end):
+        return ak_call("stock_zh_index_daily_em", symbol=symbol, start_date=start, end_date=end)
+    return _fetch
+
+
+ETF_COLUMNS = {"日期": "date", "开盘": "open", "最高": "high", "最低": "low",
+               "收盘": "close", "成交量": "volume", "成交额": "amount"}
+
+
+def _fetch_etf_tail(symbol, adjust):
+    def _fetch(start, end):
+        df = ak_call("fund_etf_hist_em", symbol=symbol, period="daily", start_date=start, end_date=end, adjust=adjust)
+        if df.empty:
+            return df
+        df = df.rename(columns=ETF_COLUMNS)[list(ETF_COLUMNS.values())]
+        if adjust:
+            raw = ak_call("fund_etf_hist_em", symbol=symbol, period="daily", start_date=start, end_date=end, adjust="")
+            raw = raw.rename(columns={"日期": "date", "收盘": "raw_close"})[["date", "raw_close"]]
+            df = df.merge(raw, on="date", how="left")
+        return df
+    return _fetch
+
+
+def _read(store: OHLCVStore, fetch_tail, start, end, columns, live: bool) -> pd.DataFrame:
+    """补齐本地尾部后切片读取，live 时在末尾拼接盘中的当日K线"""
+    try:
+        store.update(fetch_tail)
+    except Exception:
+        if len(store) == 0:
+            raise
+    df = store.read(start, end, columns=columns)
+    if live and (end is None or pd.Timestamp(end).date() >= datetime.now().date()):
+        try:
+            tail = store.live_tail(fetch_tail)
+        except Exception:
+            # 当日K线获取失败时只返回已定型的部分
+            tail = pd.DataFrame()
+        if not tail.empty:
+            if "raw_close" in columns and "raw_close" not in tail.columns:
+                tail = tail.assign(raw_close=tail["close"])
+            tail = tail.reindex(columns=df.columns).astype(df.dtypes.to_dict())
+            df = pd.concat([df, tail], ignore_index=True)
+    return df
+
+
+def get_index_daily(symbol: str, start=None, end=None, live: bool = False) -> pd.DataFrame:
+    """指数日线（symbol 形如 sh000001），先补齐本地尾部再切片读取
+
+    :param live: 是否拼接盘中尚未定型的当日K线
+    """
+    store = get_ohlcv_store(f"index_{symbol}")
+    return _read(store, _fetch_index_tail(symbol), start, end,
+                 ["open", "high", "low", "close", "volume", "amount"], live)
+
+
+def get_etf_daily(symbol: str, start=None, end=None, adjust: str = "qfq", live: bool = False) -> pd.DataFrame:
+    """ETF日线
+
+    复权数据以后复权形式存储（历史值不随分红变化，可追加），
+    需要前复权时按最新一根K线的不复权收盘价整体缩放，与前复权结果一致。
+
+    :param live: 是否拼接盘中尚未定型的当日K线
+    """
+    stored_adjust = "hfq" if adjust else ""
+    store = get_ohlcv_store(f"etf_{symbol}_{stored_adjust or 'none'}")
+    df = _read(store, _fetch_etf_tail(symbol, stored_adjust), start, end, [c for c in COLUMNS if c != "date"], live)
+    if adjust == "qfq" and len(store):
+        last = store.read(store.last_date(), None, columns=["close", "raw_close"]).iloc[-1]
+        scale = last["raw_close"] / last["close"]
+        if np.isfinite(scale) and scale > 0:
+            df[["open", "high", "low", "close"]] *= scale
+    return df.drop(columns="raw_close")
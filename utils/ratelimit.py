@@ -0,0 +1,189 @@
+"""上游数据源共享限流器
+
+同一进程内所有会话、所有线程共用一个按数据源划分的限流器，
+避免并发抓取时把东方财富、新浪等接口打到封IP。
+
+每个数据源的限流器由三部分组成：
+- 令牌桶：限制请求速率；
+- 并发窗口：按 AIMD 调整——请求正常时窗口和速率缓慢加大，
+  遇到 403/429/5xx、超时、连接失败或调用方标记的空结果时减半；
+- 熔断器：连续失败达到阈值后在冷却期内直接拒绝请求（抛出 CircuitOpenError），
+  冷却结束后只放行一个试探请求，成功则恢复，失败则冷却时间加倍。
+"""
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+# 各数据源默认速率：(每秒请求数, 突发容量)，突发容量同时是初始并发窗口
+DEFAULT_RATES = {
+    "eastmoney": (4.0, 4),
+    "sina": (2.0, 2),
+    "sse": (3.0, 3),
+    "10jqka": (2.0, 2),
+    "wencai": (1.0, 1),
+    "legulegu": (2.0, 2),
+    "swsresearch": (2.0, 2),
+    "tdx": (2.0, 2),
+}
+# 直接 HTTP 请求按主机域名后缀归入数据源
+HOST_SOURCES = {
+    "eastmoney.com": "eastmoney",
+    "sina.com.cn": "sina",
+    "sse.com.cn": "sse",
+    "10jqka.com.cn": "10jqka",
+    "icfqs.com": "tdx",
+}
+
+MAX_CONCURRENCY = 8  # 并发窗口上限
+MAX_RATE_FACTOR = 2.0  # 速率最多升到默认值的倍数
+MIN_RATE_FACTOR = 0.1  # 速率最多降到默认值的倍数
+RATE_STEP = 0.05  # 每次成功速率增加默认值的比例
+DECREASE_INTERVAL = 1.0  # 两次减半之间的最小间隔（秒），同一波失败只减一次
+BREAKER_THRESHOLD = 5  # 连续失败多少次后熔断
+BREAKER_COOLDOWN = 30.0  # 首次熔断冷却时间（秒）
+MAX_COOLDOWN = 300.0
+
+
+class CircuitOpenError(RuntimeError):
+    """数据源处于熔断期，请求被直接拒绝"""
+
+
+class ThrottledError(RuntimeError):
+    """上游疑似限流（如返回空页），调用方可抛出此异常让限流器退避"""
+
+
+def _is_congestion(exc) -> bool:
+    """异常是否说明上游过载或在限流"""
+    if isinstance(exc, ThrottledError):
+        return True
+    if isinstance(exc, (TimeoutError, ConnectionError, requests.Timeout, requests.ConnectionError)):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return is_congestion_status(exc.response.status_code)
+    return False
+
+
+def is_congestion_status(status_code: int) -> bool:
+    return status_code in (403, 429) or status_code >= 500
+
+
+class RateLimiter:
+    """线程安全的自适应限流器，可直接用作 with 语句
+
+    with 块内抛出的异常用于判断上游状态；返回值正常但实际被限流（如空页）时，
+    可在块内调用 throttled() 标记。
+    """
+
+    def __init__(self, rate: float, burst: int = 1, max_concurrency: int = MAX_CONCURRENCY):
+        self.base_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self.max_concurrency = max(int(max_concurrency), self.capacity)
+        self.limit = float(self.capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._active = 0
+        self._failures = 0
+        self._tripped = False
+        self._open_until = 0.0
+        self._cooldown = BREAKER_COOLDOWN
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    @property
+    def is_open(self) -> bool:
+        """是否处于熔断冷却期"""
+        return time.monotonic() < self._open_until
+
+    def acquire(self):
+        """阻塞直到取得并发名额和一个令牌
+
+        :raises CircuitOpenError: 数据源处于熔断期
+        """
+        with self._cond:
+            while True:
+                if self.is_open:
+                    raise CircuitOpenError(f"数据源暂时不可用，{self._open_until - time.monotonic():.1f} 秒后重试")
+                # 熔断恢复后的试探期只允许一个请求
+                allowed = 1 if self._tripped else max(1, int(self.limit))
+                if self._active < allowed:
+                    break
+                self._cond.wait(timeout=1.0)
+            self._active += 1
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self._cond.wait((1 - self._tokens) / self.rate)
+
+    def release(self, ok):
+        """归还并发名额并按结果调整窗口
+
+        :param ok: True 成功，False 上游过载/限流，None 与上游状态无关的失败（不调整）
+        """
+        with self._cond:
+            self._active -= 1
+            now = time.monotonic()
+            if ok:
+                self._failures = 0
+                if self._tripped:
+                    self._tripped = False
+                    self._cooldown = BREAKER_COOLDOWN
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self.rate = min(self.base_rate * MAX_RATE_FACTOR, self.rate + self.base_rate * RATE_STEP)
+            elif ok is False:
+                self._failures += 1
+                if now - self._last_decrease >= DECREASE_INTERVAL:
+                    self.limit = max(1.0, self.limit / 2)
+                    self.rate = max(self.base_rate * MIN_RATE_FACTOR, self.rate / 2)
+                    self._last_decrease = now
+                if self._tripped or self._failures >= BREAKER_THRESHOLD:
+                    self._open_until = now + self._cooldown
+                    self._cooldown = min(MAX_COOLDOWN, self._cooldown * 2)
+                    self._tripped = True
+                    self._failures = 0
+            self._cond.notify_all()
+
+    def throttled(self):
+        """标记当前线程 with 块内的请求被限流（如返回空页）"""
+        self._local.throttled = True
+
+    def __enter__(self):
+        self.acquire()
+        self._local.throttled = False
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._local.throttled or _is_congestion(exc):
+            self.release(False)
+        else:
+            self.release(True if exc is None else None)
+        return False
+
+
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(source: str) -> RateLimiter:
+    """获取指定数据源的共享限流器（进程内单例）"""
+    with _registry_lock:
+        limiter = _limiters.get(source)
+        if limiter is None:
+            rate, burst = DEFAULT_RATES.get(source, (2.0, 2))
+            limiter = RateLimiter(rate, burst)
+            _limiters[source] = limiter
+        return limiter
+
+
+def source_for_url(url: str) -> str:
+    """URL 所属的数据源，未登记的主机以主机名作为数据源"""
+    host = urlsplit(url).hostname or ""
+    return next((source for suffix, source in HOST_SOURCES.items()
+                 if host == suffix or host.endswith("." + suffix)), host)
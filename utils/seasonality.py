@@ -0,0 +1,77 @@
+"""指数季节性统计
+
+月度收益矩阵、星期效应、月末月初效应，均由日线收盘价一次分组计算得到：
+矩阵按 (年份, 分组键) 聚合，汇总行按分组键对全部样本聚合。
+"""
+import numpy as np
+import pandas as pd
+
+WEEKDAY_LABELS = ["周一", "周二", "周三", "周四", "周五"]
+TOM_SPAN = 5  # 月末/月初各统计的交易日数
+
+
+def _close_series(df: pd.DataFrame) -> pd.Series:
+    """含 date/close 列的日线 -> 按日期升序的收盘价序列"""
+    df = df.sort_values("date")
+    return pd.Series(df["close"].to_numpy(dtype=np.float64), index=pd.DatetimeIndex(df["date"]))
+
+
+def _summarize(values: pd.Series, keys, order) -> pd.DataFrame:
+    """按分组键汇总平均值、中位数、上涨概率与样本数（列为分组键）"""
+    grouped = values.groupby(keys)
+    stats = pd.DataFrame({
+        "平均%": grouped.mean(),
+        "中位数%": grouped.median(),
+        "上涨概率%": values.gt(0).groupby(keys).mean() * 100,
+        "样本数": grouped.size(),
+    })
+    stats = stats.reindex(order).T.round(2)
+    stats.columns.name = None
+    return stats
+
+
+def monthly_matrix(df: pd.DataFrame):
+    """年份 × 月份 的月度涨跌幅矩阵（%）及各月份汇总
+
+    月收益以上月最后一个交易日收盘价为基准，首月无基准不计入。
+    """
+    close = _close_series(df)
+    month_close = close.groupby(close.index.to_period("M")).last()
+    returns = (month_close.pct_change() * 100).dropna()
+    years, months = returns.index.year, returns.index.month
+    matrix = returns.groupby([years, months]).first().unstack().reindex(columns=range(1, 13))
+    matrix.index.name, matrix.columns.name = "年份", "月份"
+    return matrix.round(2), _summarize(returns, months, range(1, 13))
+
+
+def weekday_matrix(df: pd.DataFrame):
+    """年份 × 星期 的日均涨跌幅矩阵（%）及各星期汇总"""
+    close = _close_series(df)
+    returns = (close.pct_change() * 100).dropna()
+    weekday = returns.index.dayofweek
+    returns = returns[weekday < 5]
+    labels = np.asarray(WEEKDAY_LABELS, dtype=object)[returns.index.dayofweek]
+    matrix = returns.groupby([returns.index.year, labels]).mean().unstack().reindex(columns=WEEKDAY_LABELS)
+    matrix.index.name, matrix.columns.name = "年份", "星期"
+    return matrix.round(3), _summarize(returns, labels, WEEKDAY_LABELS)
+
+
+def turn_of_month_matrix(df: pd.DataFrame, span: int = TOM_SPAN):
+    """年份 × 月末月初交易日序号 的日均涨跌幅矩阵（%）及汇总
+
+    序号 -1 为当月最后一个交易日，+1 为当月第一个交易日，只统计月末、月初各 span 个交易日。
+    """
+    close = _close_series(df)
+    returns = (close.pct_change() * 100).dropna()
+    month = returns.index.to_period("M")
+    from_start = returns.groupby(month).cumcount().to_numpy() + 1
+    from_end = returns.groupby(month).cumcount(ascending=False).to_numpy() + 1
+    offset = np.where(from_end <= span, -from_end, np.where(from_start <= span, from_start, 0))
+    keep = offset != 0
+    returns, offset = returns[keep], offset[keep]
+    order = list(range(-span, 0)) + list(range(1, span + 1))
+    labels = np.array([f"{o:+d}" for o in order], dtype=object)[np.searchsorted(order, offset)]
+    label_order = [f"{o:+d}" for o in order]
+    matrix = returns.groupby([returns.index.year, labels]).mean().unstack().reindex(columns=label_order)
+    matrix.index.name, matrix.columns.name = "年份", "交易日序号"
+    return matrix.round(3), _summarize(returns, labels, label_order)
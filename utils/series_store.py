@@ -0,0 +1,116 @@
+"""本地日期序列存储
+
+每个序列按日期升序保存为一个 pickle 文件，进程内缓存已加载的数据，
+刷新时只把上游返回的新日期追加到末尾；区间查询通过已排序日期数组的二分查找切片。
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import data_dir
+
+DATE_COLUMN = "日期"
+RETRY_AFTER = 60  # 刷新失败后的重试间隔（秒）
+
+
+class SeriesStore:
+    """单个日期序列的本地存储（进程内单例，通过 get_series_store 获取）"""
+
+    def __init__(self, name: str, date_column: str = DATE_COLUMN):
+        self.name = name
+        self.date_column = date_column
+        self.path = data_dir("series") / f"{name}.pkl"
+        self._state = None  # (完整序列, 排序日期数组)，整体替换保证读取一致
+        self._refreshed_at = 0.0
+        self._lock = threading.RLock()
+
+    def _set(self, df: pd.DataFrame):
+        df = df.reset_index(drop=True)
+        self._state = (df, df[self.date_column].to_numpy(dtype="datetime64[ns]"))
+
+    def load(self) -> pd.DataFrame:
+        """返回完整序列（共享对象，调用方不得原地修改）"""
+        if self._state is None:
+            with self._lock:
+                if self._state is None:
+                    if self.path.exists():
+                        self._set(pd.read_pickle(self.path))
+                    else:
+                        self._set(pd.DataFrame({self.date_column: pd.Series(dtype="datetime64[ns]")}))
+        return self._state[0]
+
+    def last_date(self):
+        df = self.load()
+        return None if df.empty else df[self.date_column].iloc[-1]
+
+    def extend(self, new_df: pd.DataFrame, overwrite_last: int = 0) -> int:
+        """追加新日期的数据
+
+        :param overwrite_last: 允许用新数据覆盖末尾若干行（上游可能修正最近几日的数据）
+        :return: 新增行数
+        """
+        if new_df is None or new_df.empty:
+            return 0
+        new_df = new_df.copy()
+        new_df[self.date_column] = pd.to_datetime(new_df[self.date_column])
+        new_df = new_df.sort_values(self.date_column).drop_duplicates(self.date_column, keep="last")
+        with self._lock:
+            df = self.load()
+            if df.empty:
+                merged = new_df
+            else:
+                keep = df.iloc[:len(df) - overwrite_last] if overwrite_last else df
+                cutoff = keep[self.date_column].iloc[-1] if not keep.empty else None
+                tail = new_df if cutoff is None else new_df[new_df[self.date_column] > cutoff]
+                if tail.empty:
+                    return 0
+                merged = pd.concat([keep, tail], ignore_index=True)
+            added = len(merged) - len(df)
+            merged.to_pickle(self.path)
+            self._set(merged)
+            return added
+
+    def slice(self, start=None, end=None) -> pd.DataFrame:
+        """按日期闭区间 [start, end] 切片"""
+        self.load()
+        df, dates = self._state
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side="left")
+        hi = len(df) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side="right")
+        return df.iloc[lo:hi]
+
+    def refresh(self, fetch, ttl: float, overwrite_last: int = 0) -> pd.DataFrame:
+        """距上次刷新超过 ttl 秒时调用 fetch(最后日期) 获取新数据并追加，返回完整序列
+
+        fetch 接收本地最后日期（无数据时为 None），返回包含日期列的 DataFrame。
+        同一时刻只有一个线程刷新，其余线程等待其结果；
+        刷新失败时若本地已有数据则继续使用本地数据。
+        """
+        if time.time() - self._refreshed_at < ttl:
+            return self.load()
+        with self._lock:
+            if time.time() - self._refreshed_at >= ttl:
+                try:
+                    self.extend(fetch(self.last_date()), overwrite_last=overwrite_last)
+                    self._refreshed_at = time.time()
+                except Exception:
+                    # 失败后1分钟内不再重试，期间沿用本地数据
+                    self._refreshed_at = time.time() - ttl + RETRY_AFTER
+                    if self.load().empty:
+                        raise
+        return self.load()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_series_store(name: str, date_column: str = DATE_COLUMN) -> SeriesStore:
+    """获取指定名称的序列存储（进程内单例）"""
+    with _stores_lock:
+        store = _stores.get(name)
+        if store is None:
+            store = SeriesStore(name, date_column)
+            _stores[name] = store
+        return store
@@ -0,0 +1,123 @@
+"""全市场A股实时快照
+
+直接并发请求东方财富行情列表接口的各分页，只保留页面用到的列并压缩数据类型，
+最新快照在进程内所有会话间共享，短时间内重复访问直接返回内存中的结果。
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils import http
+from utils.akshare_gateway import call as ak_call
+
+SPOT_URL = "https://82.push2.eastmoney.com/api/qt/clist/get"
+PAGE_SIZE = 100  # 接口单页最多返回100条
+MAX_WORKERS = 8
+SPOT_TTL = 30  # 快照共享有效期（秒）
+
+# 东方财富字段 -> 中文列名
+SPOT_FIELDS = {
+    "f12": "代码",
+    "f14": "名称",
+    "f2": "最新价",
+    "f3": "涨跌幅",
+    "f5": "成交量",
+    "f6": "成交额",
+    "f8": "换手率",
+    "f15": "最高",
+    "f16": "最低",
+    "f17": "今开",
+    "f18": "昨收",
+    "f20": "总市值",
+    "f21": "流通市值",
+}
+FLOAT32_COLUMNS = ["最新价", "涨跌幅", "换手率", "最高", "最低", "今开", "昨收"]
+FLOAT64_COLUMNS = ["成交量", "成交额", "总市值", "流通市值"]
+
+_BASE_PARAMS = {
+    "pz": PAGE_SIZE,
+    "po": "1",
+    "np": "1",
+    "ut": "bd1d9ddb04089700cf9c27f6f7426281",
+    "fltt": "2",
+    "invt": "2",
+    "fid": "f12",
+    "fs": "m:0 t:6,m:0 t:80,m:1 t:2,m:1 t:23,m:0 t:81 s:2048",
+    "fields": ",".join(SPOT_FIELDS),
+}
+
+_snapshot = None
+_snapshot_time = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def _page_data(response) -> dict:
+    return response.json().get("data") or {}
+
+
+def _is_empty_page(response) -> bool:
+    """分页都在总条数范围内，返回空页或无法解析说明被限流"""
+    try:
+        return not _page_data(response).get("diff")
+    except ValueError:
+        return True
+
+
+def _fetch_page(page: int):
+    """获取一页行情，返回 (总条数, 记录列表)"""
+    params = dict(_BASE_PARAMS, pn=page)
+    r = http.get(SPOT_URL, params=params, is_throttled=_is_empty_page)
+    r.raise_for_status()
+    data = _page_data(r)
+    return int(data.get("total", 0)), data.get("diff") or []
+
+
+def _compact(df: pd.DataFrame) -> pd.DataFrame:
+    """只保留所需列并压缩数据类型"""
+    df = df[[c for c in SPOT_FIELDS.values() if c in df.columns]].copy()
+    df["代码"] = df["代码"].astype(str)
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32)
+    for col in FLOAT64_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float64)
+    return df.reset_index(drop=True)
+
+
+def fetch_spot_snapshot() -> pd.DataFrame:
+    """并发抓取全部分页，组装全市场快照"""
+    total, first = _fetch_page(1)
+    pages = range(2, -(-total // PAGE_SIZE) + 1)
+    records = list(first)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        for _, rows in pool.map(_fetch_page, pages):
+            records.extend(rows)
+    df = pd.DataFrame.from_records(records).rename(columns=SPOT_FIELDS)
+    return _compact(df.drop_duplicates(subset="代码"))
+
+
+def get_spot_snapshot(ttl: float = SPOT_TTL) -> pd.DataFrame:
+    """获取共享快照：有效期内直接返回内存结果，过期时只由一个线程刷新
+
+    返回的 DataFrame 为所有会话共享，调用方不得原地修改。
+    """
+    global _snapshot, _snapshot_time
+    with _snapshot_lock:
+        if _snapshot is not None and time.time() - _snapshot_time < ttl:
+            return _snapshot
+        try:
+            df = fetch_spot_snapshot()
+        except Exception:
+            # 分页接口异常时退回 akshare 的串行实现
+            df = _compact(ak_call("stock_zh_a_spot_em"))
+        _snapshot, _snapshot_time = df, time.time()
+        return df
+
+
+def snapshot_age() -> float:
+    """当前共享快照距今秒数，尚无快照时返回 inf"""
+    return time.time() - _snapshot_time if _snapshot is not None else float("inf")
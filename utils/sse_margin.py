@@ -0,0 +1,472 @@
+"""上交所融资融券交易明细
+
+接口按页返回，第一页响应中带有总页数，其余分页通过共享 HTTP 连接池（utils.http）并发获取；
+多只证券的查询按代码并发，结果合并为一张长表（每行一个 证券 × 日期）。
+历史日期的明细不再变化，按证券保存在本地并记录已覆盖的日期区间，区间滑动时只补缺口。
+"""
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from datetime import time as dtime
+
+import numpy as np
+import pandas as pd
+
+from utils import http
+from utils.storage import data_dir
+from utils.trade_calendar import get_calendar
+
+SSE_URL = "https://query.sse.com.cn/commonSoaQuery.do"
+HEADERS = {
+    "Referer": "http://www.sse.com.cn/",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.0.0 Safari/537.36"
+}
+PAGE_SIZE = 500
+MAX_WORKERS = 4
+
+COLUMN_MAP = {
+    "opDate": "信用交易日期",
+    "securityCode": "标的证券代码",
+    "securityAbbr": "标的证券简称",
+    "rzye": "融资余额(元)",
+    "rzmre": "融资买入额(元)",
+    "rzche": "融资偿还额(元)",
+    "rqyl": "融券余量",
+    "rqmcl": "融券卖出量",
+    "rqchl": "融券偿还量"
+}
+NUMERIC_COLUMNS = ['融资余额(元)', '融资买入额(元)', '融资偿还额(元)',
+                   '融券余量', '融券卖出量', '融券偿还量']
+DISPLAY_COLUMNS = list(COLUMN_MAP.values())
+
+_JSONP = re.compile(r'^\w+\((.*)\)$', re.S)
+
+def _parse_jsonp(text: str) -> dict:
+    """解析 JSONP 响应
+
+    :raises ValueError: 响应不是 JSONP 格式或接口返回错误
+    """
+    match = _JSONP.search(text.strip())
+    if not match:
+        raise ValueError(f"无法解析JSONP响应。原始响应: {text[:200]}...")
+    data = json.loads(match.group(1))
+    if data.get('actionErrors'):
+        raise ValueError(f"接口返回错误: {data['actionErrors']}")
+    return data
+
+
+def _is_empty_page(response) -> bool:
+    """无法解析或没有记录的响应（被拦截或限流时返回）"""
+    try:
+        return not _parse_jsonp(response.text).get('result')
+    except ValueError:
+        return True
+
+
+def _fetch_page(stock_code: str, start_date: str, end_date: str, page: int):
+    """获取一页明细，返回 (总页数, 记录列表)
+
+    区间内有交易日却返回空页时，向数据源限流器报告被限流。
+    """
+    now = int(time.time() * 1000)
+    params = {
+        "jsonCallBack": f"jsonpCallback{now}",
+        "isPagination": "true",
+        "pageHelp.pageSize": PAGE_SIZE,
+        "pageHelp.pageNo": page,
+        "pageHelp.beginPage": page,
+        "pageHelp.endPage": page,
+        "sqlId": "RZRQ_MX_INFO",
+        "preStockCode": stock_code,
+        "beginDate": start_date,
+        "endDate": end_date,
+        "_": now
+    }
+    expect_rows = bool(get_calendar().range(start_date, end_date))
+    response = http.get(SSE_URL, params=params, headers=HEADERS,
+                        is_throttled=lambda r: expect_rows and _is_empty_page(r))
+    response.raise_for_status()
+    data = _parse_jsonp(response.text)
+    page_count = int((data.get('pageHelp') or {}).get('pageCount') or 1)
+    return page_count, data.get('result') or []
+
+
+def normalize_margin(records) -> pd.DataFrame:
+    """原始记录 -> 中文列名、数值化、按日期升序的明细表"""
+    df = pd.DataFrame.from_records(records)
+    if df.empty:
+        return pd.DataFrame(columns=DISPLAY_COLUMNS)
+    if 'opDate' in df.columns:
+        df['opDate'] = pd.to_datetime(df['opDate'], format='%Y%m%d')
+    df = df.rename(columns={k: v for k, v in COLUMN_MAP.items() if k in df.columns})
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', ''), errors='coerce')
+    df = df[[col for col in DISPLAY_COLUMNS if col in df.columns]]
+    # 分页并发返回时可能有重复行
+    keys = [col for col in ('标的证券代码', '信用交易日期') if col in df.columns]
+    if keys:
+        df = df.drop_duplicates(keys, keep='last').sort_values(keys[::-1], kind='stable')
+    return df.reset_index(drop=True)
+
+
+def fetch_margin_detail(stock_code: str, start_date: str, end_date: str) -> pd.DataFrame:
+    """某证券（代码为空时为全部证券）在日期范围内的全部明细，第一页之后的分页并发获取
+
+    :param start_date: YYYYMMDD
+    :param end_date: YYYYMMDD
+    """
+    page_count, records = _fetch_page(stock_code, start_date, end_date, 1)
+    records = list(records)
+    if page_count > 1:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, page_count - 1)) as pool:
+            pages = pool.map(lambda page: _fetch_page(stock_code, start_date, end_date, page),
+                             range(2, page_count + 1))
+            for _, rows in pages:
+                records.extend(rows)
+    return normalize_margin(records)
+
+
+def fetch_margin_many(stock_codes, start_date: str, end_date: str, fetch=fetch_margin_detail):
+    """多只证券并发查询，合并为长表
+
+    :return: (长表[信用交易日期, 标的证券代码, ...], {代码: 错误信息})
+    """
+    codes = list(dict.fromkeys(str(code).strip() for code in stock_codes if str(code).strip()))
+    frames, errors = [], {}
+
+    def _task(code):
+        try:
+            return code, fetch(code, start_date, end_date), None
+        except Exception as e:
+            return code, None, str(e)
+
+    if codes:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(codes))) as pool:
+            for code, df, err in pool.map(_task, codes):
+                if err is not None:
+                    errors[code] = err
+                elif df.empty:
+                    errors[code] = "未返回数据"
+                else:
+                    frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=DISPLAY_COLUMNS), errors
+    return pd.concat(frames, ignore_index=True), errors
+
+
+def margin_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """长表中每只证券的区间汇总：期末融资余额、区间变化、融资买入/净买入合计（亿元）"""
+    if df.empty:
+        return pd.DataFrame()
+    df = df.sort_values('信用交易日期', kind='stable')
+    grouped = df.groupby('标的证券代码', sort=False)
+    first = grouped['融资余额(元)'].first()
+    last = grouped['融资余额(元)'].last()
+    buy = grouped['融资买入额(元)'].sum()
+    repay = grouped['融资偿还额(元)'].sum()
+    summary = pd.DataFrame({
+        '标的证券简称': grouped['标的证券简称'].last(),
+        '期末融资余额(亿元)': last / 1e8,
+        '融资余额变化(亿元)': (last - first) / 1e8,
+        '融资余额变化%': (last / first - 1) * 100,
+        '融资买入合计(亿元)': buy / 1e8,
+        '融资净买入(亿元)': (buy - repay) / 1e8,
+        '交易日数': grouped.size(),
+    }).round(2)
+    return summary.sort_values('融资净买入(亿元)', ascending=False).rename_axis('标的证券代码').reset_index()
+
+
+# ---------- 按证券的本地区间存储 ----------
+PUBLISH_TIME = dtime(9, 0)  # 上一交易日的融资融券明细在下一交易日开盘前发布
+
+
+def last_final_day(now: datetime = None) -> date:
+    """本地可以永久保存的最后交易日
+
+    交易日发布时间之后为上一交易日；交易日发布时间之前、周末和节假日，
+    上一交易日的明细还要等下一个交易日开盘前才发布，因此为再往前一个交易日。
+    """
+    now = now or datetime.now()
+    calendar = get_calendar()
+    today = now.date()
+    published = calendar.is_trading_day(today) and now.time() >= PUBLISH_TIME
+    return calendar.prev(today, 1 if published else 2)
+
+
+def _merge_intervals(intervals) -> list:
+    """合并重叠或首尾相邻（相差一天）的日期闭区间，按开始日期升序"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _missing_intervals(intervals, start: date, end: date) -> list:
+    """[start, end] 中未被已有区间覆盖的部分"""
+    gaps, cursor = [], start
+    for lo, hi in intervals:
+        if hi < cursor:
+            continue
+        if lo > end:
+            break
+        if lo > cursor:
+            gaps.append((cursor, lo - timedelta(days=1)))
+        cursor = max(cursor, hi + timedelta(days=1))
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _to_date(value) -> date:
+    return pd.Timestamp(value).date()
+
+
+_CODE = re.compile(r'^\d{6}$')
+
+
+def _check_code(code: str) -> str:
+    """证券代码用作本地文件名，只接受6位数字
+
+    :raises ValueError: 代码格式不正确
+    """
+    if not _CODE.match(code):
+        raise ValueError(f"无效的证券代码: {code}")
+    return code
+
+
+def _day_str(day: date) -> str:
+    return day.strftime("%Y%m%d")
+
+
+class MarginStore:
+    """按证券保存的融资融券明细（进程内单例，通过 get_margin_store 获取）
+
+    每只证券一个明细文件和一个已覆盖区间列表；查询时只向上游请求未覆盖的日期段，
+    合并后按已排序日期切片返回。尚未定型的日期（今天、尚未发布的上一交易日）只实时获取，不写入本地。
+    """
+
+    def __init__(self):
+        self.root = data_dir("sse_margin")
+        self._cache = {}  # 代码 -> (明细, 已覆盖区间)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, code: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(code, threading.Lock())
+
+    def _load(self, code: str):
+        cached = self._cache.get(code)
+        if cached is None:
+            data_path, meta_path = self.root / f"{code}.pkl", self.root / f"{code}.json"
+            if data_path.exists() and meta_path.exists():
+                intervals = [(_to_date(lo), _to_date(hi)) for lo, hi in json.loads(meta_path.read_text())]
+                cached = (pd.read_pickle(data_path), intervals)
+            else:
+                cached = (pd.DataFrame(columns=DISPLAY_COLUMNS), [])
+            self._cache[code] = cached
+        return cached
+
+    def _save(self, code: str, df: pd.DataFrame, intervals: list):
+        df.to_pickle(self.root / f"{code}.pkl")
+        (self.root / f"{code}.json").write_text(json.dumps([[lo.isoformat(), hi.isoformat()] for lo, hi in intervals]))
+        self._cache[code] = (df, intervals)
+
+    def covered(self, code: str) -> list:
+        """已保存的日期区间列表 [(开始, 结束)]"""
+        code = _check_code(code)
+        with self._lock(code):
+            return list(self._load(code)[1])
+
+    def get(self, code: str, start, end, fetch=fetch_margin_detail, now: datetime = None) -> pd.DataFrame:
+        """某证券日期闭区间 [start, end] 的明细，只请求本地未覆盖的日期段
+
+        :raises ValueError: 代码不是6位数字
+        """
+        code = _check_code(code)
+        start, end = _to_date(start), _to_date(end)
+        final_end = min(end, last_final_day(now))
+        with self._lock(code):
+            df, intervals = self._load(code)
+            gaps = _missing_intervals(intervals, start, final_end) if start <= final_end else []
+            if gaps:
+                fetched = [fetch(code, _day_str(lo), _day_str(hi)) for lo, hi in gaps]
+                df = pd.concat([df] + [f for f in fetched if not f.empty], ignore_index=True)
+                df = df.drop_duplicates('信用交易日期', keep='last').sort_values('信用交易日期', ignore_index=True)
+                # 含交易日却没有返回数据的日期段（未发布或被限流）不记为已覆盖，下次重新请求
+                calendar = get_calendar()
+                covered = [gap for gap, f in zip(gaps, fetched) if not f.empty or not calendar.range(*gap)]
+                self._save(code, df, _merge_intervals(intervals + covered))
+        dates = df['信用交易日期'].to_numpy(dtype='datetime64[ns]')
+        lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side='left')
+        hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(min(end, final_end))), side='right')
+        result = df.iloc[lo:hi]
+        if end > final_end:
+            # 未定型的日期实时获取，不保存
+            live = fetch(code, _day_str(max(start, final_end + timedelta(days=1))), _day_str(end))
+            if not live.empty:
+                result = pd.concat([result, live], ignore_index=True)
+        return result.reset_index(drop=True)
+
+    def get_many(self, stock_codes, start, end, fetch=fetch_margin_detail):
+        """多只证券并发查询，合并为长表
+
+        :return: (长表, {代码: 错误信息})
+        """
+        return fetch_margin_many(stock_codes, start, end,
+                                 fetch=lambda code, lo, hi: self.get(code, lo, hi, fetch=fetch))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_margin_store() -> MarginStore:
+    """获取融资融券明细存储（进程内单例）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MarginStore()
+        return _store
+
+
+# ---------- 全市场逐日明细 ----------
+MARKET_COLUMNS = {
+    '标的证券代码': 'U6',
+    '标的证券简称': object,
+    '融资余额(元)': np.float64,
+    '融资买入额(元)': np.float64,
+    '融资偿还额(元)': np.float64,
+    '融券余量': np.float64,
+}
+
+
+def fetch_market_day(day) -> pd.DataFrame:
+    """某交易日全部两融标的的明细（证券代码留空即为全市场），非交易日返回空表"""
+    df = fetch_margin_detail("", _day_str(_to_date(day)), _day_str(_to_date(day)))
+    return df[[c for c in ('信用交易日期', *MARKET_COLUMNS) if c in df.columns]]
+
+
+class MarketMarginStore:
+    """全市场两融明细的逐日存储（进程内单例，通过 get_market_margin_store 获取）
+
+    每个已发布的交易日一个文件（只保存非空结果，未发布或被限流时返回的空表下次重新请求），
+    加载区间时把各日拼成 日期 × 证券 的长表，聚合都在长表上向量化完成。
+    """
+
+    def __init__(self):
+        self.root = data_dir("sse_margin_market")
+
+    def _path(self, day: date):
+        return self.root / f"{_day_str(day)}.pkl"
+
+    def stored_days(self) -> list:
+        return sorted(_to_date(p.stem) for p in self.root.glob("*.pkl"))
+
+    def get_days(self, start, end, fetch=fetch_market_day, now: datetime = None, progress=None):
+        """区间内各交易日的全市场明细：本地已有的直接读取，缺失日期并发获取，已发布且非空的日期写入本地
+
+        :param progress: 可选回调 progress(已完成数, 总数)，在调用线程中执行
+        :return: (长表[信用交易日期, 标的证券代码, ...], {日期: 错误信息})
+        """
+        final_end = last_final_day(now)
+        days = get_calendar().range(start, end)
+        frames, errors, missing = [], {}, []
+        for day in days:
+            path = self._path(day)
+            df = pd.read_pickle(path) if path.exists() else None
+            # 旧版本可能保存过空表，同样视为缺失
+            if df is None or df.empty:
+                missing.append(day)
+            else:
+                frames.append(df)
+
+        def _task(day):
+            try:
+                return day, fetch(day), None
+            except Exception as e:
+                return day, None, str(e)
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(missing))) as pool:
+                for done, (day, df, err) in enumerate(pool.map(_task, missing), 1):
+                    if err is not None:
+                        errors[day] = err
+                    else:
+                        if day <= final_end and not df.empty:
+                            df.to_pickle(self._path(day))
+                        frames.append(df)
+                    if progress is not None:
+                        progress(done, len(missing))
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=['信用交易日期', *MARKET_COLUMNS]), errors
+        panel = pd.concat(frames, ignore_index=True).astype(MARKET_COLUMNS)
+        return panel.sort_values(['信用交易日期', '标的证券代码'], ignore_index=True), errors
+
+
+_market_store = None
+_market_store_lock = threading.Lock()
+
+
+def get_market_margin_store() -> MarketMarginStore:
+    """获取全市场两融明细存储（进程内单例）"""
+    global _market_store
+    with _market_store_lock:
+        if _market_store is None:
+            _market_store = MarketMarginStore()
+        return _market_store
+
+
+def market_totals(panel: pd.DataFrame) -> pd.DataFrame:
+    """全市场逐日合计：融资余额、融资买入、融资净买入（亿元）及标的数量"""
+    grouped = panel.groupby('信用交易日期')
+    totals = grouped[['融资余额(元)', '融资买入额(元)', '融资偿还额(元)']].sum() / 1e8
+    return pd.DataFrame({
+        '融资余额(亿元)': totals['融资余额(元)'],
+        '融资买入额(亿元)': totals['融资买入额(元)'],
+        '融资净买入(亿元)': totals['融资买入额(元)'] - totals['融资偿还额(元)'],
+        '标的数量': grouped.size(),
+    }).round(2).rename_axis('信用交易日期').reset_index()
+
+
+def stock_ranking(panel: pd.DataFrame) -> pd.DataFrame:
+    """区间内每只标的的融资余额变化、净买入及Z值
+
+    余额变化%Z值：区间余额变化率在全部标的中的横截面标准分；
+    末日净买入Z值：最后一日净买入相对该标的区间内逐日净买入的标准分。
+    """
+    balance = panel.pivot(index='信用交易日期', columns='标的证券代码', values='融资余额(元)')
+    net = panel.assign(净买入=panel['融资买入额(元)'] - panel['融资偿还额(元)']).pivot(
+        index='信用交易日期', columns='标的证券代码', values='净买入')
+    values = balance.to_numpy()
+    valid = np.isfinite(values)
+    # 每只标的在区间内第一个、最后一个有数据的交易日
+    first_row = valid.argmax(axis=0)
+    last_row = len(values) - 1 - valid[::-1].argmax(axis=0)
+    cols = np.arange(values.shape[1])
+    first, last = values[first_row, cols], values[last_row, cols]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change_pct = (last / first - 1) * 100
+        pct_z = (change_pct - np.nanmean(change_pct)) / np.nanstd(change_pct)
+        net_values = net.to_numpy()
+        net_z = (net_values[last_row, cols] - np.nanmean(net_values, axis=0)) / np.nanstd(net_values, axis=0)
+    names = panel.drop_duplicates('标的证券代码', keep='last').set_index('标的证券代码')['标的证券简称']
+    ranking = pd.DataFrame({
+        '标的证券代码': balance.columns,
+        '标的证券简称': names.reindex(balance.columns).to_numpy(),
+        '期末融资余额(亿元)': last / 1e8,
+        '融资余额变化(亿元)': (last - first) / 1e8,
+        '融资余额变化%': change_pct,
+        '融资净买入(亿元)': np.nansum(net_values, axis=0) / 1e8,
+        '余额变化%Z值': pct_z,
+        '末日净买入Z值': net_z,
+    })
+    return ranking.round(2).sort_values('融资净买入(亿元)', ascending=False, ignore_index=True)
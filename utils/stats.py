@@ -0,0 +1,52 @@
+"""分位数等统计工具"""
+import bisect
+
+import numpy as np
+
+
+def percentile_rank(sorted_values: np.ndarray, value: float) -> float:
+    """value 在已排序样本中的分位（0-1），即样本中不大于 value 的比例"""
+    n = len(sorted_values)
+    if n == 0 or not np.isfinite(value):
+        return np.nan
+    return np.searchsorted(sorted_values, value, side="right") / n
+
+
+def sorted_finite(values) -> np.ndarray:
+    """去除缺失值并排序，供多次分位查询复用"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.sort(values[np.isfinite(values)])
+
+
+def rolling_percentile_rank(dates, values, years: float) -> np.ndarray:
+    """按时间窗口滚动计算每个值在近 years 年样本中的分位（0-1）
+
+    维护一个按值排序的窗口：新样本用二分插入，移出窗口的旧样本用二分删除，
+    每一步只做 O(log w) 的查找，不对每个窗口重新排序。
+    窗口不足 years 年的早期数据记为 NaN，缺失值不进入窗口、结果为 NaN。
+    :param dates: 升序日期（datetime64 或可转换的序列）
+    """
+    # 转为 Python 标量列表，避免逐元素访问 numpy 标量的开销
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64).tolist()
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values).tolist()
+    values = values.tolist()
+    span = int(round(years * 365.25))
+    result = np.full(len(values), np.nan)
+    if not values:
+        return result
+    window = []
+    left = 0
+    first = days[0]
+    for i, value in enumerate(values):
+        # 移出早于窗口起点的样本
+        while days[left] <= days[i] - span:
+            if finite[left]:
+                del window[bisect.bisect_left(window, values[left])]
+            left += 1
+        if not finite[i]:
+            continue
+        bisect.insort(window, value)
+        if days[i] - first >= span:
+            result[i] = bisect.bisect_right(window, value) / len(window)
+    return result
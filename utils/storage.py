@@ -0,0 +1,16 @@
+"""本地数据目录
+
+所有本地持久化数据统一放在项目根目录的 data_cache 下，
+可通过环境变量 APP_DATA_DIR 指定其他位置（如容器挂载卷）。
+"""
+import os
+from pathlib import Path
+
+DATA_DIR = Path(os.environ.get("APP_DATA_DIR", Path(__file__).resolve().parent.parent / "data_cache"))
+
+
+def data_dir(*parts) -> Path:
+    """返回数据子目录路径，不存在时自动创建"""
+    path = DATA_DIR.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
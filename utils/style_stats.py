@@ -0,0 +1,216 @@
+"""市场风格统计：按市值、股价、板块分组的上涨比例
+
+三个维度的分类都用向量化查表（代码前缀、searchsorted 分档）得到，
+再把三个维度的分类编号与日期编号拼成组合编号，一次 bincount 聚合算出 总数/上涨数量/上涨比例/平均涨跌幅，
+多个日期的数据可以一起传入，同样只需一次聚合。
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import time as dtime
+
+import numpy as np
+import pandas as pd
+import pywencai
+
+from utils.classify import BOARDS, CAP_LABELS, bucket, classify_board, classify_cap
+from utils.ratelimit import get_limiter
+from utils.storage import data_dir
+
+PRICE_EDGES = [10, 100]
+PRICE_LABELS = ['低价股(<10元)', '中价股(10-100元)', '高价股(≥100元)']
+DIMENSIONS = {
+    '市值分类': CAP_LABELS,
+    '股价分类': PRICE_LABELS,
+    '板块分类': BOARDS,
+}
+DATE_COLUMN = '数据日期'
+CLOSE_TIME = dtime(15, 30)  # 收盘后当日统计视为定型
+MAX_WORKERS = 4
+
+
+def find_market_cap_column(df):
+    """
+    智能查找市值字段：优先寻找'总市值'，如果没有则查找包含'总市值'字样的列
+    """
+    if '总市值' in df.columns:
+        return '总市值'
+    market_cap_cols = [col for col in df.columns if '总市值' in str(col)]
+    if market_cap_cols:
+        return market_cap_cols[0]
+    alternative_cols = [col for col in df.columns if any(word in str(col) for word in ['市值', 'marketcap', 'MKTCAP'])]
+    if alternative_cols:
+        return alternative_cols[0]
+    return None
+
+
+def normalize_stock_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """从问财结果中取出 股票代码/总市值/涨跌幅/最新价（及数据日期）列，不修改原表
+
+    :raises ValueError: 找不到市值或涨跌幅字段
+    """
+    market_cap_col = find_market_cap_column(df)
+    if market_cap_col is None:
+        raise ValueError("无法找到市值字段，请检查数据源")
+    change_col = next((col for col in df.columns if '涨跌幅' in str(col)), None)
+    if change_col is None:
+        raise ValueError("无法找到涨跌幅字段")
+    price_col = next((col for col in df.columns
+                      if any(word in str(col) for word in ['最新价', '收盘价', '价格', '股价'])), None)
+    result = pd.DataFrame({
+        '股票代码': df['股票代码'].astype(str),
+        '总市值': pd.to_numeric(df[market_cap_col], errors='coerce'),
+        '涨跌幅': pd.to_numeric(df[change_col], errors='coerce'),
+        '最新价': pd.to_numeric(df[price_col], errors='coerce') if price_col else np.nan,
+    }, index=df.index)
+    if DATE_COLUMN in df.columns:
+        result[DATE_COLUMN] = df[DATE_COLUMN]
+    return result.dropna(subset=['总市值', '涨跌幅']).reset_index(drop=True)
+
+
+def style_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """各维度、各分类的 总数/上涨数量/上涨比例/平均涨跌幅（长表）
+
+    :param df: normalize_stock_frame 的结果，含 数据日期 列时按日期分别统计
+    :return: 列为 [数据日期,] 维度, 分类, 总数, 上涨数量, 上涨比例, 平均涨跌幅
+    """
+    # 各维度的分类编号拼成全局编号：维度内编号 + 该维度的偏移量，未分类为 -1
+    codes = [
+        classify_cap(df['总市值']).codes,
+        bucket(df['最新价'], PRICE_EDGES, PRICE_LABELS).codes,
+        pd.Categorical(classify_board(df['股票代码']), categories=BOARDS).codes,
+    ]
+    sizes = [len(labels) for labels in DIMENSIONS.values()]
+    offsets = np.cumsum([0] + sizes)[:-1]
+    category = np.concatenate([np.where(c >= 0, c + off, -1) for c, off in zip(codes, offsets)])
+    n_categories = sum(sizes)
+    change = np.tile(df['涨跌幅'].to_numpy(dtype=np.float64), len(DIMENSIONS))
+    has_date = DATE_COLUMN in df.columns
+    if has_date:
+        date_codes, date_values = pd.factorize(df[DATE_COLUMN], sort=True)
+        date_codes = np.tile(date_codes, len(DIMENSIONS))
+    else:
+        date_codes, date_values = np.zeros(len(category), dtype=np.int64), [None]
+    # (日期, 分类) 组合编号上的一次 bincount 聚合
+    valid = category >= 0
+    group = date_codes[valid] * n_categories + category[valid]
+    size = len(date_values) * n_categories
+    count = np.bincount(group, minlength=size)
+    rise = np.bincount(group, weights=change[valid] > 0, minlength=size)
+    total = np.bincount(group, weights=change[valid], minlength=size)
+    present = np.flatnonzero(count)
+    dimensions = np.repeat(list(DIMENSIONS), sizes)
+    labels = np.concatenate([np.asarray(labels, dtype=object) for labels in DIMENSIONS.values()])
+    stats = pd.DataFrame({
+        '维度': dimensions[present % n_categories],
+        '分类': labels[present % n_categories],
+        '总数': count[present],
+        '上涨数量': rise[present].astype(np.int64),
+        '上涨比例': rise[present] / count[present],
+        '平均涨跌幅': total[present] / count[present],
+    })
+    if has_date:
+        stats.insert(0, DATE_COLUMN, np.asarray(date_values)[present // n_categories])
+    return stats
+
+
+def dimension_table(stats: pd.DataFrame, dimension: str) -> pd.DataFrame:
+    """单日长表中某个维度的统计表（以分类为索引）"""
+    table = stats[stats['维度'] == dimension].set_index('分类')
+    table.index.name = None
+    return table[['总数', '上涨数量', '上涨比例', '平均涨跌幅']]
+
+
+# ---------- 按日统计的本地存储 ----------
+def fetch_stock_frame(day) -> pd.DataFrame:
+    """从问财查询某日全市场股票的涨跌幅、市值"""
+    query = f"{day.strftime('%Y-%m-%d')} 股票涨跌 市值， 涨跌幅"
+    with get_limiter("wencai") as limiter:
+        res = pywencai.get(question=query, query_type="stock", loop=True)
+        if res is None:
+            limiter.throttled()
+    if res is None or not isinstance(res, pd.DataFrame):
+        return pd.DataFrame()
+    return res
+
+
+def _is_final(day) -> bool:
+    now = datetime.now()
+    return day < now.date() or (day == now.date() and now.time() >= CLOSE_TIME)
+
+
+class StyleStatsStore:
+    """逐日风格统计长表的本地存储（进程内单例，通过 get_style_store 获取）
+
+    只保存聚合后的统计行（每日十余行），不保存全市场明细。
+    """
+
+    def __init__(self):
+        self.path = data_dir("style") / "daily_stats.pkl"
+        self._df = None
+        self._lock = threading.Lock()
+
+    def load(self) -> pd.DataFrame:
+        """全部已保存的统计（共享对象，调用方不得原地修改）"""
+        if self._df is None:
+            with self._lock:
+                if self._df is None:
+                    self._df = pd.read_pickle(self.path) if self.path.exists() else pd.DataFrame(
+                        columns=[DATE_COLUMN, '维度', '分类', '总数', '上涨数量', '上涨比例', '平均涨跌幅'])
+        return self._df
+
+    def add(self, stats: pd.DataFrame):
+        """写入若干日期的统计，已有日期整体覆盖"""
+        if stats is None or stats.empty:
+            return
+        self.load()
+        with self._lock:
+            df = self._df[~self._df[DATE_COLUMN].isin(stats[DATE_COLUMN].unique())]
+            df = pd.concat([df, stats], ignore_index=True) if not df.empty else stats.reset_index(drop=True)
+            df = df.sort_values(DATE_COLUMN, kind="stable", ignore_index=True)
+            df.to_pickle(self.path)
+            self._df = df
+
+    def get_days(self, days, fetch=fetch_stock_frame):
+        """取多个交易日的统计：本地已有的直接读取，缺失日期并发查询，收盘定型的日期写入本地
+
+        :return: (统计长表, {日期: 错误信息})
+        """
+        stored = self.load()
+        missing = sorted(set(days) - set(stored[DATE_COLUMN]))
+        errors, fetched = {}, []
+
+        def _task(day):
+            try:
+                raw = fetch(day)
+                if raw.empty:
+                    return day, None, "数据为空"
+                return day, style_stats(normalize_stock_frame(raw.assign(**{DATE_COLUMN: day}))), None
+            except Exception as e:
+                return day, None, str(e)
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(missing))) as pool:
+                for day, stats, err in pool.map(_task, missing):
+                    if err is not None:
+                        errors[day] = err
+                    else:
+                        fetched.append(stats)
+        final = [s for s in fetched if _is_final(s[DATE_COLUMN].iloc[0])]
+        if final:
+            self.add(pd.concat(final, ignore_index=True))
+        result = pd.concat([stored[stored[DATE_COLUMN].isin(days)]] + fetched, ignore_index=True)
+        return result.sort_values(DATE_COLUMN, kind="stable", ignore_index=True), errors
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_style_store() -> StyleStatsStore:
+    """获取风格统计存储（进程内单例）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StyleStatsStore()
+        return _store
@@ -0,0 +1,138 @@
+"""申万指数周度分析数据的本地存储
+
+已发布的周度数据不再变化，每个 (分析类型, 周) 组合下载一次后永久保存在本地；
+多周查询只对本地缺失的组合并发请求上游。周列表本身在进程内缓存，过期后才重新获取。
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.akshare_gateway import call as ak_call
+from utils.storage import data_dir
+
+SYMBOLS = ["市场表征", "一级行业", "二级行业", "风格指数"]
+WEEK_LIST_TTL = 6 * 3600  # 周列表刷新间隔（秒），新一周数据每周发布一次
+MAX_WORKERS = 4
+
+
+def _day_str(day) -> str:
+    return day if isinstance(day, str) else day.strftime("%Y%m%d")
+
+
+def fetch_weekly(symbol: str, day) -> pd.DataFrame:
+    """从申万宏源研究获取某周的指数分析数据"""
+    return ak_call("index_analysis_weekly_sw", symbol=symbol, date=_day_str(day))
+
+
+class SwWeeklyStore:
+    """申万周度分析数据存储（进程内单例，通过 get_sw_weekly_store 获取）"""
+
+    def __init__(self):
+        self.root = data_dir("sw_weekly")
+        self._weeks = None  # (获取时间, 周列表)
+        self._lock = threading.Lock()
+
+    def weeks(self) -> list:
+        """已发布的周度数据日期（YYYYMMDD，升序），进程内缓存 WEEK_LIST_TTL 秒"""
+        cached = self._weeks
+        if cached is not None and time.time() - cached[0] < WEEK_LIST_TTL:
+            return cached[1]
+        with self._lock:
+            cached = self._weeks
+            if cached is not None and time.time() - cached[0] < WEEK_LIST_TTL:
+                return cached[1]
+            df = ak_call("index_analysis_week_month_sw", symbol="week")
+            weeks = sorted(pd.to_datetime(df["date"]).dt.strftime("%Y%m%d").unique())
+            self._weeks = (time.time(), weeks)
+            return weeks
+
+    def _path(self, symbol, day):
+        return data_dir("sw_weekly", symbol) / f"{_day_str(day)}.pkl"
+
+    def get(self, symbol: str, day, persist: bool = True, fetch=fetch_weekly) -> pd.DataFrame:
+        """某分析类型某周的数据，本地已有时不访问上游
+
+        :param persist: 是否写入本地（只有已发布的周才应永久保存）
+        """
+        path = self._path(symbol, day)
+        if path.exists():
+            return pd.read_pickle(path)
+        df = fetch(symbol, day)
+        if persist and df is not None and not df.empty:
+            df.to_pickle(path)
+        return df
+
+    def get_many(self, symbols, days, fetch=fetch_weekly):
+        """多个分析类型、多个周的数据，缺失的组合并发获取
+
+        :return: ({(分析类型, 周): DataFrame}, {(分析类型, 周): 错误信息})
+        """
+        pairs = [(s, _day_str(d)) for s in symbols for d in days]
+        frames, errors = {}, {}
+        missing = []
+        for pair in pairs:
+            path = self._path(*pair)
+            if path.exists():
+                frames[pair] = pd.read_pickle(path)
+            else:
+                missing.append(pair)
+
+        def _task(pair):
+            try:
+                return pair, self.get(*pair, fetch=fetch), None
+            except Exception as e:
+                return pair, None, str(e)
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(missing))) as pool:
+                for pair, df, err in pool.map(_task, missing):
+                    if err is not None:
+                        errors[pair] = err
+                    elif df is None or df.empty:
+                        errors[pair] = "数据为空"
+                    else:
+                        frames[pair] = df
+        return frames, errors
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_sw_weekly_store() -> SwWeeklyStore:
+    """获取申万周度数据存储（进程内单例）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SwWeeklyStore()
+        return _store
+
+
+def weekly_matrix(frames: dict, symbol: str, metric: str = "涨跌幅") -> pd.DataFrame:
+    """某分析类型的 指数 × 周 指标矩阵，附区间累计涨跌幅，按累计涨跌幅降序
+
+    :param frames: get_many 返回的 {(分析类型, 周): DataFrame}
+    """
+    parts = []
+    for (sym, day), df in frames.items():
+        if sym != symbol or metric not in df.columns:
+            continue
+        name_col = "指数名称" if "指数名称" in df.columns else df.columns[1]
+        parts.append(pd.DataFrame({
+            "指数名称": df[name_col].to_numpy(),
+            "周": datetime.strptime(day, "%Y%m%d").strftime("%Y-%m-%d"),
+            metric: pd.to_numeric(df[metric], errors="coerce").to_numpy(),
+        }))
+    if not parts:
+        return pd.DataFrame()
+    long_df = pd.concat(parts, ignore_index=True)
+    matrix = long_df.pivot_table(index="指数名称", columns="周", values=metric, aggfunc="last").sort_index(axis=1)
+    if metric == "涨跌幅":
+        growth = np.nanprod(1 + matrix.to_numpy() / 100, axis=1) - 1
+        matrix["区间累计"] = np.round(growth * 100, 2)
+        matrix = matrix.sort_values("区间累计", ascending=False)
+    return matrix
@@ -0,0 +1,172 @@
+"""A股交易日历
+
+交易日保存为已排序的 datetime64[D] 数组，每个进程只加载一次，
+所有查询都是对该数组的二分查找（np.searchsorted），不再逐日试探或每次渲染重新构建日历。
+日历来自新浪交易日历（通过 akshare 网关），同时保存在本地文件中，离线时直接使用本地文件；
+本地文件超过 REFRESH_DAYS 天未更新或已不覆盖今天时才重新获取。
+"""
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.akshare_gateway import call as ak_call
+from utils.storage import data_dir
+
+REFRESH_DAYS = 30  # 本地日历的更新周期（天），新浪日历通常已包含到年底的交易日
+CHECK_INTERVAL = 3600  # 进程内多久检查一次本地日历是否需要更新（秒）
+RETRY_INTERVAL = 300  # 退回近似日历后多久重新尝试获取（秒）
+PERIODS = ("W", "M", "Q", "Y")
+
+
+def _day(value) -> np.datetime64:
+    return np.datetime64(pd.Timestamp(value).date(), "D")
+
+
+def _to_date(value: np.datetime64) -> date:
+    return value.astype(object)
+
+
+class TradingCalendar:
+    """交易日历（只读，通过 get_calendar 获取进程内共享实例）"""
+
+    def __init__(self, days: np.ndarray):
+        days = np.unique(np.asarray(days, dtype="datetime64[D]"))
+        days.flags.writeable = False
+        self.days = days
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def first(self) -> date:
+        return _to_date(self.days[0])
+
+    @property
+    def last(self) -> date:
+        return _to_date(self.days[-1])
+
+    def is_trading_day(self, day) -> bool:
+        d = _day(day)
+        i = np.searchsorted(self.days, d)
+        return bool(i < len(self.days) and self.days[i] == d)
+
+    def prev(self, day, n: int = 1):
+        """day 之前（不含 day）的第 n 个交易日，超出日历范围时返回 None"""
+        i = np.searchsorted(self.days, _day(day), side="left") - n
+        return _to_date(self.days[i]) if 0 <= i < len(self.days) else None
+
+    def next(self, day, n: int = 1):
+        """day 之后（不含 day）的第 n 个交易日，超出日历范围时返回 None"""
+        i = np.searchsorted(self.days, _day(day), side="right") + n - 1
+        return _to_date(self.days[i]) if 0 <= i < len(self.days) else None
+
+    def on_or_before(self, day):
+        """不晚于 day 的最近交易日（day 为交易日时即 day 本身）"""
+        i = np.searchsorted(self.days, _day(day), side="right") - 1
+        return _to_date(self.days[i]) if i >= 0 else None
+
+    def range(self, start, end) -> list:
+        """闭区间 [start, end] 内的交易日（datetime.date 列表）"""
+        lo = np.searchsorted(self.days, _day(start), side="left")
+        hi = np.searchsorted(self.days, _day(end), side="right")
+        return self.days[lo:hi].astype(object).tolist()
+
+    def window(self, day, n: int) -> list:
+        """截至 day（含）的最近 n 个交易日，升序"""
+        end = np.searchsorted(self.days, _day(day), side="right")
+        return self.days[max(0, end - n):end].astype(object).tolist()
+
+    def last_week_end(self, day=None):
+        """day 之前最近一个已结束交易周的最后一个交易日
+
+        day 所在周之后还有交易日（本周尚未结束）时，返回上一周的最后一个交易日；
+        day 为周末时返回本周最后一个交易日。
+        """
+        d = _day(day if day is not None else date.today())
+        i = np.searchsorted(self.days, d, side="left") - 1
+        if i < 0:
+            return None
+        last = self.days[i]
+        monday = last - (last.astype(np.int64) + 3) % 7
+        if i + 1 < len(self.days) and self.days[i + 1] <= monday + 6:
+            i = np.searchsorted(self.days, monday, side="left") - 1
+        return _to_date(self.days[i]) if i >= 0 else None
+
+    def nth_trading_day_of_period(self, day, n: int, period: str = "M"):
+        """day 所在周/月/季/年（period 为 W/M/Q/Y）的第 n 个交易日，n 为负数时从期末倒数
+
+        :return: 交易日，该期交易日不足 n 个时返回 None
+        """
+        if period not in PERIODS:
+            raise ValueError(f"不支持的周期: {period}")
+        p = pd.Period(pd.Timestamp(day), freq=period)
+        lo = np.searchsorted(self.days, _day(p.start_time), side="left")
+        hi = np.searchsorted(self.days, _day(p.end_time), side="right")
+        k = lo + n - 1 if n > 0 else hi + n
+        return _to_date(self.days[k]) if n != 0 and lo <= k < hi else None
+
+
+def fetch_trade_days() -> np.ndarray:
+    """新浪交易日历的全部交易日"""
+    df = ak_call("tool_trade_date_hist_sina")
+    return pd.to_datetime(df["trade_date"]).to_numpy().astype("datetime64[D]")
+
+
+_calendar = None
+_checked_at = 0.0
+_check_interval = CHECK_INTERVAL
+_calendar_lock = threading.Lock()
+
+
+def _path():
+    return data_dir("calendar") / "trade_days.npy"
+
+
+def _load_local():
+    """本地日历及其保存时间，不存在时返回 (None, 0)"""
+    path = _path()
+    if not path.exists():
+        return None, 0.0
+    return TradingCalendar(np.load(path, allow_pickle=False)), path.stat().st_mtime
+
+
+def get_calendar() -> TradingCalendar:
+    """获取交易日历（进程内单例）
+
+    本地日历过期或不覆盖今天时从上游更新；上游不可用时继续使用本地日历，
+    本地也没有时退回按工作日生成的近似日历（不含节假日），RETRY_INTERVAL 秒后再尝试获取。
+    """
+    global _calendar, _checked_at, _check_interval
+    if _calendar is not None and time.time() - _checked_at < _check_interval:
+        return _calendar
+    with _calendar_lock:
+        if _calendar is not None and time.time() - _checked_at < _check_interval:
+            return _calendar
+        calendar, saved_at = _load_local()
+        fallback = False
+        if calendar is None or time.time() - saved_at > REFRESH_DAYS * 86400 or calendar.last < date.today():
+            try:
+                days = fetch_trade_days()
+                np.save(_path(), days, allow_pickle=False)
+                calendar = TradingCalendar(days)
+            except Exception:
+                if calendar is None:
+                    calendar = TradingCalendar(pd.bdate_range("1990-12-19", f"{date.today().year}-12-31").to_numpy())
+                    fallback = True
+        _calendar = calendar
+        # 退回近似日历时缩短检查间隔，上游恢复后尽快换成真实日历，又不会每次调用都请求上游
+        _checked_at = time.time()
+        _check_interval = RETRY_INTERVAL if fallback else CHECK_INTERVAL
+        return _calendar
+
+
+def last_settled_day(close_time, now: datetime = None):
+    """日线已定型的最后一个交易日：交易日 close_time 之后为当天，否则为上一交易日"""
+    now = now or datetime.now()
+    calendar = get_calendar()
+    if calendar.is_trading_day(now.date()) and now.time() >= close_time:
+        return now.date()
+    return calendar.prev(now.date())
@@ -0,0 +1,93 @@
+"""指数估值与国债收益率序列
+
+指数市盈率、中美国债收益率都保存在本地日期序列存储中，所有页面、所有会话共用；
+按时间范围查询时只对本地已排序日期二分切片，不再访问上游。
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.akshare_gateway import call as ak_call
+from utils.series_store import get_series_store
+from utils.stats import rolling_percentile_rank
+
+REFRESH_TTL = 6 * 3600  # 本地序列每6小时检查一次上游新数据
+BOND_FIRST_DATE = "19901219"
+
+
+def _fetch_index_pe(symbol):
+    def _fetch(last_date):
+        # 乐咕乐股接口只能整段下载，由本地存储只追加新日期
+        return ak_call("stock_index_pe_lg", symbol=symbol)
+    return _fetch
+
+
+def _fetch_bond_yield(last_date):
+    # 从本地最后一天（含）开始取，用上游数据覆盖最后一行（当日数据可能尚未收齐）
+    start = BOND_FIRST_DATE if last_date is None else pd.Timestamp(last_date).strftime("%Y%m%d")
+    return ak_call("bond_zh_us_rate", start_date=start)
+
+
+def get_index_pe_history(symbol: str, start=None, end=None) -> pd.DataFrame:
+    """指数市盈率历史（乐咕乐股），按日期闭区间切片"""
+    store = get_series_store(f"index_pe_{symbol}")
+    store.refresh(_fetch_index_pe(symbol), ttl=REFRESH_TTL, overwrite_last=1)
+    return store.slice(start, end)
+
+
+def get_bond_yield_history(start=None, end=None) -> pd.DataFrame:
+    """中美国债收益率历史，所有指数共用一份，按日期闭区间切片"""
+    store = get_series_store("bond_zh_us_rate")
+    store.refresh(_fetch_bond_yield, ttl=REFRESH_TTL, overwrite_last=1)
+    return store.slice(start, end)
+
+
+# ---------- 多指数格雷厄姆指数 ----------
+GRAHAM_INDICES = ["上证50", "沪深300", "中证500", "创业板指"]
+PERCENTILE_YEARS = (3, 5, 10)
+MAX_WORKERS = 4
+
+
+def load_graham_panel(indices=GRAHAM_INDICES):
+    """并发加载各指数市盈率与国债收益率，按日期对齐后计算格雷厄姆指数及滚动分位
+
+    :return: (长表[日期, 指数, 滚动市盈率, 中国国债收益率10年, 盈利收益率, 格雷厄姆指数, N年分位...],
+              {指数: 错误信息})
+    """
+    errors = {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        bond_future = pool.submit(get_bond_yield_history)
+        pe_futures = {name: pool.submit(get_index_pe_history, name) for name in indices}
+        bond = bond_future.result()
+        pe = {}
+        for name, future in pe_futures.items():
+            try:
+                df = future.result()
+                if not df.empty:
+                    pe[name] = df.set_index("日期")["滚动市盈率"]
+            except Exception as e:
+                errors[name] = str(e)
+    if not pe:
+        return pd.DataFrame(), errors
+    # 日期 × 指数 的市盈率面板，与国债收益率按日期内连接
+    panel = pd.DataFrame(pe).join(bond.set_index("日期")["中国国债收益率10年"].dropna(), how="inner").sort_index()
+    bond_yield = panel.pop("中国国债收益率10年")
+    earnings_yield = 1 / panel
+    graham = earnings_yield.div(bond_yield / 100, axis=0)
+    frames = []
+    for name in panel.columns:
+        series = graham[name]
+        valid = series.notna()
+        frame = pd.DataFrame({
+            "日期": panel.index[valid],
+            "指数": name,
+            "滚动市盈率": panel.loc[valid, name].to_numpy(),
+            "中国国债收益率10年": bond_yield[valid].to_numpy(),
+            "盈利收益率": earnings_yield.loc[valid, name].to_numpy(),
+            "格雷厄姆指数": series[valid].to_numpy(),
+        })
+        for years in PERCENTILE_YEARS:
+            frame[f"{years}年分位"] = rolling_percentile_rank(frame["日期"].to_numpy(), frame["格雷厄姆指数"].to_numpy(),
+                                                          years)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True), errors
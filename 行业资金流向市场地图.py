@@ -2,7 +2,7 @@ import streamlit as st
 import plotly.express as px
 import pandas as pd
 import io
-import requests
+from utils import http
 from bs4 import BeautifulSoup
 import py_mini_racer
 # --- 数据抓取函数  ---
@@ -34,7 +34,7 @@ def get_zijindongxiang_data():
     }
     initial_url = "http://data.10jqka.com.cn/funds/hyzjl/field/tradezdf/order/desc/ajax/1/free/1/"
     try:
-        r = requests.get(initial_url, headers=headers)
+        r = http.get(initial_url, headers=headers)
         r.raise_for_status()
         soup = BeautifulSoup(r.text, features="lxml")
         raw_page = soup.find(name="span", attrs={"class": "page_info"}).text
@@ -48,7 +48,7 @@ def get_zijindongxiang_data():
     for i, page in enumerate(range(1, page_num + 1)):
         current_url = url_template.format(page)
         try:
-            r = requests.get(current_url, headers=headers)
+            r = http.get(current_url, headers=headers)
             r.raise_for_status()
             temp_df = pd.read_html(io.StringIO(r.text))[0]
             big_df = pd.concat(objs=[big_df, temp_df], ignore_index=True)